@@ -0,0 +1 @@
+"""Code shared by the Python agent services (agent, sitter-agent, orchestrator-agent)."""
@@ -0,0 +1,230 @@
+"""
+Admission control for LLM-backed endpoints
+
+Bounds how many agent runs a service starts at once. Requests over the limit
+wait in a bounded FIFO queue; when the queue is full, or a request has waited
+longer than the queue timeout, it is rejected immediately with a Retry-After
+hint instead of adding more parallel work for the model deployment.
+
+In adaptive mode the limit follows AIMD (additive increase, multiplicative
+decrease): it grows by one slot per window of successful runs and is cut by
+a constant factor whenever Azure AI answers with a throttling error.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from opentelemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; maps to HTTP 503."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Service busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+_THROTTLING_TEXT = re.compile(r"\b429\b|rate.?limit|too many requests", re.IGNORECASE)
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """Return True if an exception (or anything in its cause chain) is an upstream 429.
+
+    An exception's HTTP status code decides when it has one; only errors without
+    one (e.g. failed runs) are judged by their message.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        status = getattr(current, "status_code", None)
+        if status is None:
+            status = getattr(getattr(current, "response", None), "status_code", None)
+        if status is not None:
+            if status == 429:
+                return True
+        elif _THROTTLING_TEXT.search(str(current)):
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded wait queue and optional AIMD limit."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        max_queue: int = 32,
+        queue_timeout: float = 10.0,
+        adaptive: bool = False,
+        min_concurrency: int = 1,
+        decrease_factor: float = 0.5,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.decrease_factor = decrease_factor
+
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        # Exponentially weighted average run time, used for Retry-After hints
+        self._avg_run_seconds = 5.0
+
+        attributes = {"admission.name": name}
+        self._queue_time = meter.create_histogram(
+            "admission.queue_time",
+            unit="s",
+            description="Time requests spent waiting for an admission slot",
+        )
+        self._rejections = meter.create_counter(
+            "admission.rejected",
+            description="Requests rejected by admission control",
+        )
+        self._throttles = meter.create_counter(
+            "admission.upstream_throttled",
+            description="Upstream throttling responses observed by admission control",
+        )
+        meter.create_observable_gauge(
+            "admission.in_flight",
+            callbacks=[lambda options: [metrics.Observation(self._in_flight, attributes)]],
+            description="Agent runs currently executing",
+        )
+        meter.create_observable_gauge(
+            "admission.queue_depth",
+            callbacks=[lambda options: [metrics.Observation(len(self._waiters), attributes)]],
+            description="Requests waiting for an admission slot",
+        )
+        meter.create_observable_gauge(
+            "admission.limit",
+            callbacks=[lambda options: [metrics.Observation(self.limit, attributes)]],
+            description="Current concurrency limit",
+        )
+        self._attributes = attributes
+
+    @classmethod
+    def from_env(cls, name: str) -> "AdmissionController":
+        """Build a controller from AGENT_* environment variables."""
+        return cls(
+            name=name,
+            max_concurrency=int(os.getenv("AGENT_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("AGENT_MAX_QUEUE", "32")),
+            queue_timeout=float(os.getenv("AGENT_QUEUE_TIMEOUT_SECONDS", "10")),
+            adaptive=os.getenv("AGENT_ADMISSION_MODE", "static").lower() == "adaptive",
+            min_concurrency=int(os.getenv("AGENT_MIN_CONCURRENCY", "1")),
+        )
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_concurrency, math.floor(self._limit))
+
+    def stats(self) -> dict:
+        """Current limiter state, suitable for health/diagnostic endpoints."""
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "adaptive": self.adaptive,
+        }
+
+    def retry_after(self) -> int:
+        """Estimate how long until a slot frees up for a new request."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_run_seconds * backlog / self.limit))
+
+    def record_success(self) -> None:
+        """Additive increase: one extra slot per `limit` successful runs."""
+        if self.adaptive and self._limit < self.max_concurrency:
+            self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self.limit)
+            self._wake_waiters()
+
+    def record_throttle(self) -> None:
+        """Multiplicative decrease after an upstream throttling response."""
+        self._throttles.add(1, self._attributes)
+        if self.adaptive:
+            previous = self.limit
+            self._limit = max(float(self.min_concurrency), self._limit * self.decrease_factor)
+            if self.limit != previous:
+                logger.warning(f"Upstream throttling: {self.name} concurrency limit {previous} -> {self.limit}")
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self._rejections.add(1, {**self._attributes, "reason": reason})
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    async def _acquire(self) -> None:
+        if not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            self._queue_time.record(0.0, self._attributes)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject("queue_timeout") from None
+        finally:
+            self._queue_time.record(time.monotonic() - start, self._attributes)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an admission slot for the duration of one agent run."""
+        await self._acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_throttling_error(e):
+                self.record_throttle()
+            raise
+        else:
+            self.record_success()
+        finally:
+            elapsed = time.monotonic() - start
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * elapsed
+            self._release()
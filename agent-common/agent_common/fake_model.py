@@ -0,0 +1,115 @@
+"""
+Local fake chat model
+
+A deterministic stand-in for the Azure deployments, selected with
+MODEL_PROVIDER=fake (see agent_common.model_router), so the services, the
+routing policy and its metrics can be exercised without a model deployment:
+
+- with tools and no tool results yet, it calls every search_* tool once,
+  without arguments, like a first tool-calling turn
+- the "classify" task answers with a route picked by keyword
+- otherwise it replies with a short summary of what it was given
+
+Replies take MODEL_FAKE_LATENCY_SECONDS and report token usage estimated from
+the text, so latency and token metrics have something to show.
+
+Like tool_execution, it imports agent_framework and is loaded with
+lazy_import.
+"""
+
+import asyncio
+import re
+import uuid
+from typing import Any, AsyncIterable, MutableSequence
+
+from agent_framework import (
+    BaseChatClient,
+    ChatMessage,
+    ChatOptions,
+    ChatResponse,
+    ChatResponseUpdate,
+    FunctionCallContent,
+    FunctionResultContent,
+    UsageDetails,
+    use_function_invocation,
+)
+
+_LISTING_WORDS = re.compile(r"\b(venue|venues|place|places|restaurant|cafe|park|hotel|listing|listings|outdoor|seating)\b", re.IGNORECASE)
+_SITTER_WORDS = re.compile(r"\b(sitter|sitters|walker|walkers|walking|boarding|care|watch|groom\w*|overnight)\b", re.IGNORECASE)
+
+
+def _estimate(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def classify(text: str) -> str:
+    """The route a request needs, by keyword: listings, sitters, both or other."""
+    listings, sitters = bool(_LISTING_WORDS.search(text)), bool(_SITTER_WORDS.search(text))
+    if listings and sitters:
+        return "both"
+    if listings:
+        return "listings"
+    if sitters:
+        return "sitters"
+    return "other"
+
+
+@use_function_invocation
+class FakeChatClient(BaseChatClient):
+    """Chat client that answers locally, for tests and load runs."""
+
+    OTEL_PROVIDER_NAME = "fake"
+
+    def __init__(self, model_id: str, task: str = "", latency: float = 0.0, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.model_id = model_id
+        self.task = task
+        self.latency = latency
+
+    def _reply(self, messages: MutableSequence[ChatMessage], chat_options: ChatOptions) -> ChatMessage:
+        results = [c for m in messages for c in m.contents if isinstance(c, FunctionResultContent)]
+        tools = [tool for tool in chat_options.tools or [] if getattr(tool, "name", "").startswith("search_")]
+        if tools and not results:
+            return ChatMessage(
+                role="assistant",
+                contents=[FunctionCallContent(call_id=uuid.uuid4().hex, name=tool.name, arguments={}) for tool in tools],
+            )
+
+        query = next((m.text for m in reversed(messages) if m.role.value == "user"), "")
+        if self.task == "classify":
+            route = classify(query)
+            text = f"{route}\nHello! I can help you find pet-friendly venues and pet sitters." if route == "other" else route
+        else:
+            text = f"[{self.model_id}] Answer to: {query[:200]}"
+            if results:
+                text += f" (from {len(results)} tool results)"
+        return ChatMessage(role="assistant", text=text)
+
+    async def _inner_get_response(
+        self,
+        *,
+        messages: MutableSequence[ChatMessage],
+        chat_options: ChatOptions,
+        **kwargs: Any,
+    ) -> ChatResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        reply = self._reply(messages, chat_options)
+        prompt = _estimate(" ".join(m.text for m in messages) + (chat_options.instructions or ""))
+        completion = _estimate(reply.text or str(reply.contents))
+        return ChatResponse(
+            messages=[reply],
+            model_id=self.model_id,
+            usage_details=UsageDetails(input_token_count=prompt, output_token_count=completion, total_token_count=prompt + completion),
+        )
+
+    async def _inner_get_streaming_response(
+        self,
+        *,
+        messages: MutableSequence[ChatMessage],
+        chat_options: ChatOptions,
+        **kwargs: Any,
+    ) -> AsyncIterable[ChatResponseUpdate]:
+        response = await self._inner_get_response(messages=messages, chat_options=chat_options, **kwargs)
+        for message in response.messages:
+            yield ChatResponseUpdate(contents=message.contents, role=message.role, model_id=self.model_id)
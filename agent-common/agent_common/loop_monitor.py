@@ -0,0 +1,185 @@
+"""
+Event-loop health monitor
+
+Blocking work on the event loop (synchronous file reads, large JSON dumps,
+print storms) delays every other request on the worker, but shows up in no
+request's own timings. LoopMonitor measures it from a watchdog thread:
+
+- every LOOP_MONITOR_INTERVAL_MS (default 50) the thread schedules a no-op
+  callback on the loop with call_soon_threadsafe; the time until it runs is
+  the loop's lag, recorded as event_loop.lag
+- if the callback has not run after LOOP_SLOW_CALLBACK_MS (default 100), the
+  loop is stuck in one callback: the thread captures the loop thread's
+  stack, logs it, and counts the stall in event_loop.slow_callbacks tagged
+  with the innermost frame in this service's code (file:line function)
+
+Stalls longer than the sum of the two settings are always caught. Set
+LOOP_MONITOR=false to turn the monitor off.
+
+Also exported: event_loop.lag.max (the largest lag since the previous metric
+export) and event_loop.tasks (tasks alive on the loop).
+
+Suggested alerts: event_loop.lag.max above LOOP_SLOW_CALLBACK_MS (default
+100 ms) for several minutes means requests are queueing behind blocked
+callbacks; above 1 s, health checks start timing out. The lag histogram's
+buckets are aligned with these thresholds.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from opentelemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+
+# Bucket boundaries (seconds) for event_loop.lag, around the alert thresholds
+LAG_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+# Frames from files under this directory count as this service's code
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def blocking_location(frame) -> str:
+    """The innermost frame in this service's code (else the innermost frame), as file:line function."""
+    innermost = frame
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(SERVICE_DIR) and "site-packages" not in filename:
+            break
+        frame = frame.f_back
+    frame = frame or innermost
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class LoopMonitor:
+    """Watchdog thread measuring event-loop lag and catching slow callbacks."""
+
+    def __init__(self, name: str, interval: float = 0.05, slow_callback: float = 0.1):
+        self.name = name
+        self.interval = interval
+        self.slow_callback = slow_callback
+
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.slow_callbacks = 0
+        self._window_max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._answered = threading.Event()
+        self._answered_at = 0.0
+
+        attributes = {"loop.name": name}
+        self._lag = meter.create_histogram(
+            "event_loop.lag",
+            unit="s",
+            description="Delay before a callback scheduled on the event loop runs",
+            explicit_bucket_boundaries_advisory=LAG_BUCKETS,
+        )
+        self._slow = meter.create_counter(
+            "event_loop.slow_callbacks",
+            description="Callbacks that blocked the event loop, by location of the blocking code",
+        )
+        meter.create_observable_gauge(
+            "event_loop.lag.max",
+            unit="s",
+            callbacks=[self._observe_max_lag],
+            description="Largest event-loop lag since the previous export",
+        )
+        meter.create_observable_gauge(
+            "event_loop.tasks",
+            callbacks=[lambda options: [metrics.Observation(self.tasks, attributes)]],
+            description="Tasks alive on the event loop",
+        )
+        self._attributes = attributes
+
+    @classmethod
+    def from_env(cls, name: str) -> "LoopMonitor":
+        """Build a monitor from LOOP_* environment variables."""
+        return cls(
+            name=name,
+            interval=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50")) / 1000,
+            slow_callback=float(os.getenv("LOOP_SLOW_CALLBACK_MS", "100")) / 1000,
+        )
+
+    @property
+    def tasks(self) -> int:
+        if self._loop is None or self._loop.is_closed():
+            return 0
+        return len(asyncio.all_tasks(self._loop))
+
+    def stats(self) -> dict:
+        """Current loop health, suitable for health/diagnostic endpoints."""
+        return {
+            "lag_seconds": round(self.last_lag, 4),
+            "max_lag_seconds": round(self.max_lag, 4),
+            "slow_callbacks": self.slow_callbacks,
+            "tasks": self.tasks,
+        }
+
+    def _observe_max_lag(self, options):
+        lag, self._window_max_lag = self._window_max_lag, 0.0
+        return [metrics.Observation(lag, self._attributes)]
+
+    def start(self) -> None:
+        """Start watching the running event loop."""
+        if os.getenv("LOOP_MONITOR", "true").lower() not in ("true", "1", "yes"):
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name=f"loop-monitor-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _record_lag(self, lag: float) -> None:
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._window_max_lag = max(self._window_max_lag, lag)
+        self._lag.record(lag, self._attributes)
+
+    def _answer(self) -> None:
+        # Runs on the loop; timestamp here so the watchdog's own wake-up isn't counted
+        self._answered_at = time.perf_counter()
+        self._answered.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._answered.clear()
+            sent = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(self._answer)
+            except RuntimeError:
+                # Loop closed under us (worker shutting down)
+                return
+            if self._answered.wait(self.slow_callback):
+                self._record_lag(self._answered_at - sent)
+                continue
+            if self._stop.is_set():
+                return
+
+            # The loop has been stuck longer than slow_callback: find out where
+            frame = sys._current_frames().get(self._loop_thread)
+            location = blocking_location(frame) if frame is not None else "unknown"
+            stack = "".join(traceback.format_stack(frame, limit=8)) if frame is not None else ""
+            self.slow_callbacks += 1
+            self._slow.add(1, {**self._attributes, "location": location})
+            while not self._answered.wait(self.interval):
+                if self._stop.is_set():
+                    return
+            blocked = self._answered_at - sent
+            self._record_lag(blocked)
+            logger.warning(f"Event loop blocked for {blocked:.3f}s at {location}:\n{stack}")
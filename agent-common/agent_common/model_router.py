@@ -0,0 +1,151 @@
+"""
+Tiered model routing
+
+Each LLM call names the kind of work it does (a task), and the routing policy
+maps the task to a deployment tier:
+
+- "fast": AZURE_FAST_MODEL_DEPLOYMENT_NAME, a smaller, quicker deployment
+  (defaults to the large one, so nothing changes until it is configured)
+- "large": AZURE_MODEL_DEPLOYMENT_NAME (default gpt-4.1)
+
+The default policy sends classification, routing and short direct answers to
+the fast tier and keeps the large model for synthesis across sources.
+Override any task with MODEL_ROUTING_POLICY, e.g.
+"single_source=large,recommend=fast".
+
+Every call goes through the caller's retry policy and the deployment's RPM/TPM
+limiter, and records model.call.duration and model.call.tokens tagged with
+task, tier and deployment, so the policy can be tuned from real latencies.
+
+Set MODEL_PROVIDER=fake to swap the Azure client for a local deterministic
+fake (agent_common.fake_model), for tests and load runs without a model
+deployment.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Callable
+
+from opentelemetry import metrics
+
+from agent_common.retry import RetryPolicy, deployment_limiter
+from agent_common.startup import lazy_import
+
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+_call_duration = meter.create_histogram(
+    "model.call.duration",
+    unit="s",
+    description="Agent run time per model call, by task, tier, deployment and outcome",
+)
+_call_tokens = meter.create_histogram(
+    "model.call.tokens",
+    unit="{token}",
+    description="Tokens used per model call, by task, tier and deployment",
+)
+
+TIERS = ("fast", "large")
+DEFAULT_POLICY = {
+    # Orchestrator: which sources a request needs, and direct answers that need none
+    "classify": "fast",
+    "answer": "fast",
+    # Orchestrator: requests served from one source, and those combining several
+    "single_source": "fast",
+    "synthesis": "large",
+    # Pet sitter agent recommendations
+    "recommend": "large",
+}
+
+
+def parse_policy(spec: str) -> dict[str, str]:
+    """"task=tier,task=tier" -> {task: tier}; entries with an unknown tier are ignored."""
+    policy = {}
+    for item in spec.split(","):
+        task, _, tier = item.partition("=")
+        task, tier = task.strip(), tier.strip().lower()
+        if not task:
+            continue
+        if tier not in TIERS:
+            logger.warning(f"Ignoring MODEL_ROUTING_POLICY entry '{item.strip()}': tier must be one of {TIERS}")
+            continue
+        policy[task] = tier
+    return policy
+
+
+class ModelRouter:
+    """Picks the deployment for each task and runs agents against it."""
+
+    def __init__(self, deployments: dict[str, str], policy: dict[str, str], provider: str = "azure", fake_latency: float = 0.0):
+        self.deployments = deployments
+        self.policy = {**DEFAULT_POLICY, **policy}
+        self.provider = provider
+        self.fake_latency = fake_latency
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        large = os.getenv("AZURE_MODEL_DEPLOYMENT_NAME", "gpt-4.1")
+        return cls(
+            deployments={"large": large, "fast": os.getenv("AZURE_FAST_MODEL_DEPLOYMENT_NAME", large)},
+            policy=parse_policy(os.getenv("MODEL_ROUTING_POLICY", "")),
+            provider=os.getenv("MODEL_PROVIDER", "azure").lower(),
+            fake_latency=float(os.getenv("MODEL_FAKE_LATENCY_SECONDS", "0")),
+        )
+
+    @property
+    def tiered(self) -> bool:
+        """Whether the fast tier is a different deployment from the large one."""
+        return self.deployments["fast"] != self.deployments["large"]
+
+    def tier(self, task: str) -> str:
+        return self.policy.get(task, "large")
+
+    def deployment(self, task: str) -> str:
+        return self.deployments[self.tier(task)]
+
+    def describe(self) -> dict:
+        return {"provider": self.provider, "deployments": dict(self.deployments), "policy": dict(self.policy)}
+
+    def chat_client(self, task: str, agent_name: str, project_client: Callable[[], Any]):
+        """A chat client for the task's deployment; the project client is only built for Azure."""
+        deployment = self.deployment(task)
+        if self.provider == "fake":
+            return lazy_import("agent_common.fake_model").FakeChatClient(deployment, task=task, latency=self.fake_latency)
+        if self.provider != "azure":
+            logger.warning(f"Unknown MODEL_PROVIDER '{self.provider}', using azure")
+        AzureAIAgentClient = lazy_import("agent_framework_azure_ai").AzureAIAgentClient
+        return AzureAIAgentClient(
+            project_client=project_client(),
+            model_deployment_name=deployment,
+            agent_name=agent_name,
+        )
+
+    async def run(
+        self,
+        task: str,
+        agent: Any,
+        message: str,
+        retry_policy: RetryPolicy,
+        estimated_tokens: int,
+        **run_options: Any,
+    ):
+        """Run `agent` on `message` (passing `run_options` to agent.run) with retries and rate limiting."""
+        deployment = self.deployment(task)
+        attributes = {"task": task, "tier": self.tier(task), "deployment": deployment, "outcome": "error"}
+        start = time.perf_counter()
+        try:
+            result = await retry_policy.run(
+                lambda: agent.run(message, **run_options),
+                deployment=deployment,
+                estimated_tokens=estimated_tokens,
+            )
+            attributes["outcome"] = "ok"
+            actual = getattr(getattr(result, "usage_details", None), "total_token_count", None)
+            deployment_limiter(deployment).record_usage(estimated_tokens, actual)
+            if actual:
+                _call_tokens.record(actual, attributes)
+            return result
+        finally:
+            _call_duration.record(time.perf_counter() - start, attributes)
+
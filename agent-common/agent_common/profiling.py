@@ -0,0 +1,180 @@
+"""
+On-demand request profiling
+
+Profiles individual requests in production to show where Python time went
+(validation, JSON, tool execution, waiting on the event loop). A request is
+profiled when either:
+
+- it carries an X-Profile header equal to PROFILE_ADMIN_TOKEN (the header is
+  ignored while no token is configured), or
+- it is picked at random with probability PROFILE_SAMPLE_RATE (default 0)
+
+The profiler samples the event-loop thread's stack every
+PROFILE_INTERVAL_MS, so it costs nothing per call and only a little per
+sample. Samples are taken while the request is in flight; other requests
+sharing the loop show up too, and time spent idle in the selector is event
+loop wait. At most one request per worker is profiled at a time.
+
+Each profile is written to PROFILE_DIR as <id>.speedscope.json (open it at
+https://www.speedscope.app). The id is returned in the X-Profile-Id response
+header and set as the profile.id attribute on the request's server span;
+telemetry.py always exports traces carrying it. Only the newest
+PROFILE_MAX_FILES profiles are kept.
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from opentelemetry import trace
+
+from agent_common.telemetry import PROFILE_ATTRIBUTE
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests profiled at random (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Value of the X-Profile header that forces profiling (unset disables the header)
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+# Where profiles are written
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "octopets-profiles"))
+# Stack sampling interval
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Older profiles beyond this many are deleted
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                # Root first; weight by the time since the previous sample
+                self.samples[tuple(reversed(stack))] += now - last
+            last = now
+
+    def to_speedscope(self, name: str) -> dict:
+        frames: dict[tuple, int] = {}
+        samples, weights = [], []
+        for stack, weight in self.samples.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(round(weight, 6))
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "octopets profiling.py",
+            "shared": {"frames": [{"name": n, "file": f, "line": line} for n, f, line in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(sum(weights), 6),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+def _write(profile_id: str, profile: dict) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.speedscope.json")
+    with open(path, "w") as f:
+        json.dump(profile, f)
+    profiles = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".speedscope.json")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[: max(0, len(profiles) - PROFILE_MAX_FILES)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests picked by header or sampling rate."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+        self._active = False
+
+    def _wanted(self, scope) -> bool:
+        if PROFILE_ADMIN_TOKEN:
+            token = dict(scope["headers"]).get(PROFILE_HEADER)
+            if token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN.encode()):
+                return True
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        name = f"{self.service} {scope['method']} {scope['path']} {profile_id}"
+        trace.get_current_span().set_attribute(PROFILE_ATTRIBUTE, profile_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        self._active = True
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            self._active = False
+            try:
+                path = await asyncio.to_thread(_write, profile_id, sampler.to_speedscope(name))
+                logger.info(f"Profiled {scope['method']} {scope['path']} ({sampler.elapsed:.3f}s): {path}")
+            except OSError as e:
+                logger.warning(f"Could not write profile {profile_id}: {e}")
+
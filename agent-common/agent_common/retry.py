@@ -0,0 +1,295 @@
+"""
+Rate-limit-aware retry layer for Azure AI agent calls
+
+Wraps calls to the model deployment so throttling and transient failures are
+retried here instead of being surfaced to the client:
+
+- Retry-After / retry-after-ms headers (and "try again in N seconds" hints in
+  run errors) are honored when present
+- otherwise attempts back off exponentially with full jitter
+- retries draw from a shared budget so an outage can't multiply load
+- per-deployment token buckets smooth requests under the deployment's
+  RPM/TPM quota before they are sent
+- requests that aren't idempotent (creating a thread, message, run or chat
+  turn) are only resent when the server never acted on them: when they failed
+  to connect or were refused as throttled. A read timeout, a dropped
+  connection or a 5xx may come after the server acted on them
+
+This is the only retry layer: Azure SDK clients are built with their own
+retries turned off (retry_total=0), and callers of another service's chat
+endpoint leave retrying its model calls to that service.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from opentelemetry import metrics
+
+from agent_common.admission import is_throttling_error
+
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+_RETRY_HINT = re.compile(r"(?:try again|retry after) in (\d+(?:\.\d+)?) ?(second|sec|s|millisecond|ms)", re.IGNORECASE)
+
+
+class ThrottledError(Exception):
+    """An upstream throttling response that didn't arrive as an HTTP error (e.g. a failed run)."""
+
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after if retry_after is not None else _retry_hint(message)
+
+
+def _retry_hint(message: str) -> Optional[float]:
+    match = _RETRY_HINT.search(message or "")
+    if not match:
+        return None
+    value = float(match.group(1))
+    return value / 1000 if match.group(2).lower() in ("millisecond", "ms") else value
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Extract the server-requested delay from an error, if it carries one."""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return _retry_hint(str(error))
+
+
+def is_connect_error(error: BaseException) -> bool:
+    """The request failed before it was sent (refused, unreachable, connect/pool timeout), so resending is safe."""
+    # httpx ConnectError/ConnectTimeout/PoolTimeout, azure.core ServiceRequestError ("no request was sent"),
+    # aiohttp ClientConnectorError
+    names = {cls.__name__ for cls in type(error).__mro__}
+    return isinstance(error, ConnectionRefusedError) or not names.isdisjoint(
+        ("ConnectError", "ConnectTimeout", "PoolTimeout", "ServiceRequestError", "ClientConnectorError")
+    )
+
+
+def is_retryable_error(error: BaseException, idempotent: bool = True) -> bool:
+    """Throttling, 5xx/408 responses and connection-level failures are worth retrying.
+
+    A request that isn't idempotent is only worth resending after a connect-phase
+    failure or a 429 (including a ThrottledError run), neither of which the server acted on.
+    """
+    if is_connect_error(error):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if not idempotent:
+        return status == 429
+    if is_throttling_error(error) or isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if status in TRANSIENT_STATUS_CODES:
+        return True
+    # azure.core ServiceRequestError / httpx.TransportError / aiohttp.ClientConnectionError
+    return type(error).__name__ in ("ServiceRequestError", "ServiceResponseError", "ClientConnectionError") or any(
+        cls.__name__ == "TransportError" for cls in type(error).__mro__
+    )
+
+
+class TokenBucket:
+    """Continuously refilling token bucket; `acquire` waits until enough tokens are available."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Take `amount` tokens, sleeping as needed. Returns the time spent waiting."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._tokens < amount:
+                delay = (amount - self._tokens) / self.refill_per_second
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= amount
+        return waited
+
+    def settle(self, delta: float) -> None:
+        """Correct an earlier estimate once the real cost is known (positive = used more)."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class DeploymentRateLimiter:
+    """RPM and TPM token buckets for one model deployment (limits of 0 disable a bucket)."""
+
+    def __init__(self, deployment: str, rpm: int = 0, tpm: int = 0):
+        self.deployment = deployment
+        self.requests = TokenBucket(rpm, rpm / 60) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, tpm / 60) if tpm > 0 else None
+
+    async def acquire(self, estimated_tokens: int = 0) -> float:
+        waited = 0.0
+        if self.requests:
+            waited += await self.requests.acquire(1)
+        if self.tokens and estimated_tokens:
+            waited += await self.tokens.acquire(estimated_tokens)
+        return waited
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        if self.tokens and actual_tokens:
+            self.tokens.settle(actual_tokens - estimated_tokens)
+
+
+_deployment_limiters: dict[str, DeploymentRateLimiter] = {}
+
+
+def deployment_limiter(deployment: str) -> DeploymentRateLimiter:
+    """Shared limiter for a deployment, sized from AZURE_MODEL_RPM_LIMIT / AZURE_MODEL_TPM_LIMIT."""
+    limiter = _deployment_limiters.get(deployment)
+    if limiter is None:
+        limiter = DeploymentRateLimiter(
+            deployment,
+            rpm=int(os.getenv("AZURE_MODEL_RPM_LIMIT", "0")),
+            tpm=int(os.getenv("AZURE_MODEL_TPM_LIMIT", "0")),
+        )
+        _deployment_limiters[deployment] = limiter
+    return limiter
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt + completion estimate used to pre-charge the TPM bucket."""
+    return len(text) // 4 + int(os.getenv("AZURE_MODEL_EXPECTED_COMPLETION_TOKENS", "1000"))
+
+
+class RetryBudget:
+    """Caps retries to a fraction of calls: each call deposits `ratio`, each retry costs one token."""
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+
+    def deposit(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    """Retries an async operation on throttling and transient errors."""
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self._retries = meter.create_counter("retry.attempts", description="Retried upstream calls")
+        self._exhausted = meter.create_counter("retry.exhausted", description="Calls that failed after retrying")
+        self._throttle_wait = meter.create_histogram(
+            "retry.rate_limit_wait",
+            unit="s",
+            description="Time spent waiting on per-deployment RPM/TPM buckets",
+        )
+
+    @classmethod
+    def from_env(cls, name: str) -> "RetryPolicy":
+        """Build a policy from AGENT_RETRY_* environment variables."""
+        return cls(
+            name=name,
+            max_attempts=int(os.getenv("AGENT_RETRY_MAX_ATTEMPTS", "4")),
+            base_delay=float(os.getenv("AGENT_RETRY_BASE_DELAY_SECONDS", "1")),
+            max_delay=float(os.getenv("AGENT_RETRY_MAX_DELAY_SECONDS", "30")),
+            budget=RetryBudget(ratio=float(os.getenv("AGENT_RETRY_BUDGET_RATIO", "0.2"))),
+        )
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """Delay before the next attempt: Retry-After if given, else full-jitter exponential."""
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            return requested + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        deployment: Optional[str] = None,
+        estimated_tokens: int = 0,
+        idempotent: bool = True,
+    ) -> T:
+        """Call `operation` until it succeeds, the error isn't retryable, or attempts/budget run out.
+
+        Pass idempotent=False for calls that must not run twice; they are retried on connect-phase
+        errors and throttling only.
+        """
+        limiter = deployment_limiter(deployment) if deployment else None
+        attributes = {"retry.policy": self.name, "deployment": deployment or ""}
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            if limiter:
+                waited = await limiter.acquire(estimated_tokens)
+                if waited:
+                    self._throttle_wait.record(waited, attributes)
+            try:
+                return await operation()
+            except Exception as e:
+                attempt += 1
+                if not is_retryable_error(e, idempotent):
+                    raise
+                delay = self.backoff(attempt, e)
+                if attempt >= self.max_attempts or delay > self.max_delay or not self.budget.withdraw():
+                    self._exhausted.add(1, attributes)
+                    logger.warning(f"{self.name}: giving up after {attempt} attempt(s): {e}")
+                    raise
+                self._retries.add(1, {**attributes, "throttled": is_throttling_error(e)})
+                logger.info(f"{self.name}: attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
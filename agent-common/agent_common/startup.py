@@ -0,0 +1,216 @@
+"""
+Cold start instrumentation and readiness
+
+Records when each startup phase completes and how long each lazily imported
+dependency took, so cold start on scale-to-zero deployments can be tracked
+against a target (STARTUP_TARGET_SECONDS). Import this module first so its
+clock starts as close to process start as possible.
+
+Warm-up steps (run_warm_up) do the slow first-use work ahead of traffic:
+importing the agent stack, acquiring an AAD token, opening pooled connections
+to Foundry, loading catalogs. Failed steps are retried with backoff, up to
+WARMUP_MAX_ATTEMPTS times, then reported as failed. readiness() reports
+ready only once startup has finished and every required step has succeeded,
+for a readiness probe separate from the liveness /health; optional steps
+(work that is also done on first use) are reported but never hold it back.
+Step durations are exported as startup.warmup.duration.
+
+For an offline import-time breakdown of a module, run:
+
+    python -m agent_common.startup app
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from opentelemetry import metrics
+
+PROCESS_START = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+STARTUP_TARGET_SECONDS = float(os.getenv("STARTUP_TARGET_SECONDS", "2"))
+# "background" imports heavy dependencies right after startup; "lazy" waits for first use
+WARMUP_MODE = os.getenv("AGENT_WARMUP", "background").lower()
+# Longest wait between attempts at warm-up steps that failed
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "60"))
+# Attempts at a warm-up step before it is given up on and reported as failed
+WARMUP_MAX_ATTEMPTS = int(os.getenv("WARMUP_MAX_ATTEMPTS", "8"))
+
+meter = metrics.get_meter(__name__)
+_warmup_duration = meter.create_histogram(
+    "startup.warmup.duration",
+    unit="s",
+    description="Warm-up step time, by step and outcome",
+)
+
+_phases: dict[str, float] = {}
+_imports: dict[str, float] = {}
+# Warm-up step -> {"status": "pending" | "ok" | "retrying" | "failed", "required", "seconds", "attempts", "error"}
+_warmup: dict[str, dict] = {}
+meter.create_observable_gauge(
+    "startup.ready",
+    callbacks=[lambda options: [metrics.Observation(int(readiness()["ready"]))]],
+    description="1 once startup and warm-up have completed, else 0",
+)
+
+
+def mark(phase: str) -> float:
+    """Record that a startup phase completed; returns seconds since process start."""
+    elapsed = time.perf_counter() - PROCESS_START
+    _phases.setdefault(phase, round(elapsed, 4))
+    return elapsed
+
+
+def lazy_import(name: str):
+    """Import a module on first use, recording how long the import took."""
+    module = sys.modules.get(name)
+    # A module the warm-up thread is still executing is in sys.modules already;
+    # import_module waits for it to finish instead of handing back half of it
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    _imports.setdefault(name, round(time.perf_counter() - start, 4))
+    return module
+
+
+async def warm_up_imports(*names: str) -> None:
+    """Import heavy dependencies in a worker thread so the event loop keeps serving."""
+    for name in names:
+        await asyncio.to_thread(lazy_import, name)
+
+
+async def run_warm_up(
+    scope: str,
+    steps: dict[str, Callable[[], Awaitable[Any]]],
+    optional: Iterable[str] = (),
+) -> list[str]:
+    """Run warm-up steps in order, retrying the failed ones with backoff up to WARMUP_MAX_ATTEMPTS times.
+
+    Steps are reported as "<scope>.<name>", so services sharing a process
+    (an in-process sub-agent) keep their steps apart. Steps named in
+    `optional` don't count towards readiness. Returns the required steps
+    that never succeeded (empty once warm-up is complete).
+    """
+    pending = [f"{scope}.{name}" for name in steps]
+    operations = {f"{scope}.{name}": operation for name, operation in steps.items()}
+    optional_steps = {f"{scope}.{name}" for name in optional}
+    for step in pending:
+        _warmup[step] = {
+            "status": "pending",
+            "required": step not in optional_steps,
+            "seconds": None,
+            "attempts": 0,
+            "error": None,
+        }
+
+    delay = 1.0
+    while True:
+        failed = []
+        for step in pending:
+            state = _warmup[step]
+            state["attempts"] += 1
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                await operations[step]()
+                outcome = "ok"
+                state.update(status="ok", error=None)
+            except Exception as e:
+                state["error"] = str(e)[:200]
+                if state["attempts"] < WARMUP_MAX_ATTEMPTS:
+                    failed.append(step)
+                    state["status"] = "retrying"
+                    logger.warning(f"Warm-up step {step} failed (attempt {state['attempts']}): {e}")
+                else:
+                    state["status"] = "failed"
+                    logger.error(f"Warm-up step {step} failed {state['attempts']} times, giving up: {e}")
+            finally:
+                state["seconds"] = round(time.perf_counter() - start, 4)
+                _warmup_duration.record(state["seconds"], {"step": step, "outcome": outcome})
+        if not failed:
+            given_up = [step for step in operations if _warmup[step]["status"] == "failed"]
+            if given_up:
+                logger.error(f"Warm-up of {scope} incomplete, failed steps: {given_up}")
+            else:
+                mark(f"{scope}.warm")
+                logger.info(f"Warm-up of {scope} complete: {report()['warmup']}")
+            return [step for step in given_up if _warmup[step]["required"]]
+        pending = failed
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+
+def readiness() -> dict:
+    """Whether this process should receive traffic: startup finished and every required warm-up step succeeded."""
+    steps = {step: state["status"] for step, state in _warmup.items()}
+    return {
+        "ready": "ready" in _phases and all(state["status"] == "ok" for state in _warmup.values() if state["required"]),
+        "steps": steps,
+        "failed": [step for step, status in steps.items() if status == "failed"],
+    }
+
+
+def report() -> dict:
+    """Startup phases, lazy import timings and warm-up steps for this process."""
+    ready = _phases.get("ready")
+    return {
+        "phases": dict(_phases),
+        "imports": dict(_imports),
+        "warmup": {step: dict(state) for step, state in _warmup.items()},
+        "target_seconds": STARTUP_TARGET_SECONDS,
+        "within_target": ready is not None and ready <= STARTUP_TARGET_SECONDS,
+    }
+
+
+def log_report() -> None:
+    ready = mark("ready")
+    if ready > STARTUP_TARGET_SECONDS:
+        logger.warning(f"Startup took {ready:.2f}s (target {STARTUP_TARGET_SECONDS}s): {report()}")
+    else:
+        logger.info(f"Startup took {ready:.2f}s: {report()}")
+
+
+def import_breakdown(module: str, top: int = 20) -> list[tuple[str, float]]:
+    """Run `python -X importtime -c 'import <module>'` and return the slowest top-level packages."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    totals: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Depth is encoded as two spaces per level; keep direct imports of the module only
+        if len(name) - len(name.lstrip()) == 3:
+            package = name.strip().split(".")[0]
+            totals[package] = totals.get(package, 0.0) + int(cumulative) / 1_000_000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    """CLI: print an import-time breakdown for a module."""
+    parser = argparse.ArgumentParser(description="Import-time breakdown for cold start analysis")
+    parser.add_argument("module", help="Module to import, e.g. 'app'")
+    parser.add_argument("--top", type=int, default=20, help="Number of packages to show")
+    args = parser.parse_args()
+
+    breakdown = import_breakdown(args.module, args.top)
+    total = sum(seconds for _, seconds in breakdown)
+    for package, seconds in breakdown:
+        print(f"{seconds:8.3f}s  {package}")
+    print(f"{total:8.3f}s  total (target {STARTUP_TARGET_SECONDS}s)")
+
+
+if __name__ == "__main__":
+    main()
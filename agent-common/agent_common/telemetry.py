@@ -0,0 +1,201 @@
+"""
+Telemetry setup
+
+Configures this worker's tracer and meter providers and OTLP exporters. Call
+init_telemetry() at startup in each worker process (never before a fork, so
+exporter threads and gRPC channels are not shared) and shutdown_telemetry()
+on the way out.
+
+Nothing is set up when OTEL_EXPORTER_OTLP_ENDPOINT is unset: the
+OpenTelemetry API then stays a no-op, so spans and metric recordings cost
+next to nothing and no exporter retries against a missing collector.
+
+Sampling keeps trace volume bounded at high request rates while keeping the
+traces worth looking at:
+
+- head sampling is parent-based with a trace-id ratio (TRACE_SAMPLE_RATIO),
+  so an upstream service's decision is honored and every service makes the
+  same decision for the same trace
+- traces the ratio leaves out are still recorded locally; when their local
+  root span ends they are exported anyway if any span failed or the root
+  took longer than TRACE_SLOW_REQUEST_SECONDS (tail-style sampling) or the
+  request was profiled, and dropped otherwise
+
+Unsampled traces wait in a bounded buffer (TRACE_TAIL_MAX_TRACES) until
+their root ends. Export batching uses the standard OTEL_BSP_* and
+OTEL_METRIC_EXPORT_INTERVAL variables.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from opentelemetry import metrics, trace
+
+logger = logging.getLogger(__name__)
+
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+# Fraction of traces exported regardless of outcome (parent-based)
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+# Unsampled traces whose root span takes at least this long are exported too
+TRACE_SLOW_REQUEST_SECONDS = float(os.getenv("TRACE_SLOW_REQUEST_SECONDS", "5"))
+# Unsampled traces held until their root span ends; the oldest are dropped beyond this
+TRACE_TAIL_MAX_TRACES = int(os.getenv("TRACE_TAIL_MAX_TRACES", "1000"))
+# Spans kept per unsampled trace
+TRACE_TAIL_MAX_SPANS = 256
+# Set on spans of profiled requests (profiling.py); such traces are always exported
+PROFILE_ATTRIBUTE = "profile.id"
+
+# Span export batching (the OpenTelemetry SDK's own variables and defaults)
+BSP_MAX_QUEUE_SIZE = int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "2048"))
+BSP_MAX_EXPORT_BATCH_SIZE = int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "512"))
+BSP_SCHEDULE_DELAY_MILLIS = int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "5000"))
+METRIC_EXPORT_INTERVAL_MILLIS = int(os.getenv("OTEL_METRIC_EXPORT_INTERVAL", "60000"))
+
+_enabled = False
+
+
+def _tail_sampling_classes():
+    """The sampler and span processor, defined on first use to keep the SDK off the import path."""
+    from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+    from opentelemetry.sdk.trace.sampling import (
+        Decision,
+        ParentBased,
+        Sampler,
+        SamplingResult,
+        TraceIdRatioBased,
+    )
+    from opentelemetry.trace import SpanContext, StatusCode, TraceFlags
+
+    class RecordUnsampled(Sampler):
+        """Parent-based ratio sampling that records (without sampling) what it leaves out."""
+
+        def __init__(self, ratio: float):
+            self._sampler = ParentBased(TraceIdRatioBased(ratio))
+
+        def should_sample(self, parent_context, trace_id, name, kind=None, attributes=None, links=None, trace_state=None):
+            result = self._sampler.should_sample(parent_context, trace_id, name, kind, attributes, links, trace_state)
+            if result.decision == Decision.DROP:
+                return SamplingResult(Decision.RECORD_ONLY, result.attributes, result.trace_state)
+            return result
+
+        def get_description(self) -> str:
+            return f"RecordUnsampled{{{self._sampler.get_description()}}}"
+
+    def as_sampled(span: ReadableSpan) -> ReadableSpan:
+        """A copy of an unsampled span flagged as sampled, so the batch processor exports it."""
+        context = span.context
+        return ReadableSpan(
+            name=span.name,
+            context=SpanContext(context.trace_id, context.span_id, context.is_remote, TraceFlags(TraceFlags.SAMPLED), context.trace_state),
+            parent=span.parent,
+            resource=span.resource,
+            attributes=span.attributes,
+            events=span.events,
+            links=span.links,
+            kind=span.kind,
+            status=span.status,
+            start_time=span.start_time,
+            end_time=span.end_time,
+            instrumentation_scope=span.instrumentation_scope,
+        )
+
+    class TailSamplingProcessor(SpanProcessor):
+        """Forwards sampled spans, and unsampled traces that failed or were slow, to `exporting`."""
+
+        def __init__(self, exporting: SpanProcessor, slow_seconds: float, max_traces: int):
+            self.exporting = exporting
+            self.slow_nanos = int(slow_seconds * 1e9)
+            self.max_traces = max_traces
+            self._pending: OrderedDict[int, list] = OrderedDict()
+            # Decisions for traces whose root has ended, for spans that end after it
+            self._decided: OrderedDict[int, bool] = OrderedDict()
+            self._lock = threading.Lock()
+
+        def on_start(self, span, parent_context=None) -> None:
+            self.exporting.on_start(span, parent_context)
+
+        def on_end(self, span: ReadableSpan) -> None:
+            if span.context.trace_flags.sampled:
+                self.exporting.on_end(span)
+                return
+            trace_id = span.context.trace_id
+            local_root = span.parent is None or span.parent.is_remote
+            with self._lock:
+                if trace_id in self._decided:
+                    kept = self._decided[trace_id]
+                    spans = [span] if kept else []
+                else:
+                    spans = self._pending.setdefault(trace_id, [])
+                    if len(spans) < TRACE_TAIL_MAX_SPANS:
+                        spans.append(span)
+                    while len(self._pending) > self.max_traces:
+                        self._pending.popitem(last=False)
+                    if not local_root:
+                        return
+                    del self._pending[trace_id]
+                    kept = span.end_time - span.start_time >= self.slow_nanos or any(
+                        s.status.status_code == StatusCode.ERROR or PROFILE_ATTRIBUTE in (s.attributes or {}) for s in spans
+                    )
+                    self._decided[trace_id] = kept
+                    while len(self._decided) > self.max_traces:
+                        self._decided.popitem(last=False)
+            if kept:
+                for ended in spans:
+                    self.exporting.on_end(as_sampled(ended))
+
+        def shutdown(self) -> None:
+            self.exporting.shutdown()
+
+        def force_flush(self, timeout_millis: int = 30000) -> bool:
+            return self.exporting.force_flush(timeout_millis)
+
+    return RecordUnsampled, TailSamplingProcessor
+
+
+def init_telemetry() -> bool:
+    """Configure the tracer and meter providers for this worker process; False if no collector is configured."""
+    global _enabled
+    if not OTLP_ENDPOINT:
+        logger.info("OTEL_EXPORTER_OTLP_ENDPOINT not set; telemetry export disabled")
+        return False
+
+    # SDK and exporter imports are deferred to here to keep them off the import path
+    from opentelemetry.exporter.otlp.proto.grpc.metric_exporter import OTLPMetricExporter
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.metrics import MeterProvider
+    from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    RecordUnsampled, TailSamplingProcessor = _tail_sampling_classes()
+    batch = BatchSpanProcessor(
+        OTLPSpanExporter(endpoint=OTLP_ENDPOINT),
+        max_queue_size=BSP_MAX_QUEUE_SIZE,
+        max_export_batch_size=min(BSP_MAX_EXPORT_BATCH_SIZE, BSP_MAX_QUEUE_SIZE),
+        schedule_delay_millis=BSP_SCHEDULE_DELAY_MILLIS,
+    )
+    provider = TracerProvider(sampler=RecordUnsampled(TRACE_SAMPLE_RATIO))
+    provider.add_span_processor(
+        batch if TRACE_SAMPLE_RATIO >= 1.0 else TailSamplingProcessor(batch, TRACE_SLOW_REQUEST_SECONDS, TRACE_TAIL_MAX_TRACES)
+    )
+    trace.set_tracer_provider(provider)
+
+    reader = PeriodicExportingMetricReader(
+        OTLPMetricExporter(endpoint=OTLP_ENDPOINT),
+        export_interval_millis=METRIC_EXPORT_INTERVAL_MILLIS,
+    )
+    metrics.set_meter_provider(MeterProvider(metric_readers=[reader]))
+    _enabled = True
+    return True
+
+
+def shutdown_telemetry():
+    """Flush buffered spans and metrics before the worker exits."""
+    if not _enabled:
+        return
+    for provider in (trace.get_tracer_provider(), metrics.get_meter_provider()):
+        if hasattr(provider, "shutdown"):
+            provider.shutdown()
+
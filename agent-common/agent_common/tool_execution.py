@@ -0,0 +1,100 @@
+"""
+Tool execution for agent runs
+
+Within one agent run the model often repeats a tool call with the same
+arguments (re-checking a search, or asking a sub-agent the same question
+again after a nested run). ToolRunMiddleware, added to each run's ChatAgent,
+memoizes calls for the duration of that run: a call whose tool and
+arguments match an earlier (or still running) call in the run gets that
+call's result instead of running again. Failed calls are not memoized.
+Nothing is shared between runs, so results are never staler than the run.
+
+Independent calls from one model turn are already executed concurrently by
+the agent framework; RUN_OPTIONS asks the model to emit them in one turn
+(parallel tool calls) rather than one per turn (AGENT_PARALLEL_TOOL_CALLS).
+
+Every call records agent.tool.duration, tagged with the agent, tool,
+outcome and whether it was served from the run's memo.
+
+This module imports agent_framework, so load it with lazy_import at run
+time, like the rest of the agent stack.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+from agent_framework import FunctionInvocationContext, FunctionMiddleware
+from opentelemetry import metrics
+
+# Let the model request several tool calls in one turn; they run concurrently
+PARALLEL_TOOL_CALLS = os.getenv("AGENT_PARALLEL_TOOL_CALLS", "true").lower() in ("true", "1", "yes")
+# Keyword arguments for ChatAgent.run
+RUN_OPTIONS = {"additional_chat_options": {"allow_multiple_tool_calls": PARALLEL_TOOL_CALLS}}
+
+meter = metrics.get_meter(__name__)
+_tool_duration = meter.create_histogram(
+    "agent.tool.duration",
+    unit="s",
+    description="Tool call time within agent runs, by agent, tool, outcome and memo hit",
+)
+
+
+def call_key(context: FunctionInvocationContext) -> str:
+    """Tool name and arguments with defaults filled in, so omitted and default arguments match."""
+    arguments = context.arguments.model_dump() if hasattr(context.arguments, "model_dump") else dict(context.arguments)
+    return f"{context.function.name}:{json.dumps(arguments, sort_keys=True, default=str)}"
+
+
+class ToolRunMiddleware(FunctionMiddleware):
+    """Per-run tool call memo and latency metrics; create one per agent run."""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def process(
+        self,
+        context: FunctionInvocationContext,
+        next: Callable[[FunctionInvocationContext], Awaitable[None]],
+    ) -> None:
+        attributes = {"agent": self.agent, "tool": context.function.name, "outcome": "error", "memoized": False}
+        start = time.perf_counter()
+        key = call_key(context)
+        try:
+            earlier = self._calls.get(key)
+            if earlier is not None:
+                attributes["memoized"] = True
+                # shield: a cancelled duplicate must not cancel the call it is waiting on
+                context.result = await asyncio.shield(earlier)
+            else:
+                context.result = await self._call(key, context, next)
+            attributes["outcome"] = "ok"
+        finally:
+            _tool_duration.record(time.perf_counter() - start, attributes)
+
+    async def _call(
+        self,
+        key: str,
+        context: FunctionInvocationContext,
+        next: Callable[[FunctionInvocationContext], Awaitable[None]],
+    ) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            await next(context)
+        except Exception as e:
+            # Not memoized: a later identical call runs again
+            del self._calls[key]
+            future.set_exception(e)
+            # Mark retrieved, in case no duplicate was waiting on it
+            future.exception()
+            raise
+        except BaseException:
+            del self._calls[key]
+            future.cancel()
+            raise
+        future.set_result(context.result)
+        return context.result
@@ -0,0 +1,290 @@
+"""
+Query vocabulary normalization
+
+Search filters come from an LLM or a user, so "NYC", "dog walking", "Seatle"
+or "reptiles" (asked for as a service) should find what the catalog calls
+"New York, NY", dog_walking, Seattle and exotic_pet_care on the first try,
+instead of matching nothing and costing the agent another tool-call turn.
+
+Each filter value is resolved against the catalog's own terms:
+
+1. exact, ignoring case and separators: "Dog Walking" -> dog_walking
+2. alias tables below: NY/NYC -> new york, SF -> san francisco, reptiles -> exotic_pet_care
+3. the most similar term by trigram overlap, if similar enough: "Seatle" -> seattle,
+   falling back to a small edit distance among the terms sharing the most
+   trigrams, for transpositions trigrams score poorly: "Wendesday" -> Wednesday.
+   Short words don't get the fallback, as one edit too often makes another
+   word: "rats" is not "cats"
+
+Locations are substring matches, and a city or alias is also picked out of
+a longer phrase ("a place in NY" -> new york).
+
+Terms are indexed by trigram per facet, so a lookup only scores the terms
+that share a trigram with the query, and queries are truncated to
+MAX_QUERY_LENGTH, which bounds the cost whatever the input. Resolutions are
+cached per vocabulary. A value that resolves to nothing is passed through
+unchanged and matches nothing, as before.
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Iterable, Optional
+
+# Minimum trigram similarity (Jaccard, 0-1) for a fuzzy match; exact and alias matches always apply
+MIN_SIMILARITY = float(os.getenv("SITTER_MATCH_MIN_SIMILARITY", "0.45"))
+MAX_QUERY_LENGTH = 64
+# Terms re-scored by edit distance when no trigram match is close enough
+EDIT_CANDIDATES = 8
+# Shortest query (normalized characters) worth correcting by edit distance
+MIN_EDIT_LENGTH = 5
+_CACHE_SIZE = 1024
+
+LOCATION_ALIASES = {
+    "ny": "new york",
+    "nyc": "new york",
+    "new york city": "new york",
+    "manhattan": "new york",
+    "brooklyn": "new york",
+    "sf": "san francisco",
+    "san fran": "san francisco",
+    "bay area": "san francisco",
+    "la": "los angeles",
+    "l.a.": "los angeles",
+    "chi": "chicago",
+    "chi-town": "chicago",
+}
+
+# Per-facet aliases, keyed and valued in normalized form (lowercase, underscores)
+TERM_ALIASES = {
+    "typeOfPets": {
+        "dog": "dogs",
+        "puppy": "dogs",
+        "puppies": "dogs",
+        "cat": "cats",
+        "kitten": "cats",
+        "kittens": "cats",
+        "bird": "birds",
+        "parrot": "birds",
+        "parrots": "birds",
+        "reptile": "reptiles",
+        "snake": "reptiles",
+        "snakes": "reptiles",
+        "lizard": "reptiles",
+        "lizards": "reptiles",
+        "turtle": "reptiles",
+        "turtles": "reptiles",
+        "hamster": "small_mammals",
+        "hamsters": "small_mammals",
+        "rabbit": "small_mammals",
+        "rabbits": "small_mammals",
+        "guinea_pig": "small_mammals",
+        "guinea_pigs": "small_mammals",
+        "ferret": "small_mammals",
+        "ferrets": "small_mammals",
+    },
+    "services": {
+        "walking": "dog_walking",
+        "walks": "dog_walking",
+        "dog_walker": "dog_walking",
+        "sitting": "pet_sitting",
+        "pet_sitter": "pet_sitting",
+        "boarding": "overnight_care",
+        "overnight": "overnight_care",
+        "overnight_stay": "overnight_care",
+        "grooming": "pet_grooming",
+        "training": "pet_training",
+        "feeding": "pet_feeding",
+        "drop_in": "pet_feeding",
+        "transport": "pet_transportation",
+        "medication": "medication_administration",
+        "exotic": "exotic_pet_care",
+        "exotic_pet": "exotic_pet_care",
+        "exotic_pets": "exotic_pet_care",
+        "exotic_pet_sitter": "exotic_pet_care",
+        "reptiles": "exotic_pet_care",
+        "reptile_care": "exotic_pet_care",
+        "senior_care": "elderly_pet_care",
+    },
+    "specializations": {
+        "seniors": "senior_pets",
+        "senior": "senior_pets",
+        "elderly": "senior_pets",
+        "old_dogs": "senior_pets",
+        "exotic": "exotic_pets",
+        "reptiles": "exotic_pets",
+        "puppy": "puppy_care",
+        "anxious": "anxious_pets",
+        "anxiety": "anxious_pets",
+        "medication": "medication_administration",
+        "training": "behavioral_training",
+    },
+    "daysAvailable": {
+        "mon": "monday",
+        "tue": "tuesday",
+        "tues": "tuesday",
+        "wed": "wednesday",
+        "thu": "thursday",
+        "thur": "thursday",
+        "thurs": "thursday",
+        "fri": "friday",
+        "sat": "saturday",
+        "sun": "sunday",
+    },
+}
+
+_SEPARATORS = re.compile(r"[\s\-_/]+")
+
+
+def normalize(value: str) -> str:
+    """Lowercase, trimmed, with runs of spaces, hyphens and slashes folded to one underscore."""
+    return _SEPARATORS.sub("_", value.strip().lower())[:MAX_QUERY_LENGTH].strip("_")
+
+
+def trigrams(value: str) -> set[str]:
+    """Character trigrams of each word, padded so short words and word starts count."""
+    grams = set()
+    for word in _SEPARATORS.split(value.lower().replace(",", " ")):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count as one edit), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: list[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class TrigramIndex:
+    """Fuzzy lookup of the closest term to a query among a fixed set of terms."""
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = sorted(set(terms))
+        self.sizes = []
+        self.postings: dict[str, list[int]] = {}
+        for i, term in enumerate(self.terms):
+            grams = trigrams(term)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def closest(self, query: str, min_similarity: float = MIN_SIMILARITY) -> Optional[str]:
+        """The most similar term (Jaccard similarity of trigram sets), or None below the threshold."""
+        grams = trigrams(query[:MAX_QUERY_LENGTH])
+        shared: Counter[int] = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        best, best_similarity = None, min_similarity
+        for i, common in shared.items():
+            similarity = common / (len(grams) + self.sizes[i] - common)
+            # Ties go to the shorter (more general) term
+            if similarity > best_similarity or (similarity == best_similarity and best is not None and len(self.terms[i]) < len(best)):
+                best, best_similarity = self.terms[i], similarity
+        if best is not None:
+            return best
+
+        # About one typo per four characters, on the few terms sharing the most trigrams
+        query = normalize(query)
+        if len(query) < MIN_EDIT_LENGTH:
+            return None
+        limit = max(1, len(query) // 4)
+        best_distance = limit + 1
+        for i, _ in shared.most_common(EDIT_CANDIDATES):
+            distance = edit_distance(query, normalize(self.terms[i]), limit)
+            if distance < best_distance:
+                best, best_distance = self.terms[i], distance
+        return best
+
+
+class Vocabulary:
+    """Resolves free-form filter values to the catalog's facet terms."""
+
+    def __init__(self, terms: dict[str, Iterable[str]]):
+        self.terms = {facet: set(values) for facet, values in terms.items()}
+        # Normalized form -> term as stored (days keep their case, the rest are lowercase)
+        self.exact = {facet: {normalize(term): term for term in values} for facet, values in self.terms.items()}
+        self.indexes = {facet: TrigramIndex(values) for facet, values in self.terms.items() if facet != "location"}
+        locations = self.terms.get("location", set())
+        # Fuzzy location matches go to a city ("seattle"), not "city, state"
+        self.cities = {term.split(",")[0].strip() for term in locations}
+        self.indexes["location"] = TrigramIndex(self.cities)
+        self._cache: dict[tuple[str, str], Optional[str]] = {}
+
+    def extended(self, terms: dict[str, Iterable[str]]) -> "Vocabulary":
+        """This vocabulary if it already has every term, otherwise a new one including them."""
+        added = {facet: set(values) - self.terms.get(facet, set()) for facet, values in terms.items()}
+        if not any(added.values()):
+            return self
+        return Vocabulary({facet: self.terms.get(facet, set()) | added.get(facet, set()) for facet in self.terms.keys() | added.keys()})
+
+    def resolve(self, facet: str, value: Optional[str]) -> Optional[str]:
+        """The catalog term (or location substring) `value` most likely means; `value` itself if none fits."""
+        if not value:
+            return value
+        key = (facet, value)
+        if key not in self._cache:
+            if len(self._cache) >= _CACHE_SIZE:
+                self._cache.clear()
+            resolved = self._resolve_location(value) if facet == "location" else self._resolve_term(facet, value)
+            self._cache[key] = resolved
+        return self._cache[key] or value
+
+    def _resolve_term(self, facet: str, value: str) -> Optional[str]:
+        matched = self.match(facet, value)
+        if matched:
+            return matched
+        index = self.indexes.get(facet)
+        return index.closest(normalize(value)) if index else None
+
+    def _resolve_location(self, value: str) -> Optional[str]:
+        needle = " ".join(value.lower().split())[:MAX_QUERY_LENGTH]
+        # Aliases first: "la" is a substring of other city names, but means Los Angeles
+        alias = LOCATION_ALIASES.get(needle)
+        if alias and any(alias in term for term in self.terms["location"]):
+            return alias
+        if any(needle in term for term in self.terms["location"]):
+            return needle
+        # "Seattle, Washington" -> try the city part on its own too
+        city = needle.split(",")[0].strip()
+        alias = LOCATION_ALIASES.get(city)
+        if alias and any(alias in term for term in self.terms["location"]):
+            return alias
+        if city != needle and any(city in term for term in self.terms["location"]):
+            return city
+        return self.find_location(needle) or self.indexes["location"].closest(city)
+
+    def find_location(self, text: str) -> Optional[str]:
+        """A city or location alias named by a run of up to three words in `text` ("a place in NY" -> new york)."""
+        words = re.findall(r"[\w.\-]+", text.lower())
+        for size in (3, 2, 1):
+            for start in range(len(words) - size + 1):
+                phrase = " ".join(words[start:start + size]).strip(".")
+                if phrase in self.cities:
+                    return phrase
+                alias = LOCATION_ALIASES.get(phrase)
+                if alias and any(alias in term for term in self.terms["location"]):
+                    return alias
+        return None
+
+    def match(self, facet: str, phrase: str) -> Optional[str]:
+        """Exact or alias match only (no fuzzy matching), for picking terms out of free text."""
+        exact = self.exact.get(facet, {})
+        key = normalize(phrase)
+        if key in exact:
+            return exact[key]
+        alias = TERM_ALIASES.get(facet, {}).get(key)
+        return exact.get(alias) if alias else None
@@ -0,0 +1,177 @@
+import asyncio
+import types
+
+import pytest
+
+from agent_common.admission import AdmissionController, AdmissionRejected, is_throttling_error
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code: int, message: str = ""):
+        super().__init__(message or f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def chained(error: Exception, cause: Exception) -> Exception:
+    error.__cause__ = cause
+    return error
+
+
+def with_response(status_code: int) -> Exception:
+    """Like an SDK error carrying the upstream response."""
+    error = Exception("request failed")
+    error.response = types.SimpleNamespace(status_code=status_code)
+    return error
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (HTTPError(429), True),
+        (HTTPError(500, "rate limit in the message"), False),
+        (with_response(429), True),
+        (with_response(503), False),
+        (RuntimeError("Run failed: Rate limit is exceeded"), True),
+        (RuntimeError("Too Many Requests"), True),
+        (RuntimeError("run failed"), False),
+        (chained(RuntimeError("agent run failed"), HTTPError(429)), True),
+    ],
+)
+def test_is_throttling_error(error, expected):
+    assert is_throttling_error(error) is expected
+
+
+async def hold(admission: AdmissionController, release: asyncio.Event, admitted: list, name: str) -> None:
+    async with admission.slot():
+        admitted.append(name)
+        await release.wait()
+
+
+def test_requests_over_the_limit_wait_in_order():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=2, max_queue=2)
+        release, admitted = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(admission, release, admitted, name)) for name in "abcd"]
+        await asyncio.sleep(0)
+        assert admitted == ["a", "b"]
+        assert admission.stats() == {"limit": 2, "in_flight": 2, "queued": 2, "max_queue": 2, "adaptive": False}
+        release.set()
+        await asyncio.gather(*tasks)
+        assert admitted == ["a", "b", "c", "d"]
+        assert admission.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_a_full_queue_rejects_at_once():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=1, max_queue=1)
+        release, admitted = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(admission, release, admitted, name)) for name in "ab"]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.slot():
+                pass
+        assert rejected.value.reason == "queue_full"
+        # One run ahead and one waiting, at the default 5s per run
+        assert rejected.value.retry_after == 10
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_waiting_longer_than_the_queue_timeout_is_rejected():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=0.01)
+        release, admitted = asyncio.Event(), []
+        task = asyncio.create_task(hold(admission, release, admitted, "a"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.slot():
+                pass
+        assert rejected.value.reason == "queue_timeout"
+        assert admission.stats()["queued"] == 0
+        release.set()
+        await task
+        # The timed-out waiter left no slot behind
+        async with admission.slot():
+            assert admission.stats()["in_flight"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_a_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=1, max_queue=4)
+        release, admitted = asyncio.Event(), []
+        first = asyncio.create_task(hold(admission, release, admitted, "a"))
+        cancelled = asyncio.create_task(hold(admission, release, admitted, "b"))
+        last = asyncio.create_task(hold(admission, release, admitted, "c"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        release.set()
+        await asyncio.gather(first, last)
+        assert admitted == ["a", "c"]
+        assert admission.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+async def run(admission: AdmissionController, error: Exception = None) -> None:
+    try:
+        async with admission.slot():
+            if error:
+                raise error
+    except Exception:
+        pass
+
+
+def test_throttling_halves_the_adaptive_limit_down_to_the_minimum():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=8, adaptive=True, min_concurrency=2)
+        limits = []
+        for _ in range(3):
+            await run(admission, HTTPError(429))
+            limits.append(admission.limit)
+        assert limits == [4, 2, 2]
+        # Other failures leave the limit alone
+        await run(admission, HTTPError(500))
+        assert admission.limit == 2
+
+    asyncio.run(scenario())
+
+
+def test_successes_add_one_slot_per_window():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=4, adaptive=True)
+        await run(admission, HTTPError(429))
+        await run(admission, HTTPError(429))
+        assert admission.limit == 1
+        limits = []
+        for _ in range(7):
+            await run(admission)
+            limits.append(admission.limit)
+        # One success grows a limit of 1, two a limit of 2, three a limit of 3; never past the maximum
+        assert limits == [2, 2, 3, 3, 3, 4, 4]
+
+    asyncio.run(scenario())
+
+
+def test_a_static_limit_ignores_throttling():
+    async def scenario():
+        admission = AdmissionController("test", max_concurrency=4)
+        await run(admission, HTTPError(429))
+        assert admission.limit == 4
+
+    asyncio.run(scenario())
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("AGENT_MAX_CONCURRENCY", "3")
+    monkeypatch.setenv("AGENT_MAX_QUEUE", "0")
+    monkeypatch.setenv("AGENT_ADMISSION_MODE", "Adaptive")
+    monkeypatch.setenv("AGENT_MIN_CONCURRENCY", "5")
+    admission = AdmissionController.from_env("test")
+    assert admission.stats() == {"limit": 3, "in_flight": 0, "queued": 0, "max_queue": 0, "adaptive": True}
+    assert admission.min_concurrency == 3
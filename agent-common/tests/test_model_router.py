@@ -0,0 +1,114 @@
+import asyncio
+import types
+
+import pytest
+
+from agent_common import model_router as model_router_module
+from agent_common.fake_model import FakeChatClient, classify
+from agent_common.model_router import DEFAULT_POLICY, ModelRouter, parse_policy
+from agent_common.retry import RetryPolicy
+
+
+def test_parse_policy_ignores_unknown_tiers():
+    assert parse_policy("") == {}
+    assert parse_policy(" single_source = LARGE ,recommend=fast,answer=huge,=fast") == {
+        "single_source": "large",
+        "recommend": "fast",
+    }
+
+
+def test_the_fast_tier_defaults_to_the_large_deployment(monkeypatch):
+    monkeypatch.setenv("AZURE_MODEL_DEPLOYMENT_NAME", "big")
+    monkeypatch.delenv("AZURE_FAST_MODEL_DEPLOYMENT_NAME", raising=False)
+    monkeypatch.delenv("MODEL_ROUTING_POLICY", raising=False)
+    router = ModelRouter.from_env()
+    assert not router.tiered
+    assert router.deployment("classify") == router.deployment("synthesis") == "big"
+
+    monkeypatch.setenv("AZURE_FAST_MODEL_DEPLOYMENT_NAME", "small")
+    monkeypatch.setenv("MODEL_ROUTING_POLICY", "synthesis=fast")
+    router = ModelRouter.from_env()
+    assert router.tiered
+    assert router.deployment("classify") == router.deployment("synthesis") == "small"
+    assert router.deployment("recommend") == "big"
+
+
+def test_unknown_tasks_run_on_the_large_tier():
+    router = ModelRouter({"large": "big", "fast": "small"}, {})
+    assert router.tier("unheard_of") == "large"
+    assert router.deployment("unheard_of") == "big"
+    assert router.describe()["policy"] == DEFAULT_POLICY
+
+
+@pytest.fixture
+def azure_clients(monkeypatch) -> list:
+    """Records AzureAIAgentClient constructions instead of connecting to Foundry."""
+    built = []
+    real_lazy_import = model_router_module.lazy_import
+
+    def lazy_import(name):
+        if name == "agent_framework_azure_ai":
+            return types.SimpleNamespace(AzureAIAgentClient=lambda **kwargs: built.append(kwargs) or kwargs)
+        return real_lazy_import(name)
+
+    monkeypatch.setattr(model_router_module, "lazy_import", lazy_import)
+    return built
+
+
+def project_client_factory(calls: list):
+    def project_client():
+        calls.append(1)
+        return "project"
+
+    return project_client
+
+
+def test_the_fake_provider_never_builds_a_project_client(azure_clients):
+    calls = []
+    router = ModelRouter({"large": "big", "fast": "small"}, {}, provider="fake", fake_latency=0.5)
+    client = router.chat_client("classify", "Agent", project_client_factory(calls))
+    assert isinstance(client, FakeChatClient)
+    assert (client.model_id, client.task, client.latency) == ("small", "classify", 0.5)
+    assert calls == [] and azure_clients == []
+
+
+@pytest.mark.parametrize("provider", ["azure", "openai"])
+def test_other_providers_use_azure(azure_clients, provider):
+    calls = []
+    router = ModelRouter({"large": "big", "fast": "small"}, {}, provider=provider)
+    router.chat_client("recommend", "Agent", project_client_factory(calls))
+    assert calls == [1]
+    assert azure_clients == [{"project_client": "project", "model_deployment_name": "big", "agent_name": "Agent"}]
+
+
+@pytest.mark.parametrize(
+    "text, route",
+    [
+        ("Find a dog-friendly cafe in Seattle", "listings"),
+        ("I need a dog walker on Saturday", "sitters"),
+        ("A park in NYC and someone to watch my cat", "both"),
+        ("Hello there", "other"),
+    ],
+)
+def test_fake_classify(text, route):
+    assert classify(text) == route
+
+
+def test_agents_run_against_the_fake_provider():
+    from agent_framework import ChatAgent
+
+    router = ModelRouter({"large": "big", "fast": "small"}, {}, provider="fake")
+
+    async def search_things(place: str = "") -> str:
+        """Search things."""
+        return "[]"
+
+    async def scenario(task, message, tools):
+        agent = ChatAgent(chat_client=router.chat_client(task, "Agent", None), tools=tools)
+        result = await router.run(task, agent, message, RetryPolicy("test"), 10)
+        return result.text
+
+    assert asyncio.run(scenario("classify", "a cat sitter please", [])) == "sitters"
+    assert asyncio.run(scenario("classify", "hi", [])).startswith("other\nHello!")
+    assert asyncio.run(scenario("synthesis", "anything", [])) == "[big] Answer to: anything"
+    assert asyncio.run(scenario("synthesis", "anything", [search_things])) == "[big] Answer to: anything (from 1 tool results)"
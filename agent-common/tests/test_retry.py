@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from agent_common.retry import RetryPolicy, ThrottledError, is_retryable_error
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ConnectError(Exception):
+    """Named like httpx's: the request never left."""
+
+
+class ReadTimeout(Exception):
+    """Named like httpx's: the request may have been acted on."""
+
+
+@pytest.mark.parametrize(
+    "error, idempotent, expected",
+    [
+        (HTTPError(503), True, True),
+        (HTTPError(503), False, False),
+        (HTTPError(429), False, True),
+        (ThrottledError("Rate limit is exceeded. Try again in 2 seconds."), False, True),
+        (ConnectError(), False, True),
+        (asyncio.TimeoutError(), True, True),
+        (asyncio.TimeoutError(), False, False),
+        (ReadTimeout("rate limit"), False, False),
+        (HTTPError(400), True, False),
+        (ValueError("bad input"), True, False),
+    ],
+)
+def test_is_retryable_error(error, idempotent, expected):
+    assert is_retryable_error(error, idempotent) is expected
+
+
+def failing(*errors: BaseException):
+    """An operation raising each of `errors` in turn, then returning how many calls it took."""
+    calls = []
+
+    async def operation():
+        calls.append(None)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return len(calls)
+
+    return operation, calls
+
+
+def test_a_throttled_run_is_retried_even_when_not_idempotent():
+    policy = RetryPolicy("test", base_delay=0)
+    operation, _ = failing(ThrottledError("Rate limit is exceeded."), ThrottledError("Rate limit is exceeded."))
+    assert asyncio.run(policy.run(operation, idempotent=False)) == 3
+
+
+def test_a_timed_out_run_is_not_resent():
+    policy = RetryPolicy("test", base_delay=0)
+    operation, calls = failing(asyncio.TimeoutError())
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(policy.run(operation, idempotent=False))
+    assert len(calls) == 1
+
+
+def test_retries_stop_after_max_attempts():
+    policy = RetryPolicy("test", max_attempts=2, base_delay=0)
+    operation, calls = failing(HTTPError(503), HTTPError(503), HTTPError(503))
+    with pytest.raises(HTTPError):
+        asyncio.run(policy.run(operation))
+    assert len(calls) == 2
@@ -0,0 +1,22 @@
+import sys
+import threading
+import time
+
+from agent_common.startup import lazy_import
+
+
+def test_lazy_import_waits_for_an_import_in_progress(tmp_path, monkeypatch):
+    (tmp_path / "slow_module.py").write_text("import time\ntime.sleep(0.2)\nREADY = True\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_module", raising=False)
+
+    # What warm_up_imports does in its worker thread
+    thread = threading.Thread(target=lazy_import, args=("slow_module",))
+    thread.start()
+    while "slow_module" not in sys.modules:
+        time.sleep(0.001)
+    try:
+        assert lazy_import("slow_module").READY
+    finally:
+        thread.join()
+        sys.modules.pop("slow_module", None)
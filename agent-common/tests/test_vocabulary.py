@@ -0,0 +1,45 @@
+import pytest
+
+from agent_common.vocabulary import TrigramIndex, Vocabulary
+
+PETS = ["dogs", "cats", "birds", "reptiles", "small_mammals"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("cats", "cats"),
+        ("reptils", "reptiles"),
+        # One edit away, but a different animal
+        ("rats", None),
+        ("bats", None),
+        ("fish", None),
+    ],
+)
+def test_closest_pet(query, expected):
+    assert TrigramIndex(PETS).closest(query) == expected
+
+
+def test_transpositions_fall_back_to_edit_distance():
+    assert TrigramIndex(DAYS).closest("wendesday") == "Wednesday"
+    assert TrigramIndex(DAYS).closest("thrusday") == "Thursday"
+
+
+def test_resolve():
+    vocabulary = Vocabulary(
+        {
+            "location": {"seattle, wa", "new york, ny", "san francisco, ca"},
+            "typeOfPets": set(PETS),
+            "services": {"dog_walking", "overnight_care", "exotic_pet_care"},
+        }
+    )
+    assert vocabulary.resolve("location", "NYC") == "new york"
+    assert vocabulary.resolve("location", "Seatle") == "seattle"
+    assert vocabulary.resolve("location", "San Fransisco") == "san francisco"
+    assert vocabulary.resolve("services", "Dog Walking") == "dog_walking"
+    assert vocabulary.resolve("services", "reptiles") == "exotic_pet_care"
+    assert vocabulary.resolve("typeOfPets", "kitten") == "cats"
+    # Nothing close enough: passed through, to match nothing
+    assert vocabulary.resolve("typeOfPets", "rats") == "rats"
+    assert vocabulary.resolve("location", "Boston") == "Boston"
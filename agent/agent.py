@@ -1,40 +1,57 @@
-from fastapi import FastAPI, HTTPException
+from agent_common.startup import WARMUP_MODE, lazy_import, log_report, mark, readiness, report, run_warm_up
+
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from fastapi.security import APIKeyHeader
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import List, Optional
+import asyncio
+import hmac
 import uuid
 import logging
+import math
 import os
+import orjson
+
+from agent_common.admission import AdmissionController, AdmissionRejected
+from agent_common.loop_monitor import LoopMonitor
+from agent_common.profiling import ProfilingMiddleware
+from agent_common.telemetry import init_telemetry, shutdown_telemetry
+from http_cache import ResponseCache, etag
+from listings_catalog import REVIEW_COMPACT_INTERVAL, catalog as listings_catalog, get_catalog, normalized_query
+from agent_common.retry import RetryPolicy, ThrottledError, estimate_tokens, is_retryable_error, retry_after_seconds
+
+# Azure AI and agent-framework are imported by load_azure_sdks() after the server is up
+# (they dominate cold start); fallback mode is used if they are unavailable
+AIProjectClient = None
+DefaultAzureCredential = None
+ChatAgent = None
+AzureAIAgentClient = None
+AZURE_AI_AVAILABLE = False
+AGENT_FRAMEWORK_AVAILABLE = False
+
+
+def load_azure_sdks():
+    """Import the Azure AI and agent-framework SDKs; blocking, so run it in a worker thread."""
+    global AIProjectClient, DefaultAzureCredential, ChatAgent, AzureAIAgentClient
+    global AZURE_AI_AVAILABLE, AGENT_FRAMEWORK_AVAILABLE
+    try:
+        AIProjectClient = lazy_import("azure.ai.projects.aio").AIProjectClient
+        DefaultAzureCredential = lazy_import("azure.identity.aio").DefaultAzureCredential
+        AZURE_AI_AVAILABLE = True
+    except ImportError as e:
+        logging.warning(f"Azure AI libraries not available: {e}")
 
-# Try to import Azure AI and agent-framework, but provide fallback if unavailable
-try:
-    from azure.ai.projects.aio import AIProjectClient
-    from azure.identity.aio import DefaultAzureCredential
-    from azure.core.exceptions import AzureError
-    AZURE_AI_AVAILABLE = True
-except ImportError as e:
-    logging.warning(f"Azure AI libraries not available: {e}")
-    AIProjectClient = None
-    DefaultAzureCredential = None
-    AzureError = Exception
-    AZURE_AI_AVAILABLE = False
-
-try:
-    from agent_framework import ChatAgent
-    from agent_framework_azure_ai import AzureAIAgentClient
-    AGENT_FRAMEWORK_AVAILABLE = True
-except ImportError as e:
-    logging.warning(f"agent-framework not available: {e}")
-    ChatAgent = None
-    AzureAIAgentClient = None
-    AGENT_FRAMEWORK_AVAILABLE = False
+    try:
+        ChatAgent = lazy_import("agent_framework").ChatAgent
+        AzureAIAgentClient = lazy_import("agent_framework_azure_ai").AzureAIAgentClient
+        AGENT_FRAMEWORK_AVAILABLE = True
+    except ImportError as e:
+        logging.warning(f"agent-framework not available: {e}")
 
 # OpenTelemetry imports
-from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 # Configure logging
@@ -46,6 +63,8 @@ logger = logging.getLogger(__name__)
 AZURE_OPENAI_ENDPOINT = os.environ.get("AZURE_OPENAI_ENDPOINT")
 AGENT_ID = os.environ.get("AGENT_ID")
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3000")
+# Key the review endpoint requires in X-API-Key; reviews are refused while it is unset
+LISTINGS_ADMIN_API_KEY = os.environ.get("LISTINGS_ADMIN_API_KEY", "")
 
 # Parse CORS origins - can be a single URL or comma-separated list
 cors_origins = [origin.strip() for origin in FRONTEND_URL.split(",")]
@@ -54,6 +73,18 @@ logger.info(f"CORS origins configured: {cors_origins}")
 # Global state for ChatAgent
 chat_agent = None
 
+# Bounds concurrent agent runs for /agent/chat (AGENT_MAX_CONCURRENCY, AGENT_MAX_QUEUE, ...)
+admission = AdmissionController.from_env("listings-chat")
+
+# Event-loop lag and slow callback metrics (LOOP_MONITOR_INTERVAL_MS, LOOP_SLOW_CALLBACK_MS)
+loop_monitor = LoopMonitor.from_env("listings")
+
+# ETags, 304s and recently rendered bodies for catalog reads (RESPONSE_CACHE_CONTROL, RESPONSE_CACHE_SIZE)
+response_cache = ResponseCache.from_env("listings")
+
+# Retries throttled/transient Azure AI calls (AGENT_RETRY_*, AZURE_MODEL_RPM_LIMIT, AZURE_MODEL_TPM_LIMIT)
+retry_policy = RetryPolicy.from_env("listings-agent")
+
 # Pydantic models for API
 class ChatMessage(BaseModel):
     id: str
@@ -69,6 +100,19 @@ class ChatResponse(BaseModel):
     message: ChatMessage
     suggestions: Optional[List[str]] = None
 
+class ReviewCreate(BaseModel):
+    reviewer: str
+    rating: int = Field(ge=1, le=5)
+    comment: str = ""
+
+class ListingSearchRequest(BaseModel):
+    location: Optional[str] = None  # substring of the address, e.g. "Seattle"
+    pet_type: Optional[str] = None  # e.g. "dogs", "cats", "reptiles"
+    venue_type: Optional[str] = None  # park, cafe, home, hotel, custom
+    amenity: Optional[str] = None  # substring of an amenity, e.g. "outdoor"
+    max_price: Optional[float] = None
+    limit: int = 5
+
 # Initialize Azure AI client and ChatAgent
 ai_client = None
 
@@ -79,16 +123,18 @@ async def init_azure_client():
     print(f"🔍 AZURE_OPENAI_ENDPOINT: {AZURE_OPENAI_ENDPOINT}")
     print(f"🔍 AGENT_ID: {AGENT_ID}")
     
-    if not AZURE_OPENAI_ENDPOINT:
+    if not AZURE_OPENAI_ENDPOINT or not AZURE_AI_AVAILABLE:
         print("Azure AI not configured. Using fallback mode.")
         return
     
     try:
         # Initialize AIProjectClient with the AI Foundry project endpoint
         print("🔍 Attempting connection string initialization...")
+        # SDK retries off: retry_policy is the only retry layer
         ai_client = AIProjectClient.from_connection_string(
             credential=DefaultAzureCredential(),
-            conn_str=AZURE_OPENAI_ENDPOINT
+            conn_str=AZURE_OPENAI_ENDPOINT,
+            retry_total=0
         )
         print(f"✓ Azure AI client initialized successfully for endpoint: {AZURE_OPENAI_ENDPOINT}")
     except Exception as e:
@@ -98,7 +144,8 @@ async def init_azure_client():
             print("🔍 Attempting direct endpoint initialization...")
             ai_client = AIProjectClient(
                 credential=DefaultAzureCredential(),
-                endpoint=AZURE_OPENAI_ENDPOINT
+                endpoint=AZURE_OPENAI_ENDPOINT,
+                retry_total=0
             )
             print(f"✓ Azure AI client initialized with direct endpoint: {AZURE_OPENAI_ENDPOINT}")
         except Exception as e2:
@@ -195,7 +242,38 @@ async def init_chat_agent():
         logger.error(f"✗ Failed to initialize ChatAgent: {e}", exc_info=True)
         chat_agent = None
 
-app = FastAPI(title="Octopets Agent API", version="1.0.0")
+# Background initialization of the SDKs, Azure client and ChatAgent
+_init_task: Optional[asyncio.Task] = None
+
+async def initialize_agent() -> list[str]:
+    """Load the SDKs off the event loop, then connect the Azure client and resolve the
+    Foundry agent (which acquires the first AAD token); returns the steps that failed"""
+    failed = await run_warm_up("listings", {
+        "agent_stack": lambda: asyncio.to_thread(load_azure_sdks),
+        "azure_client": init_azure_client,
+        "agent": init_chat_agent,
+    })
+    if not failed:
+        mark("agent_initialized")
+    return failed
+
+async def warm_up_catalog():
+    """Build the listings catalog indexes ahead of the first search; optional, since
+    searches load the catalog on first use and chat doesn't need it"""
+    await run_warm_up("listings_data", {"catalog": get_catalog}, optional=["catalog"])
+
+async def ensure_initialized():
+    """Wait for agent initialization, starting it now if it was deferred (AGENT_WARMUP=lazy)"""
+    global _init_task
+    if _init_task is None:
+        _init_task = asyncio.create_task(initialize_agent())
+    # Shielded so a cancelled request doesn't cancel initialization for everyone else
+    failed = await asyncio.shield(_init_task)
+    if failed:
+        raise RuntimeError(f"Agent initialization failed at {', '.join(failed)} (see /debug/startup)")
+
+# orjson renders responses several times faster than the stdlib encoder
+app = FastAPI(title="Octopets Agent API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # CORS middleware to allow frontend connections
 app.add_middleware(
@@ -206,12 +284,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Instrument FastAPI with OpenTelemetry
-trace.set_tracer_provider(TracerProvider())
-otlpExporter = OTLPSpanExporter(endpoint=os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"))
-processor = BatchSpanProcessor(otlpExporter)
-trace.get_tracer_provider().add_span_processor(processor)
+# Opt-in per-request profiling, by admin header or sampling rate (see agent_common.profiling)
+app.add_middleware(ProfilingMiddleware, service="listings")
 
+# Instrument FastAPI with OpenTelemetry; providers and exporters are created per worker
+# process at startup (see agent_common.telemetry) so exporter threads and gRPC channels are never
+# shared across a fork
 FastAPIInstrumentor().instrument_app(app)
 
 
@@ -224,15 +302,49 @@ async def root():
         "message": "Octopets Agent API is running! 🐾",
         "azure_ai_status": azure_status,
         "agent_status": agent_status,
-        "agent_id": AGENT_ID if ai_client else None
+        "agent_id": AGENT_ID if ai_client else None,
+        "admission": admission.stats(),
+        "event_loop": loop_monitor.stats(),
+        "response_cache": response_cache.stats()
     }
 
+@app.get("/debug/startup")
+async def startup_report():
+    """Cold start timings for this worker: startup phases and lazy import durations"""
+    return report()
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 503 until this worker's warm-up has completed"""
+    state = readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize Azure client and ChatAgent on startup"""
-    await init_azure_client()
+    """Per-worker initialization: telemetry exporters, then Azure client and ChatAgent in the background"""
+    global _init_task
+    mark("imported")
+    init_telemetry()
+    mark("telemetry")
+    loop_monitor.start()
+    if WARMUP_MODE == "background":
+        _init_task = asyncio.create_task(initialize_agent())
+        asyncio.create_task(warm_up_catalog())
+    if REVIEW_COMPACT_INTERVAL > 0:
+        asyncio.create_task(listings_catalog.run_compaction())
+    log_report()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release this worker's Azure client and flush telemetry"""
+    if _init_task and not _init_task.done():
+        _init_task.cancel()
     if ai_client:
-        await init_chat_agent()
+        await ai_client.close()
+    loop_monitor.stop()
+    shutdown_telemetry()
 
 @app.post("/agent/chat", response_model=ChatResponse)
 async def chat_with_agent(request: ChatRequest):
@@ -244,7 +356,8 @@ async def chat_with_agent(request: ChatRequest):
     """
     try:
         # Generate response using ChatAgent (handles conversation state internally)
-        agent_response_content = await generate_agent_response(request.message)
+        async with admission.slot():
+            agent_response_content = await generate_agent_response(request.message)
         
         # Create agent response message for frontend
         agent_message = ChatMessage(
@@ -259,9 +372,71 @@ async def chat_with_agent(request: ChatRequest):
             suggestions=None
         )
         
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
+        if is_retryable_error(e):
+            retry_after = retry_after_seconds(e) or admission.retry_after()
+            raise HTTPException(
+                status_code=503,
+                detail="The AI service is busy, please retry shortly.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+async def search_response(request: Request, criteria: ListingSearchRequest) -> Response:
+    """Search results tagged with the catalog version and the normalized criteria"""
+    try:
+        catalog = await get_catalog()
+        query = normalized_query(criteria.model_dump())
+
+        async def render() -> bytes:
+            return orjson.dumps(catalog.search(**query))
+
+        return await response_cache.respond(request, etag("search", catalog.tag, query), render)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+@app.post("/api/search")
+async def search_listings(request: Request, criteria: ListingSearchRequest):
+    """Structured listing search over the catalog (no LLM involved); best rated first"""
+    return await search_response(request, criteria)
+
+@app.get("/api/search")
+async def search_listings_by_query(request: Request, criteria: ListingSearchRequest = Depends()):
+    """Listing search with the criteria as query parameters; revalidate with If-None-Match for a 304"""
+    return await search_response(request, criteria)
+
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+async def require_admin_key(api_key: Optional[str] = Security(api_key_header)) -> None:
+    """Authorize a catalog write: X-API-Key must match LISTINGS_ADMIN_API_KEY"""
+    if not LISTINGS_ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Catalog writes are disabled: LISTINGS_ADMIN_API_KEY is not set")
+    if not api_key or not hmac.compare_digest(api_key.encode(), LISTINGS_ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Missing or invalid API key", headers={"WWW-Authenticate": "ApiKey"})
+
+@app.post("/api/listings/{listing_id}/reviews", status_code=201, dependencies=[Depends(require_admin_key)])
+async def add_review(listing_id: int, request: ReviewCreate):
+    """Append a review; the listing's rating aggregates update immediately"""
+    catalog = await get_catalog()
+    result = await catalog.add_review(listing_id, request.reviewer, request.rating, request.comment)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Listing {listing_id} not found")
+    review, aggregate = result
+    return {"review": review, **aggregate.to_dict()}
+
+@app.get("/api/listings/{listing_id}/reviews/summary")
+async def review_summary(request: Request, listing_id: int):
+    """Review count, average rating and star distribution for a listing"""
+    catalog = await get_catalog()
+    position = catalog.position(listing_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"Listing {listing_id} not found")
+    body = orjson.dumps({"listingId": listing_id, **catalog.aggregate(position).to_dict()})
+    # Tagged by the summary itself, so reviews of other listings don't invalidate it
+    return response_cache.tagged(request, etag("review-summary", body.decode()), body)
+
 # Agent logic functions using ChatAgent
 async def generate_agent_response(user_message: str) -> str:
     """
@@ -270,6 +445,7 @@ async def generate_agent_response(user_message: str) -> str:
     The ChatAgent framework abstraction may not properly invoke file search tools,
     so we use the lower-level agents API directly.
     """
+    await ensure_initialized()
     if not ai_client or not AGENT_ID:
         logger.warning("Agent not available, falling back to placeholder response")
         return "Agent not connected"
@@ -278,7 +454,7 @@ async def generate_agent_response(user_message: str) -> str:
         print(f"🔍 Sending message to agent: {user_message[:100]}...")
         
         # Get agent definition to extract tool_resources
-        agent_def = await ai_client.agents.get_agent(AGENT_ID)
+        agent_def = await retry_policy.run(lambda: ai_client.agents.get_agent(AGENT_ID))
         
         # Create thread with the agent's vector store for file_search
         # This is CRITICAL - thread must have tool_resources attached for file search to work
@@ -296,23 +472,39 @@ async def generate_agent_response(user_message: str) -> str:
                     )
         
         # Create thread with tool_resources attached
-        thread = await ai_client.agents.threads.create(tool_resources=thread_tool_resources)
+        thread = await retry_policy.run(
+            lambda: ai_client.agents.threads.create(tool_resources=thread_tool_resources), idempotent=False
+        )
         print(f"✓ Created thread: {thread.id}")
         
         # Create a message in the thread
-        message = await ai_client.agents.messages.create(
+        message = await retry_policy.run(lambda: ai_client.agents.messages.create(
             thread_id=thread.id,
             role="user",
             content=user_message
-        )
+        ), idempotent=False)
         print(f"✓ Created message: {message.id}")
         
         # Run the agent with additional instructions to force file search usage
         print(f"🔍 Creating run with agent_id: {AGENT_ID}")
-        run = await ai_client.agents.runs.create_and_process(
-            thread_id=thread.id,
-            agent_id=AGENT_ID,
-            additional_instructions="Always search the knowledge base first before providing information. Use the file_search tool to find specific venues and locations from the uploaded documents."
+        async def create_and_process():
+            run = await ai_client.agents.runs.create_and_process(
+                thread_id=thread.id,
+                agent_id=AGENT_ID,
+                additional_instructions="Always search the knowledge base first before providing information. Use the file_search tool to find specific venues and locations from the uploaded documents."
+            )
+            # Throttled runs come back as failed runs rather than HTTP 429s
+            if run.status == "failed" and run.last_error and getattr(run.last_error, "code", None) == "rate_limit_exceeded":
+                raise ThrottledError(getattr(run.last_error, "message", None) or str(run.last_error))
+            return run
+        
+        deployment = getattr(agent_def, "model", None) or os.environ.get("AZURE_MODEL_DEPLOYMENT_NAME", "gpt-4.1")
+        # A run that timed out or hit a 5xx may still be running (and billed); only a throttled one is retried
+        run = await retry_policy.run(
+            create_and_process,
+            deployment=deployment,
+            estimated_tokens=estimate_tokens(user_message),
+            idempotent=False,
         )
         
         print(f"✓ Run completed with status: {run.status}")
@@ -360,9 +552,10 @@ async def generate_agent_response(user_message: str) -> str:
             return "I encountered an error processing your request."
         
         # Get the agent's response messages
-        messages = []
-        async for msg in ai_client.agents.messages.list(thread_id=thread.id):
-            messages.append(msg)
+        async def list_messages():
+            return [msg async for msg in ai_client.agents.messages.list(thread_id=thread.id)]
+        
+        messages = await retry_policy.run(list_messages)
         
         # Get the latest assistant message
         for msg in messages:
@@ -388,6 +581,10 @@ async def generate_agent_response(user_message: str) -> str:
         return "I couldn't generate a response. Please try again."
         
     except Exception as e:
+        if is_retryable_error(e):
+            # Retries are exhausted; surface as 503 + Retry-After rather than "Agent not connected"
+            logger.warning(f"Agent call still failing after retries: {e}")
+            raise
         logger.error(f"Error in agent response: {e}")
         print(f"❌ Error in agent response: {e}")
         import traceback
@@ -398,4 +595,7 @@ if __name__ == "__main__":
     import uvicorn
     
     port = int(os.environ.get("PORT", 8001))
-    uvicorn.run(app, port=port)
\ No newline at end of file
+    # WEB_CONCURRENCY > 1 runs that many worker processes; each initializes its own
+    # telemetry and Azure clients at startup and maps the shared catalog snapshot
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    uvicorn.run("agent:app", port=port, workers=workers)
\ No newline at end of file
@@ -0,0 +1,131 @@
+"""
+HTTP caching for catalog reads
+
+Catalog read endpoints (searches, facet counts, single records) are pure
+functions of the request and the catalog version, so their responses are
+tagged and reused instead of recomputed:
+
+- each response carries an ETag hashed from the endpoint, the catalog
+  version and the normalized query, so equivalent queries ("NYC" and
+  "New York") share a tag and any write, review or reload changes it.
+  Single records are tagged by their own bytes, so a record's tag survives
+  writes to other records
+- GET requests whose If-None-Match matches get 304 Not Modified, no body
+- every tagged response carries Cache-Control: RESPONSE_CACHE_CONTROL.
+  The default "no-cache" lets browsers and proxies keep a copy but
+  revalidate it on every use (a 304 when nothing changed); something like
+  "public, max-age=5" lets them, and the frontend's nginx proxy_cache,
+  answer polls for a few seconds without asking at all
+- rendered bodies are kept in a per-worker LRU keyed by the ETag
+  (RESPONSE_CACHE_SIZE entries, 0 disables it), so an identical query from
+  another client costs a hash and a dictionary lookup
+
+Catalog versions are identical in every worker that has caught up with the
+same data (see the catalogs' `tag`), so tags issued by one worker validate
+against any other. Outcomes are counted in http_cache.requests.
+"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from opentelemetry import metrics
+
+meter = metrics.get_meter(__name__)
+_requests = meter.create_counter(
+    "http_cache.requests",
+    description="Tagged read requests, by cache and outcome (hit, miss, not_modified, uncached)",
+)
+
+# Cache-Control sent with every tagged response
+RESPONSE_CACHE_CONTROL = os.getenv("RESPONSE_CACHE_CONTROL", "no-cache")
+# Rendered response bodies kept per worker; 0 disables the server-side cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+
+def etag(*parts) -> str:
+    """A strong ETag for a response determined by `parts` (JSON-serializable, dict order ignored)."""
+    key = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return f'"{hashlib.blake2b(key, digest_size=16).hexdigest()}"'
+
+
+def matches(if_none_match: str, tag: str) -> bool:
+    """If-None-Match semantics: "*" or any listed tag, compared weakly (W/ prefixes ignored)."""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or tag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+class ResponseCache:
+    """Tags read responses, answers revalidations with 304 and keeps recent bodies in an LRU."""
+
+    def __init__(self, name: str, max_entries: int = 1024, cache_control: str = "no-cache"):
+        self.name = name
+        self.max_entries = max_entries
+        self.cache_control = cache_control
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._bodies: OrderedDict[str, bytes] = OrderedDict()
+
+    @classmethod
+    def from_env(cls, name: str) -> "ResponseCache":
+        """Build a cache from RESPONSE_CACHE_* environment variables."""
+        return cls(name, max_entries=RESPONSE_CACHE_SIZE, cache_control=RESPONSE_CACHE_CONTROL)
+
+    def stats(self) -> dict:
+        """Current cache usage, suitable for health/diagnostic endpoints."""
+        return {
+            "entries": len(self._bodies),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+    def _count(self, outcome: str) -> None:
+        _requests.add(1, {"cache": self.name, "outcome": outcome})
+
+    def _revalidated(self, request: Request, tag: str) -> bool:
+        # Conditional GETs only: for other methods a matching tag means 412, not 304
+        if request.method != "GET" or not matches(request.headers.get("if-none-match", ""), tag):
+            return False
+        self.not_modified += 1
+        self._count("not_modified")
+        return True
+
+    def _response(self, tag: str, body: Optional[bytes] = None) -> Response:
+        """The body with its validators, or 304 Not Modified (the validators alone) without one."""
+        headers = {"ETag": tag, "Cache-Control": self.cache_control}
+        if body is None:
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def tagged(self, request: Request, tag: str, body: bytes) -> Response:
+        """A response for an already rendered body, or 304 if the client has it."""
+        if self._revalidated(request, tag):
+            return self._response(tag)
+        self._count("uncached")
+        return self._response(tag, body)
+
+    async def respond(self, request: Request, tag: str, render: Callable[[], Awaitable[bytes]]) -> Response:
+        """A response for `tag`: 304 if the client has it, else the cached body, else `render()`'s."""
+        if self._revalidated(request, tag):
+            return self._response(tag)
+        body = self._bodies.get(tag)
+        if body is not None:
+            self._bodies.move_to_end(tag)
+            self.hits += 1
+            self._count("hit")
+            return self._response(tag, body)
+
+        body = await render()
+        self.misses += 1
+        self._count("miss")
+        if self.max_entries > 0:
+            self._bodies[tag] = body
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return self._response(tag, body)
@@ -0,0 +1,341 @@
+"""
+Listings Catalog
+
+In-memory view of the pet-friendly venue listings (data/listing.json), backed
+by a compiled snapshot (see snapshot.py) with numeric columns and per-facet
+posting lists. Build the snapshot offline with:
+
+    python listings_catalog.py build-snapshot
+
+When no snapshot exists, or it is older than the JSON source, the JSON is
+parsed and the same structure is built in memory. Loading runs in a worker
+thread so it never blocks the event loop.
+
+Review aggregates (count, rating sum, star distribution) are snapshot
+columns, and reviews submitted since the last compaction are folded in from
+the review log (see reviews.py), so rating-sorted searches cost the same no
+matter how many reviews a listing has.
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from reviews import STARS, ReviewAggregate, ReviewLog, compact, new_review
+from snapshot import Snapshot, SnapshotError, build_snapshot, ensure_snapshot, is_current, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = Path(os.getenv("LISTINGS_DATA_PATH", Path(__file__).parent / "data" / "listing.json"))
+SNAPSHOT_PATH = Path(os.getenv("LISTINGS_SNAPSHOT_PATH", DATA_PATH.with_suffix(".snap")))
+# How often (seconds) to check the data file for changes; 0 disables hot reload
+RELOAD_INTERVAL = float(os.getenv("LISTINGS_RELOAD_INTERVAL_SECONDS", "5"))
+# Compile the snapshot at startup when missing/stale so every worker process maps one
+# shared copy instead of each parsing its own (on by default with WEB_CONCURRENCY > 1)
+SNAPSHOT_AUTOBUILD = os.getenv(
+    "CATALOG_SNAPSHOT_AUTOBUILD", "true" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "false"
+).lower() == "true"
+# Reviews submitted through the API, waiting to be compacted into the JSON dataset
+REVIEW_LOG_PATH = Path(os.getenv("LISTINGS_REVIEW_LOG_PATH", DATA_PATH.with_name("listing-reviews.jsonl")))
+# How often (seconds) to merge the review log into the dataset; 0 disables background compaction
+REVIEW_COMPACT_INTERVAL = float(os.getenv("LISTINGS_REVIEW_COMPACT_INTERVAL_SECONDS", "300"))
+
+
+def _review_aggregate(listing: dict) -> ReviewAggregate:
+    aggregate = ReviewAggregate()
+    for review in listing.get("reviews") or []:
+        aggregate.add(review["rating"])
+    return aggregate
+
+
+# Numeric columns and facet terms compiled into the snapshot
+LISTING_COLUMNS = {
+    "id": lambda l: l["id"],
+    "price": lambda l: l.get("price") or 0,
+    "rating": lambda l: _review_aggregate(l).average,
+    "reviewCount": lambda l: len(l.get("reviews") or []),
+    "ratingSum": lambda l: sum(r["rating"] for r in l.get("reviews") or []),
+    **{f"stars{star}": (lambda l, star=star: sum(r["rating"] == star for r in l.get("reviews") or [])) for star in STARS},
+}
+LISTING_FACETS = {
+    "location": lambda l: [l["location"].lower()],
+    "type": lambda l: [l["type"].lower()],
+    "allowedPets": lambda l: [p.lower() for p in l["allowedPets"]],
+    "amenities": lambda l: [a.lower() for a in l["amenities"]],
+}
+
+
+def listing_summary(listing: dict, aggregate: ReviewAggregate) -> dict:
+    """Search result view of a listing: review text replaced by its rating aggregates."""
+    summary = {k: v for k, v in listing.items() if k not in ("reviews", "createdAt", "updatedAt")}
+    summary.update(aggregate.to_dict())
+    return summary
+
+
+def normalized_query(criteria: dict) -> dict:
+    """Search criteria as search() compares them (case-insensitive, empty means unset), for cache keys."""
+    return {name: (value.lower() or None) if isinstance(value, str) else value for name, value in criteria.items()}
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _read_json(path: Path) -> list[dict]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def open_snapshot(
+    data_path: Path = DATA_PATH,
+    snapshot_path: Path = SNAPSHOT_PATH,
+    autobuild: bool = SNAPSHOT_AUTOBUILD,
+) -> Snapshot:
+    """Map the compiled snapshot if it is current, otherwise build one from the JSON source."""
+    if autobuild and not is_current(snapshot_path, data_path):
+        try:
+            ensure_snapshot(
+                snapshot_path,
+                data_path,
+                lambda: build_snapshot(_read_json(data_path), LISTING_COLUMNS, LISTING_FACETS, meta={"source": data_path.name}),
+            )
+        except OSError as e:
+            logger.warning(f"Could not compile {snapshot_path}, each worker will parse JSON: {e}")
+    if is_current(snapshot_path, data_path):
+        try:
+            snapshot = Snapshot.open(snapshot_path)
+            missing = set(LISTING_COLUMNS) - set(snapshot.columns)
+            if not missing:
+                return snapshot
+            logger.warning(f"{snapshot_path} lacks columns {sorted(missing)}; rebuild it with build-snapshot")
+        except SnapshotError as e:
+            logger.warning(f"Ignoring unusable snapshot: {e}")
+    elif snapshot_path.exists():
+        logger.warning(f"{snapshot_path} is stale (older than {data_path} or an old format); falling back to JSON")
+    return Snapshot.from_records(_read_json(data_path), LISTING_COLUMNS, LISTING_FACETS)
+
+
+class ListingCatalog:
+    """In-memory view of the listings dataset."""
+
+    def __init__(self, path: Path, snapshot_path: Path):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.snapshot: Optional[Snapshot] = None
+        self._positions: Optional[dict[int, int]] = None
+        self._signature: Optional[tuple] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self.review_log = ReviewLog(REVIEW_LOG_PATH)
+        # Per-position aggregates of reviews logged since the snapshot was built
+        self._review_deltas: dict[int, ReviewAggregate] = {}
+        # Reviews read from the log since the snapshot was loaded; with its checksum, the catalog version
+        self._reviews_applied = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.snapshot is not None
+
+    @property
+    def tag(self) -> str:
+        """The current version's identity for HTTP caching, the same in every worker that has read the same log."""
+        return f"{self.snapshot.checksum:08x}.{self._reviews_applied}"
+
+    def _file_signature(self) -> tuple:
+        return (_mtime(self.path), _mtime(self.snapshot_path))
+
+    def _read(self) -> tuple[Snapshot, tuple]:
+        """Blocking map/parse and checksum; always called from a worker thread."""
+        signature = self._file_signature()
+        snapshot = open_snapshot(self.path, self.snapshot_path)
+        # Hashed here rather than on the event loop by the first tagged response
+        snapshot.checksum
+        return snapshot, signature
+
+    async def reload(self) -> None:
+        """Re-read the data off the event loop and swap it in atomically."""
+        async with self._lock:
+            snapshot, signature = await asyncio.to_thread(self._read)
+            self.snapshot = snapshot
+            self._positions = None
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            # The new snapshot includes every compacted review; replay what is still logged
+            self._review_deltas = {}
+            self._reviews_applied = 0
+            self.review_log.rewind()
+            self._apply_reviews(await asyncio.to_thread(self.review_log.tail))
+            logger.info(f"Loaded {snapshot.count} listings from {snapshot.source}")
+
+    async def ensure_loaded(self) -> None:
+        """Load on first use, then pick up file changes and new reviews at most every RELOAD_INTERVAL seconds."""
+        if not self.loaded:
+            await self.reload()
+            return
+        if RELOAD_INTERVAL <= 0 or time.monotonic() - self._checked_at < RELOAD_INTERVAL:
+            return
+        self._checked_at = time.monotonic()
+        signature = await asyncio.to_thread(self._file_signature)
+        if signature != self._signature:
+            await self.reload()
+        else:
+            await self.refresh_reviews()
+
+    def _apply_reviews(self, reviews: list[dict]) -> None:
+        self._reviews_applied += len(reviews)
+        for review in reviews:
+            position = self.position(review["listingId"])
+            if position is not None:
+                self._review_deltas.setdefault(position, ReviewAggregate()).add(review["rating"])
+
+    async def refresh_reviews(self) -> None:
+        """Fold in reviews appended to the log since the last refresh (by any worker)."""
+        async with self._lock:
+            self._apply_reviews(await asyncio.to_thread(self.review_log.tail))
+
+    def aggregate(self, position: int) -> ReviewAggregate:
+        """Compacted review aggregates from the snapshot plus reviews logged since, in O(1)."""
+        snapshot = self.snapshot
+        base = ReviewAggregate(
+            int(snapshot.column("reviewCount")[position]),
+            snapshot.column("ratingSum")[position],
+            [int(snapshot.column(f"stars{star}")[position]) for star in STARS],
+        )
+        return base.merged(self._review_deltas.get(position))
+
+    async def add_review(self, listing_id: int, reviewer: str, rating: int, comment: str) -> Optional[tuple[dict, ReviewAggregate]]:
+        """Append a review to the log and update the running aggregates; None if the listing doesn't exist."""
+        position = self.position(listing_id)
+        if position is None:
+            return None
+        review = new_review(listing_id, reviewer, rating, comment)
+        await asyncio.to_thread(self.review_log.append, review)
+        # Tailing picks up this review along with any other worker's since the last refresh
+        await self.refresh_reviews()
+        return review, self.aggregate(position)
+
+    def _rebuild_snapshot(self, listings: list[dict]) -> None:
+        """Recompile the snapshot after compaction, if one is in use."""
+        if self.snapshot_path.exists():
+            write_snapshot(self.snapshot_path, build_snapshot(listings, LISTING_COLUMNS, LISTING_FACETS, meta={"source": self.path.name}))
+
+    async def compact_reviews(self) -> int:
+        """Merge the review log into the JSON dataset (and snapshot), then reload."""
+        merged = await asyncio.to_thread(compact, self.path, self.review_log.path, self._rebuild_snapshot)
+        if merged:
+            logger.info(f"Compacted {merged} reviews into {self.path}")
+            await self.reload()
+        return merged
+
+    async def run_compaction(self, interval: float = REVIEW_COMPACT_INTERVAL) -> None:
+        """Background task: compact the review log every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.compact_reviews()
+            except Exception as e:
+                logger.error(f"Review compaction failed: {e}")
+
+    def position(self, listing_id: int) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {int(v): i for i, v in enumerate(self.snapshot.column("id"))}
+        return self._positions.get(listing_id)
+
+    def get(self, listing_id: int) -> Optional[dict]:
+        position = self.position(listing_id)
+        return self.snapshot.record(position) if position is not None else None
+
+    def search(
+        self,
+        location: Optional[str] = None,
+        pet_type: Optional[str] = None,
+        venue_type: Optional[str] = None,
+        amenity: Optional[str] = None,
+        max_price: Optional[float] = None,
+        limit: int = 5,
+    ) -> list[dict]:
+        """Filter listings and return summaries of the best rated matches first."""
+        snapshot = self.snapshot
+        postings = []
+
+        # Location and amenity are substring matches, so union every matching term
+        for facet, needle in (("location", location), ("amenities", amenity)):
+            if needle:
+                matched = set()
+                for term in snapshot.terms(facet):
+                    if needle.lower() in term:
+                        matched.update(snapshot.postings(facet, term))
+                postings.append(matched)
+
+        if pet_type:
+            postings.append(snapshot.postings("allowedPets", pet_type.lower()))
+        if venue_type:
+            postings.append(snapshot.postings("type", venue_type.lower()))
+
+        if postings:
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates.intersection_update(other)
+            candidates = sorted(candidates)
+        else:
+            candidates = range(snapshot.count)
+
+        if max_price is not None:
+            prices = snapshot.column("price")
+            candidates = [i for i in candidates if prices[i] <= max_price]
+
+        rating, reviews = snapshot.column("rating"), snapshot.column("reviewCount")
+
+        def rank(i: int) -> tuple[float, float]:
+            # Listings with reviews logged since the snapshot was built use their running aggregate
+            if i in self._review_deltas:
+                aggregate = self.aggregate(i)
+                return aggregate.average, aggregate.count
+            return rating[i], reviews[i]
+
+        top = heapq.nlargest(limit, candidates, key=rank)
+        return [listing_summary(snapshot.record(i), self.aggregate(i)) for i in top]
+
+
+catalog = ListingCatalog(DATA_PATH, SNAPSHOT_PATH)
+
+
+async def get_catalog() -> ListingCatalog:
+    """Return the shared catalog, loading or refreshing it if needed."""
+    await catalog.ensure_loaded()
+    return catalog
+
+
+def main():
+    """CLI: compile listing.json into a memory-mappable snapshot."""
+    parser = argparse.ArgumentParser(description="Listings catalog tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build-snapshot", help="Compile the JSON dataset into a snapshot")
+    build.add_argument("--source", type=Path, default=DATA_PATH, help="JSON dataset to compile")
+    build.add_argument("--output", type=Path, default=SNAPSHOT_PATH, help="Snapshot file to write")
+    subcommands.add_parser("compact-reviews", help="Merge the review log into the JSON dataset and snapshot")
+    args = parser.parse_args()
+
+    if args.command == "compact-reviews":
+        merged = asyncio.run(catalog.compact_reviews())
+        print(f"Merged {merged} reviews from {REVIEW_LOG_PATH} into {DATA_PATH}")
+        return
+
+    listings = _read_json(args.source)
+    data = build_snapshot(listings, LISTING_COLUMNS, LISTING_FACETS, meta={"source": args.source.name})
+    write_snapshot(args.output, data)
+    print(f"Wrote {len(listings)} listings ({len(data)} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Listing review ingestion
+
+New reviews are appended to a JSON-lines log (LISTINGS_REVIEW_LOG_PATH) instead
+of rewriting listing.json, and folded into running per-listing aggregates
+(count, rating sum, 1-5 star distribution) in O(1) per review. The listings
+snapshot stores the same aggregates as columns, so average ratings and review
+counts never require walking review lists, however many reviews accumulate.
+
+Every worker tails the log, so reviews written by one worker show up in the
+others' aggregates at their next catalog refresh. Compaction periodically
+merges the log back into listing.json and recompiles the snapshot:
+
+1. the log is renamed aside under an exclusive lock (new appends start a fresh log)
+2. its reviews are merged into listing.json, written atomically
+3. the snapshot is rebuilt and the set-aside log is deleted
+
+Run it on demand with:
+
+    python listings_catalog.py compact-reviews
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from snapshot import fcntl
+
+STARS = (1, 2, 3, 4, 5)
+
+
+class ReviewAggregate:
+    """Running count, rating sum and star distribution for one listing."""
+
+    __slots__ = ("count", "total", "stars")
+
+    def __init__(self, count: int = 0, total: float = 0.0, stars: Optional[list[int]] = None):
+        self.count = count
+        self.total = total
+        self.stars = stars or [0] * len(STARS)
+
+    def add(self, rating: int) -> None:
+        self.count += 1
+        self.total += rating
+        self.stars[rating - 1] += 1
+
+    def merged(self, other: Optional["ReviewAggregate"]) -> "ReviewAggregate":
+        if other is None:
+            return self
+        return ReviewAggregate(
+            self.count + other.count,
+            self.total + other.total,
+            [a + b for a, b in zip(self.stars, other.stars)],
+        )
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "reviewCount": self.count,
+            "rating": round(self.average, 2),
+            "ratingDistribution": {str(star): n for star, n in zip(STARS, self.stars)},
+        }
+
+
+def validate_rating(rating: int) -> int:
+    if rating not in STARS:
+        raise ValueError(f"rating must be one of {STARS}, got {rating}")
+    return rating
+
+
+def _lock_path(log_path: Path) -> Path:
+    return log_path.with_suffix(log_path.suffix + ".lock")
+
+
+class ReviewLog:
+    """Append-only JSON-lines log of reviews not yet compacted into listing.json.
+
+    Each review is written with a single O_APPEND write, so concurrent
+    writers (threads or worker processes) never interleave within a line.
+    Appends hold a shared lock that compaction takes exclusively, so no
+    write can land in a log that is being merged.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._inode: Optional[int] = None
+        self._offset = 0
+
+    def append(self, review: dict) -> None:
+        """Durably append one review; blocking, so call it from a worker thread."""
+        line = (json.dumps(review, separators=(",", ":")) + "\n").encode()
+        with open(_lock_path(self.path), "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def rewind(self) -> None:
+        """Read from the start again on the next tail() (after a snapshot reload)."""
+        self._inode = None
+        self._offset = 0
+
+    def tail(self) -> list[dict]:
+        """Reviews appended since the last call (by any process); restarts after compaction."""
+        try:
+            with open(self.path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    # A new log file since compaction: everything in it is unseen
+                    self._inode, self._offset = inode, 0
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # Only consume complete lines; a partial line is picked up next time
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+
+def new_review(listing_id: int, reviewer: str, rating: int, comment: str) -> dict:
+    """A review record in listing.json's shape."""
+    created = datetime.now()
+    return {
+        # Microsecond timestamp: unique across workers without coordination, and
+        # far above the dataset's hand-assigned ids
+        "id": int(created.timestamp() * 1_000_000),
+        "listingId": listing_id,
+        "reviewer": reviewer,
+        "rating": validate_rating(rating),
+        "comment": comment,
+        "createdAt": created.isoformat(timespec="seconds"),
+        "listing": None,
+    }
+
+
+def compact(
+    data_path: Path,
+    log_path: Path,
+    rebuild: Callable[[list[dict]], None],
+) -> int:
+    """Merge logged reviews into the JSON dataset and rebuild; returns how many were merged."""
+    pending = log_path.with_suffix(log_path.suffix + ".compacting")
+    with open(_lock_path(log_path), "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Resume an interrupted compaction before starting a new one
+            if not pending.exists():
+                if not log_path.exists() or log_path.stat().st_size == 0:
+                    return 0
+                log_path.replace(pending)
+
+            with open(pending, "rb") as f:
+                logged = [json.loads(line) for line in f if line.strip()]
+            with open(data_path, "r") as f:
+                listings = json.load(f)
+
+            by_id = {listing["id"]: listing for listing in listings}
+            # Reviews already merged by an interrupted run are skipped, so resuming is idempotent
+            seen = {review["id"] for listing in listings for review in listing.get("reviews") or []}
+            merged = 0
+            for review in logged:
+                listing = by_id.get(review["listingId"])
+                if listing is None or review["id"] in seen:
+                    continue
+                listing.setdefault("reviews", []).append(review)
+                seen.add(review["id"])
+                merged += 1
+
+            tmp = data_path.with_suffix(f"{data_path.suffix}.{os.getpid()}.tmp")
+            with open(tmp, "w") as f:
+                json.dump(listings, f, indent=2)
+            tmp.replace(data_path)
+            rebuild(listings)
+            pending.unlink()
+            return merged
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
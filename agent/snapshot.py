@@ -0,0 +1,234 @@
+"""
+Compiled catalog snapshots
+
+A snapshot is a read-only binary image of a JSON dataset, built offline so
+services don't have to parse pretty-printed JSON at startup. It holds:
+
+- every record as compact JSON bytes (decoded lazily, only for results)
+- numeric columns as packed float64 arrays (rating, hourlyRate, ...)
+- per-facet posting lists: for each term, the sorted record positions that have it
+
+Records can be stored in descending order of one column (`order_by`, e.g. a
+ranking score); posting lists are then in rank order too.
+
+Snapshots are opened with mmap and read through zero-copy memoryviews, so
+cold start is a header parse and multiple worker processes share the same
+page-cache pages instead of each holding its own parsed copy.
+
+File layout (native byte order, sections 8-byte aligned):
+
+    b"OCTOSNAP" | version u32 | header length u32 | header JSON | sections...
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, concurrent builds just race benignly
+    fcntl = None
+
+MAGIC = b"OCTOSNAP"
+VERSION = 2
+_PREFIX = struct.Struct("<8sII")
+
+ColumnSpec = dict[str, Callable[[dict], float]]
+FacetSpec = dict[str, Callable[[dict], Iterable[str]]]
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or from an incompatible build."""
+
+
+def _align(buffer: bytearray) -> None:
+    buffer.extend(b"\0" * (-len(buffer) % 8))
+
+
+def build_snapshot(
+    records: list[dict],
+    columns: ColumnSpec,
+    facets: FacetSpec,
+    meta: Optional[dict] = None,
+    order_by: Optional[str] = None,
+) -> bytes:
+    """Compile records into snapshot bytes using the given column and facet extractors.
+
+    With `order_by`, records are stored in descending order of that column
+    (stable, so ties keep their source order).
+    """
+    if order_by:
+        records = sorted(records, key=columns[order_by], reverse=True)
+    body = bytearray()
+    sections: dict[str, dict] = {}
+
+    def add_section(name: str, data: bytes, kind: str) -> None:
+        _align(body)
+        sections[name] = {"offset": len(body), "length": len(data), "kind": kind}
+        body.extend(data)
+
+    encoded = [json.dumps(r, separators=(",", ":")).encode() for r in records]
+    offsets = [0]
+    for item in encoded:
+        offsets.append(offsets[-1] + len(item))
+    add_section("records.offsets", struct.pack(f"={len(offsets)}q", *offsets), "q")
+    add_section("records.data", b"".join(encoded), "B")
+
+    for name, extract in columns.items():
+        values = [float(extract(r)) for r in records]
+        add_section(f"column.{name}", struct.pack(f"={len(values)}d", *values), "d")
+
+    facet_terms: dict[str, dict[str, list[int]]] = {}
+    for facet, extract in facets.items():
+        postings: dict[str, list[int]] = {}
+        for position, record in enumerate(records):
+            for term in dict.fromkeys(extract(record)):
+                postings.setdefault(term, []).append(position)
+        flat: list[int] = []
+        terms: dict[str, list[int]] = {}
+        for term in sorted(postings):
+            terms[term] = [len(flat), len(flat) + len(postings[term])]
+            flat.extend(postings[term])
+        add_section(f"facet.{facet}", struct.pack(f"={len(flat)}i", *flat), "i")
+        facet_terms[facet] = terms
+
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "count": len(records),
+        "columns": list(columns),
+        "facets": facet_terms,
+        "order_by": order_by,
+        "sections": sections,
+        "meta": meta or {},
+    }, separators=(",", ":")).encode()
+    prefix = bytearray(_PREFIX.pack(MAGIC, VERSION, len(header)) + header)
+    _align(prefix)
+    return bytes(prefix + body)
+
+
+class Snapshot:
+    """Read-only, zero-copy view over snapshot bytes (usually an mmap)."""
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap], source: str = "<memory>"):
+        self.source = source
+        self._buffer = buffer
+        view = memoryview(buffer)
+        if len(view) < _PREFIX.size:
+            raise SnapshotError(f"{source}: file too small to be a snapshot")
+        magic, version, header_length = _PREFIX.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise SnapshotError(f"{source}: not a version {VERSION} snapshot")
+        header_end = _PREFIX.size + header_length
+        header = json.loads(bytes(view[_PREFIX.size:header_end]))
+        if header["byteorder"] != sys.byteorder:
+            raise SnapshotError(f"{source}: built on a {header['byteorder']}-endian machine")
+        body_start = header_end + (-header_end % 8)
+
+        self.count: int = header["count"]
+        self.meta: dict = header["meta"]
+        self.columns: list[str] = header["columns"]
+        self.order_by: Optional[str] = header["order_by"]
+        self._facets: dict[str, dict[str, list[int]]] = header["facets"]
+        self._sections: dict[str, memoryview] = {}
+        for name, section in header["sections"].items():
+            start = body_start + section["offset"]
+            raw = view[start:start + section["length"]]
+            self._sections[name] = raw if section["kind"] == "B" else raw.cast(section["kind"])
+        self._offsets = self._sections["records.offsets"]
+        self._data = self._sections["records.data"]
+
+    @classmethod
+    def open(cls, path: Path) -> "Snapshot":
+        """Memory-map a snapshot file; pages are shared with every other process mapping it."""
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"{path}: {e}") from e
+        return cls(mapped, source=str(path))
+
+    @classmethod
+    def from_records(
+        cls,
+        records: list[dict],
+        columns: ColumnSpec,
+        facets: FacetSpec,
+        meta: Optional[dict] = None,
+        order_by: Optional[str] = None,
+    ) -> "Snapshot":
+        """Build an in-memory snapshot (used when no compiled file exists)."""
+        return cls(build_snapshot(records, columns, facets, meta, order_by))
+
+    @cached_property
+    def checksum(self) -> int:
+        """CRC-32 of the snapshot bytes: equal in every process holding the same snapshot."""
+        return zlib.crc32(self._buffer)
+
+    def column(self, name: str) -> memoryview:
+        return self._sections[f"column.{name}"]
+
+    def record_bytes(self, position: int) -> bytes:
+        return bytes(self._data[self._offsets[position]:self._offsets[position + 1]])
+
+    def record(self, position: int) -> dict:
+        return json.loads(self.record_bytes(position))
+
+    def records(self) -> list[dict]:
+        return [self.record(i) for i in range(self.count)]
+
+    def terms(self, facet: str) -> list[str]:
+        return list(self._facets[facet])
+
+    def postings(self, facet: str, term: str) -> memoryview:
+        """Sorted record positions carrying `term` in `facet` (empty if the term is unknown)."""
+        bounds = self._facets[facet].get(term)
+        if bounds is None:
+            return memoryview(b"").cast("i")
+        return self._sections[f"facet.{facet}"][bounds[0]:bounds[1]]
+
+
+def write_snapshot(path: Path, data: bytes) -> None:
+    """Write snapshot bytes atomically so readers never map a half-written file."""
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def is_current(snapshot_path: Path, source_path: Path) -> bool:
+    """True if the snapshot exists, is this format version and is at least as new as its JSON source."""
+    try:
+        snapshot_mtime = os.stat(snapshot_path).st_mtime
+        with open(snapshot_path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+    except OSError:
+        return False
+    if len(prefix) < _PREFIX.size or _PREFIX.unpack(prefix)[:2] != (MAGIC, VERSION):
+        return False
+    try:
+        return snapshot_mtime >= os.stat(source_path).st_mtime
+    except OSError:
+        return True
+
+
+def ensure_snapshot(snapshot_path: Path, source_path: Path, build: Callable[[], bytes]) -> None:
+    """Compile the snapshot if it is missing or stale.
+
+    Serialized with an advisory file lock, so when several workers start at
+    once only the first one compiles and the rest map the file it wrote.
+    """
+    lock_path = snapshot_path.with_suffix(snapshot_path.suffix + ".lock")
+    with open(lock_path, "w") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not is_current(snapshot_path, source_path):
+                write_snapshot(snapshot_path, build())
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
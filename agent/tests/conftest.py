@@ -0,0 +1,40 @@
+"""Shared fixtures: listing catalogs over a private copy of the listings dataset."""
+
+import asyncio
+import shutil
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+import listings_catalog
+from listings_catalog import ListingCatalog
+
+DATASET = Path(__file__).parent.parent / "data" / "listing.json"
+
+
+@pytest.fixture
+def data_path(tmp_path: Path) -> Path:
+    """listing.json copied into the test's directory, next to its snapshot and review log."""
+    path = tmp_path / "listing.json"
+    shutil.copy(DATASET, path)
+    return path
+
+
+@pytest.fixture
+def review_log_path(data_path: Path, monkeypatch) -> Path:
+    path = data_path.with_name("listing-reviews.jsonl")
+    monkeypatch.setattr(listings_catalog, "REVIEW_LOG_PATH", path)
+    return path
+
+
+@pytest.fixture
+def make_catalog(data_path: Path, review_log_path: Path) -> Callable[[], ListingCatalog]:
+    """Builds loaded catalogs over the same files, like worker processes sharing a deployment."""
+
+    def make() -> ListingCatalog:
+        catalog = ListingCatalog(data_path, data_path.with_suffix(".snap"))
+        asyncio.run(catalog.reload())
+        return catalog
+
+    return make
@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import agent as listings_app
+import listings_catalog
+
+ADMIN_KEY = "test-key"
+REVIEW = {"reviewer": "Test", "rating": 3, "comment": "Fine"}
+
+
+@pytest.fixture
+def client(make_catalog, monkeypatch) -> TestClient:
+    """The listings API over the test catalog, with an admin key."""
+    monkeypatch.setattr(listings_catalog, "catalog", make_catalog())
+    monkeypatch.setattr(listings_app, "LISTINGS_ADMIN_API_KEY", ADMIN_KEY)
+    return TestClient(listings_app.app)
+
+
+def test_adding_a_review_needs_the_admin_key(client):
+    assert client.post("/api/listings/1/reviews", json=REVIEW).status_code == 401
+    assert client.post("/api/listings/1/reviews", json=REVIEW, headers={"X-API-Key": "wrong"}).status_code == 401
+    assert client.get("/api/listings/1/reviews/summary").json()["reviewCount"] == 2
+
+    response = client.post("/api/listings/1/reviews", json=REVIEW, headers={"X-API-Key": ADMIN_KEY})
+    assert response.status_code == 201 and response.json()["reviewCount"] == 3
+    assert client.post("/api/listings/999/reviews", json=REVIEW, headers={"X-API-Key": ADMIN_KEY}).status_code == 404
+
+
+def test_reviews_are_refused_while_no_key_is_set(client, monkeypatch):
+    monkeypatch.setattr(listings_app, "LISTINGS_ADMIN_API_KEY", "")
+    response = client.post("/api/listings/1/reviews", json=REVIEW, headers={"X-API-Key": ""})
+    assert response.status_code == 403
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+import pytest
+
+from reviews import ReviewAggregate, ReviewLog, compact, new_review, validate_rating
+
+
+def review(review_id: int, listing_id: int, rating: int) -> dict:
+    return {"id": review_id, "listingId": listing_id, "reviewer": "Test", "rating": rating, "comment": ""}
+
+
+def test_aggregate_counts_sums_and_distributes():
+    aggregate = ReviewAggregate()
+    assert aggregate.average == 0.0
+    for rating in (5, 4, 4, 1):
+        aggregate.add(rating)
+    assert (aggregate.count, aggregate.total, aggregate.stars) == (4, 14, [1, 0, 0, 2, 1])
+    assert aggregate.to_dict() == {
+        "reviewCount": 4,
+        "rating": 3.5,
+        "ratingDistribution": {"1": 1, "2": 0, "3": 0, "4": 2, "5": 1},
+    }
+
+
+def test_merged_adds_deltas_without_modifying_either_side():
+    base = ReviewAggregate(2, 9.0, [0, 0, 0, 1, 1])
+    delta = ReviewAggregate()
+    delta.add(3)
+    merged = base.merged(delta)
+    assert (merged.count, merged.total, merged.stars) == (3, 12.0, [0, 0, 1, 1, 1])
+    assert (base.count, delta.count) == (2, 1)
+    assert base.merged(None) is base
+
+
+@pytest.mark.parametrize("rating", [0, 6, 4.5])
+def test_ratings_outside_one_to_five_stars_are_rejected(rating):
+    with pytest.raises(ValueError):
+        validate_rating(rating)
+    with pytest.raises(ValueError):
+        new_review(1, "Test", rating, "")
+
+
+def test_new_review_has_the_dataset_shape():
+    created = new_review(3, "Test", 5, "Lovely")
+    assert created["listingId"] == 3 and created["rating"] == 5 and created["listing"] is None
+    # Far above the dataset's hand-assigned ids
+    assert created["id"] > 10**12
+
+
+def test_log_tail_returns_each_review_once(tmp_path):
+    log = ReviewLog(tmp_path / "reviews.jsonl")
+    assert log.tail() == []
+    log.append(review(1, 1, 5))
+    log.append(review(2, 1, 4))
+    assert [r["id"] for r in log.tail()] == [1, 2]
+    assert log.tail() == []
+    log.append(review(3, 2, 3))
+    assert [r["id"] for r in log.tail()] == [3]
+    log.rewind()
+    assert [r["id"] for r in log.tail()] == [1, 2, 3]
+
+
+def test_log_tail_leaves_a_partial_line_for_later(tmp_path):
+    log = ReviewLog(tmp_path / "reviews.jsonl")
+    log.append(review(1, 1, 5))
+    line = json.dumps(review(2, 1, 4)).encode()
+    with open(log.path, "ab") as f:
+        f.write(line[:10])
+    assert [r["id"] for r in log.tail()] == [1]
+    with open(log.path, "ab") as f:
+        f.write(line[10:] + b"\n")
+    assert [r["id"] for r in log.tail()] == [2]
+
+
+def test_log_tail_restarts_on_a_new_log_file(tmp_path):
+    log = ReviewLog(tmp_path / "reviews.jsonl")
+    log.append(review(1, 1, 5))
+    assert len(log.tail()) == 1
+    # What compaction does: set the log aside, new appends start a fresh one
+    log.path.replace(tmp_path / "reviews.jsonl.compacting")
+    log.append(review(2, 1, 4))
+    assert [r["id"] for r in log.tail()] == [2]
+
+
+def test_compact_merges_logged_reviews_into_the_dataset(data_path, tmp_path):
+    log = ReviewLog(tmp_path / "reviews.jsonl")
+    log.append(review(9001, 1, 3))
+    log.append(review(9002, 999, 5))  # no such listing
+    rebuilt = []
+
+    assert compact(data_path, log.path, rebuilt.append) == 1
+    listings = json.loads(data_path.read_text())
+    assert [r["id"] for r in listings[0]["reviews"]] == [101, 102, 9001]
+    assert rebuilt == [listings]
+    assert not log.path.exists()
+    assert not log.path.with_suffix(".jsonl.compacting").exists()
+    assert compact(data_path, log.path, rebuilt.append) == 0
+
+
+def test_interrupted_compaction_resumes_without_duplicates(data_path, tmp_path):
+    log = ReviewLog(tmp_path / "reviews.jsonl")
+    log.append(review(9001, 1, 3))
+    log.append(review(9002, 2, 4))
+    # A run that merged the first review into the dataset, then died before finishing
+    listings = json.loads(data_path.read_text())
+    listings[0]["reviews"].append(review(9001, 1, 3))
+    data_path.write_text(json.dumps(listings))
+    log.path.replace(log.path.with_suffix(".jsonl.compacting"))
+
+    assert compact(data_path, log.path, lambda listings: None) == 1
+    listings = json.loads(data_path.read_text())
+    assert [r["id"] for r in listings[0]["reviews"]] == [101, 102, 9001]
+    assert [r["id"] for r in listings[1]["reviews"]] == [201, 202, 9002]
+
+
+def test_catalog_aggregates_include_logged_reviews(make_catalog):
+    catalog = make_catalog()
+    other = make_catalog()
+    position = catalog.position(1)
+    assert catalog.aggregate(position).to_dict()["rating"] == 4.5
+
+    _, aggregate = asyncio.run(catalog.add_review(1, "Test", 3, "Fine"))
+    assert (aggregate.count, aggregate.total, aggregate.stars) == (3, 12.0, [0, 0, 1, 1, 1])
+    assert asyncio.run(catalog.add_review(999, "Test", 3, "")) is None
+
+    # Another worker picks the review up from the log
+    asyncio.run(other.refresh_reviews())
+    assert other.aggregate(position).to_dict() == aggregate.to_dict()
+    assert other.tag == catalog.tag
+
+
+def test_catalog_aggregates_survive_compaction(make_catalog, data_path):
+    catalog = make_catalog()
+    asyncio.run(catalog.add_review(1, "Test", 3, "Fine"))
+    before = catalog.aggregate(catalog.position(1)).to_dict()
+
+    assert asyncio.run(catalog.compact_reviews()) == 1
+    assert catalog.aggregate(catalog.position(1)).to_dict() == before
+    assert len(json.loads(data_path.read_text())[0]["reviews"]) == 3
+    # A fresh worker reads the compacted dataset, not the log
+    assert make_catalog().aggregate(catalog.position(1)).to_dict() == before
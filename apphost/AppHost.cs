@@ -36,11 +36,13 @@ var api = builder.AddProject<Projects.Octopets_Backend>("api")
 var agent = builder.AddPythonScript("chat", "../agent", "agent.py")
     .WithUvEnvironment()
     .WithEndpoint(targetPort: 8001, scheme: builder.ExecutionContext.IsPublishMode ? "https" : "http")
+    .WithHttpHealthCheck("/ready")
     .WithEnvironment("AZURE_OPENAI_ENDPOINT", foundryProject)
     .WithEnvironment("AGENT_ID", foundryAgentId)
     .WithAzureUserAssignedIdentity(identity)
     .WithIconName("ChatEmpty")
-    .PublishAsDockerFile()
+    // Built from the repository root so the image can include the shared agent-common package
+    .PublishAsDockerFile(c => c.WithDockerfile("..", "agent/Dockerfile"))
     .PublishAsAzureContainerApp((module, containerApp) => { })
     .WithExternalHttpEndpoints()
     .WithOtlpExporter();
@@ -48,10 +50,11 @@ var agent = builder.AddPythonScript("chat", "../agent", "agent.py")
 var sitter_agent = builder.AddPythonScript("sitter", "../sitter-agent", "app.py")
     .WithUvEnvironment()
     .WithEndpoint(targetPort: 8002, scheme: builder.ExecutionContext.IsPublishMode ? "https" : "http")
+    .WithHttpHealthCheck("/ready")
     .WithEnvironment("AZURE_OPENAI_ENDPOINT", foundryProject)
     .WithAzureUserAssignedIdentity(identity)
     .WithIconName("ChatEmpty")
-    .PublishAsDockerFile()
+    .PublishAsDockerFile(c => c.WithDockerfile("..", "sitter-agent/Dockerfile"))
     .PublishAsAzureContainerApp((module, containerApp) => { })
     .WithExternalHttpEndpoints()
     .WithOtlpExporter();
@@ -59,12 +62,13 @@ var sitter_agent = builder.AddPythonScript("sitter", "../sitter-agent", "app.py"
 var orchestrator = builder.AddPythonScript("orchestrator", "../orchestrator-agent", "app.py")
     .WithUvEnvironment()
     .WithEndpoint(targetPort: 8003, scheme: builder.ExecutionContext.IsPublishMode ? "https" : "http")
+    .WithHttpHealthCheck("/ready")
     .WithEnvironment("AZURE_OPENAI_ENDPOINT", foundryProject)
     .WithEnvironment("LISTINGS_AGENT_URL", agent.GetEndpoint(builder.ExecutionContext.IsPublishMode ? "https" : "http"))
     .WithAzureUserAssignedIdentity(identity)
     .WithEnvironment("SITTER_AGENT_URL", sitter_agent.GetEndpoint(builder.ExecutionContext.IsPublishMode ? "https" : "http"))
     .WithIconName("BranchFork")
-    .PublishAsDockerFile()
+    .PublishAsDockerFile(c => c.WithDockerfile("..", "orchestrator-agent/Dockerfile"))
     .PublishAsAzureContainerApp((module, containerApp) => { })
     .WithExternalHttpEndpoints()
     .WithOtlpExporter();
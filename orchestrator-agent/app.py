@@ -5,26 +5,43 @@ This provides REST API endpoints for the orchestrator that coordinates
 between the listings agent and pet sitter agent.
 """
 
+from agent_common.startup import WARMUP_MODE, log_report, mark, readiness, report
+
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional
+from urllib.parse import urlparse
+import math
 import os
 from datetime import datetime
 import uuid
 from dotenv import load_dotenv
 
-from orchestrator import run_orchestrator
+from agent_common.admission import AdmissionController, AdmissionRejected
+from agent_common.loop_monitor import LoopMonitor
+from agent_common.profiling import ProfilingMiddleware
+from agent_common.telemetry import init_telemetry, shutdown_telemetry
+from jobs import JobQueueFull, JobRunner
+from orchestrator import (
+    close_clients,
+    get_http_client,
+    model_router,
+    orchestrate,
+    run_orchestrator,
+    sitter_transport,
+    subagent_retry_policy,
+    warm_up,
+)
+from agent_common.retry import is_retryable_error, retry_after_seconds
 
 # Load environment variables
 load_dotenv()
 
 # OpenTelemetry imports
-from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 # Configure logging
@@ -38,6 +55,18 @@ FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3000")
 cors_origins = [origin.strip() for origin in FRONTEND_URL.split(",")]
 logger.info(f"CORS origins configured: {cors_origins}")
 
+# Bounds concurrent orchestrations for /agent/chat (AGENT_MAX_CONCURRENCY, AGENT_MAX_QUEUE, ...)
+admission = AdmissionController.from_env("orchestrator-chat")
+
+# Event-loop lag and slow callback metrics (LOOP_MONITOR_INTERVAL_MS, LOOP_SLOW_CALLBACK_MS)
+loop_monitor = LoopMonitor.from_env("orchestrator")
+
+# Hosts that job callback_url webhooks may be sent to (comma-separated); none by default,
+# so the API can't be used to make requests to arbitrary internal addresses
+JOB_WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
 
 # Request/Response Models
 class ChatMessage(BaseModel):
@@ -57,11 +86,84 @@ class ChatResponse(BaseModel):
     suggestions: Optional[list[str]] = None
 
 
+class JobRequest(ChatRequest):
+    callback_url: Optional[str] = Field(None, description="URL POSTed the finished job (see JOB_WEBHOOK_ALLOWED_HOSTS)")
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str  # "queued", "running", "succeeded", "failed" or "cancelled"
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+def _job_response(job: dict) -> JobResponse:
+    result = None
+    if job["result"] is not None:
+        # The job id doubles as the message id, so every poll returns the same message
+        result = ChatResponse(
+            message=ChatMessage(id=job["id"], content=job["result"], sender="agent", timestamp=_timestamp(job["finished_at"])),
+            suggestions=None,
+        )
+    return JobResponse(
+        id=job["id"],
+        status=job["status"],
+        created_at=_timestamp(job["created_at"]),
+        started_at=_timestamp(job["started_at"]),
+        finished_at=_timestamp(job["finished_at"]),
+        expires_at=_timestamp(job["expires_at"]),
+        result=result,
+        error=job["error"],
+    )
+
+
+async def notify_webhook(job: dict) -> None:
+    """POST a finished job to its callback_url, retrying 429/5xx responses."""
+    client = get_http_client()
+    payload = _job_response(job).model_dump(mode="json")
+
+    async def post():
+        response = await client.post(job["callback_url"], json=payload)
+        response.raise_for_status()
+        return response
+
+    await subagent_retry_policy.run(post)
+
+
+async def run_job(message: str) -> str:
+    """Run a job's orchestration in an admission slot, so jobs and chats share one concurrency limit.
+
+    Errors propagate, so the job ends as failed. Nobody is waiting on the
+    connection, so an admission rejection is waited out instead.
+    """
+    while True:
+        try:
+            async with admission.slot():
+                return await orchestrate(message)
+        except AdmissionRejected as e:
+            logger.info(f"Job waiting for an admission slot: {e}")
+            await asyncio.sleep(e.retry_after)
+
+
+# Runs /agent/jobs orchestrations on a bounded worker pool (JOB_WORKERS, JOB_MAX_QUEUE, ...)
+job_runner = JobRunner.from_env("orchestrator-jobs", run_job, notify_webhook)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Octopets Orchestrator API",
     description="Multi-agent orchestration for complex queries requiring both venue and sitter information",
     version="1.0.0",
+    # orjson renders responses several times faster than the stdlib encoder
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -73,15 +175,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Instrument FastAPI with OpenTelemetry
-trace.set_tracer_provider(TracerProvider())
-otlpExporter = OTLPSpanExporter(endpoint=os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"))
-processor = BatchSpanProcessor(otlpExporter)
-trace.get_tracer_provider().add_span_processor(processor)
+# Opt-in per-request profiling, by admin header or sampling rate (see agent_common.profiling)
+app.add_middleware(ProfilingMiddleware, service="orchestrator")
 
+# Instrument FastAPI with OpenTelemetry; providers and exporters are created per worker
+# process at startup (see agent_common.telemetry) so exporter threads and gRPC channels are never
+# shared across a fork
 FastAPIInstrumentor().instrument_app(app)
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Per-worker initialization of telemetry exporters."""
+    mark("imported")
+    init_telemetry()
+    mark("telemetry")
+    loop_monitor.start()
+    job_runner.start()
+    if WARMUP_MODE == "background":
+        # Agent stack and clients load after the server starts accepting requests
+        asyncio.create_task(warm_up())
+    log_report()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop running jobs, release this worker's Azure/HTTP clients and flush telemetry."""
+    await job_runner.stop()
+    await close_clients()
+    loop_monitor.stop()
+    shutdown_telemetry()
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
@@ -91,7 +216,9 @@ async def root():
         "description": "Coordinates between listings and sitter agents for complex queries",
         "endpoints": {
             "chat": "/agent/chat",
+            "jobs": "/agent/jobs",
             "health": "/health",
+            "ready": "/ready",
             "docs": "/docs"
         },
         "agents": {
@@ -101,12 +228,32 @@ async def root():
     }
 
 
+@app.get("/debug/startup")
+async def startup_report():
+    """Cold start timings for this worker: startup phases and lazy import durations."""
+    return report()
+
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 503 until this worker's warm-up has completed."""
+    state = readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
+    """Liveness check: the process is up (see /ready for whether it should get traffic)."""
     return {
         "status": "healthy",
-        "azure_ai_status": "connected" if os.getenv("AZURE_OPENAI_ENDPOINT") else "not configured"
+        "azure_ai_status": "connected" if os.getenv("AZURE_OPENAI_ENDPOINT") else "not configured",
+        "sitter_transport": sitter_transport.name,
+        "models": model_router.describe(),
+        "admission": admission.stats(),
+        "jobs": job_runner.stats(),
+        "event_loop": loop_monitor.stats()
     }
 
 
@@ -128,7 +275,8 @@ async def chat_with_orchestrator(request: ChatRequest):
         logger.info(f"Received chat request: {request.message[:100]}...")
         
         # Run the orchestrator
-        response_content = await run_orchestrator(request.message)
+        async with admission.slot():
+            response_content = await run_orchestrator(request.message)
         
         # Create agent response message
         agent_message = ChatMessage(
@@ -143,14 +291,65 @@ async def chat_with_orchestrator(request: ChatRequest):
             suggestions=None
         )
         
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected chat request: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
+        if is_retryable_error(e):
+            retry_after = retry_after_seconds(e) or admission.retry_after()
+            raise HTTPException(
+                status_code=503,
+                detail="The AI service is busy, please retry shortly.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
         logger.error(f"Error processing chat: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
 
+@app.post("/agent/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(request: JobRequest, response: Response):
+    """
+    Queue a chat request and return at once; poll the job (or wait for its
+    webhook) for the result instead of holding the connection open.
+    """
+    if request.callback_url:
+        parsed = urlparse(request.callback_url)
+        if parsed.scheme not in ("http", "https") or (parsed.hostname or "").lower() not in JOB_WEBHOOK_ALLOWED_HOSTS:
+            raise HTTPException(status_code=422, detail="callback_url host is not in JOB_WEBHOOK_ALLOWED_HOSTS")
+    try:
+        job = await job_runner.submit(request.message, request.callback_url)
+    except JobQueueFull as e:
+        logger.warning(f"Rejected job: {e}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    logger.info(f"Queued job {job['id']}: {request.message[:100]}...")
+    response.headers["Location"] = f"/agent/jobs/{job['id']}"
+    return _job_response(job)
+
+
+@app.get("/agent/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """A job's status, and its result once it has finished."""
+    job = await job_runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return _job_response(job)
+
+
+@app.delete("/agent/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; a running job shows "cancelled" once it has stopped."""
+    job = await job_runner.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return _job_response(job)
+
+
 if __name__ == "__main__":
     import uvicorn
     
     port = int(os.environ.get("PORT", 8003))
-    logger.info(f"Starting Orchestrator API on port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # WEB_CONCURRENCY > 1 runs that many worker processes; each initializes its own
+    # telemetry and Azure clients at startup and maps the shared catalog snapshot
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    logger.info(f"Starting Orchestrator API on port {port} with {workers} worker(s)")
+    uvicorn.run("app:app", host="0.0.0.0", port=port, workers=workers)
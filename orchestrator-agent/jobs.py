@@ -0,0 +1,321 @@
+"""
+Asynchronous orchestration jobs
+
+An orchestration can take tens of seconds (nested model runs plus sub-agent
+calls), which is longer than frontend and ingress timeouts allow for one
+HTTP request. Jobs decouple the work from the connection:
+
+1. POST /agent/jobs stores a queued job and returns its id at once (202)
+2. a bounded pool of workers (JOB_WORKERS) takes jobs off a bounded queue
+   (JOB_MAX_QUEUE) and runs them; a full queue rejects new jobs with 503
+3. clients poll GET /agent/jobs/{id}, or give a callback_url to be POSTed
+   the finished job; DELETE cancels a queued or running job
+
+Finished jobs are kept for JOB_RESULT_TTL_SECONDS, then dropped.
+
+Jobs live in a JobStore, selected with JOB_STORE. "memory" (the default) is
+a per-process stand-in: with several worker processes a poll can land on a
+process that never saw the job, so multi-worker deployments need a shared
+store implementing the same four methods. The queue itself is in-process;
+a job is only ever run by the process that accepted it.
+
+Queue depth, queue wait and run time are exported as jobs.* metrics.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Optional
+
+from opentelemetry import metrics
+
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room; maps to HTTP 503."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobStore(ABC):
+    """Where jobs are kept between submission, execution and polling."""
+
+    name = "base"
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[dict]:
+        """The job, or None if it is unknown or has expired."""
+
+    @abstractmethod
+    async def put(self, job: dict) -> None:
+        """Store a new job, or replace it with an updated copy."""
+
+    @abstractmethod
+    async def delete(self, job_id: str) -> None:
+        """Forget a job (no error if it is unknown)."""
+
+    @abstractmethod
+    async def purge_expired(self, now: float) -> int:
+        """Drop jobs whose expires_at has passed; returns how many were dropped."""
+
+
+class MemoryJobStore(JobStore):
+    """Jobs in a dict, visible only to this worker process."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._jobs: dict[str, dict] = {}
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        if job is None or (job["expires_at"] is not None and job["expires_at"] <= time.time()):
+            return None
+        return dict(job)
+
+    async def put(self, job: dict) -> None:
+        self._jobs[job["id"]] = dict(job)
+
+    async def delete(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+
+    async def purge_expired(self, now: float) -> int:
+        expired = [job_id for job_id, job in self._jobs.items() if job["expires_at"] is not None and job["expires_at"] <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+
+def create_job_store(store: Optional[str] = None) -> JobStore:
+    """Build the job store named by JOB_STORE (or `store`)."""
+    store = (store or os.getenv("JOB_STORE", "memory")).lower()
+    if store != "memory":
+        logger.warning(f"Unknown JOB_STORE '{store}', using memory")
+    return MemoryJobStore()
+
+
+class JobRunner:
+    """Bounded queue and worker pool that runs jobs from a JobStore."""
+
+    def __init__(
+        self,
+        name: str,
+        store: JobStore,
+        run: Callable[[str], Awaitable[str]],
+        notify: Optional[Callable[[dict], Awaitable[None]]] = None,
+        workers: int = 4,
+        max_queue: int = 100,
+        result_ttl: float = 3600.0,
+    ):
+        self.name = name
+        self.store = store
+        self.run = run
+        self.notify = notify
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.result_ttl = result_ttl
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._running: dict[str, asyncio.Task] = {}
+        self._notifications: set[asyncio.Task] = set()
+        # Exponentially weighted average run time, used for Retry-After hints
+        self._avg_run_seconds = 10.0
+
+        attributes = {"jobs.name": name}
+        self._queue_wait = meter.create_histogram(
+            "jobs.queue_wait",
+            unit="s",
+            description="Time jobs spent queued before a worker picked them up",
+        )
+        self._run_duration = meter.create_histogram(
+            "jobs.run.duration",
+            unit="s",
+            description="Job run time, by final status",
+        )
+        self._rejections = meter.create_counter(
+            "jobs.rejected",
+            description="Jobs rejected because the queue was full",
+        )
+        meter.create_observable_gauge(
+            "jobs.queue_depth",
+            callbacks=[lambda options: [metrics.Observation(self.queued, attributes)]],
+            description="Jobs waiting for a worker",
+        )
+        meter.create_observable_gauge(
+            "jobs.running",
+            callbacks=[lambda options: [metrics.Observation(len(self._running), attributes)]],
+            description="Jobs currently running",
+        )
+        self._attributes = attributes
+
+    @classmethod
+    def from_env(
+        cls,
+        name: str,
+        run: Callable[[str], Awaitable[str]],
+        notify: Optional[Callable[[dict], Awaitable[None]]] = None,
+    ) -> "JobRunner":
+        """Build a runner from JOB_* environment variables."""
+        return cls(
+            name=name,
+            store=create_job_store(),
+            run=run,
+            notify=notify,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            max_queue=int(os.getenv("JOB_MAX_QUEUE", "100")),
+            result_ttl=float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600")),
+        )
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        """Current pool state, suitable for health/diagnostic endpoints."""
+        return {
+            "store": self.store.name,
+            "workers": self.workers,
+            "running": len(self._running),
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+        }
+
+    def retry_after(self) -> int:
+        """Estimate how long until the queue has room for a new job."""
+        return max(1, math.ceil(self._avg_run_seconds * (self.queued + 1) / self.workers))
+
+    def start(self) -> None:
+        """Start the workers and the expiry sweep on the running event loop."""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self) -> None:
+        """Cancel the workers; running jobs end as cancelled."""
+        for task in [*self._tasks, *self._running.values()]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, message: str, callback_url: Optional[str] = None) -> dict:
+        """Queue a job for `message`; raises JobQueueFull when there is no room."""
+        if self._queue is None:
+            raise RuntimeError("JobRunner.start() has not been called")
+        if self._queue.full():
+            self._rejections.add(1, self._attributes)
+            raise JobQueueFull(self.retry_after())
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "message": message,
+            "callback_url": callback_url,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": None,
+            "result": None,
+            "error": None,
+        }
+        await self.store.put(job)
+        self._queue.put_nowait(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued or running job; finished jobs are returned unchanged."""
+        job = await self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        task = self._running.get(job_id)
+        if task is not None:
+            # The worker records the cancellation when the run unwinds
+            task.cancel()
+            return job
+        # Still queued: the worker skips it when it comes up
+        return await self._finish(job, CANCELLED)
+
+    async def _finish(self, job: dict, status: str, result: Optional[str] = None, error: Optional[str] = None) -> dict:
+        now = time.time()
+        job.update(status=status, result=result, error=error, finished_at=now, expires_at=now + self.result_ttl)
+        await self.store.put(job)
+        if job["callback_url"] and self.notify is not None:
+            task = asyncio.create_task(self._notify(dict(job)))
+            self._notifications.add(task)
+            task.add_done_callback(self._notifications.discard)
+        return job
+
+    async def _notify(self, job: dict) -> None:
+        try:
+            await self.notify(job)
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['id']} failed: {e}")
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except Exception as e:
+                logger.error(f"Job {job_id} could not be run: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str) -> None:
+        job = await self.store.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return
+        start = time.time()
+        self._queue_wait.record(start - job["created_at"], self._attributes)
+        job.update(status=RUNNING, started_at=start)
+        await self.store.put(job)
+
+        task = asyncio.create_task(self.run(job["message"]))
+        self._running[job_id] = task
+        try:
+            # wait() rather than awaiting the task, so cancelling the job's task
+            # doesn't also cancel this worker
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            task.cancel()
+            await self._finish(job, CANCELLED, error="Service shutting down")
+            raise
+        finally:
+            del self._running[job_id]
+
+        if task.cancelled():
+            status, result, error = CANCELLED, None, None
+        elif task.exception() is not None:
+            status, result, error = FAILED, None, str(task.exception())
+            logger.error(f"Job {job_id} failed: {task.exception()}")
+        else:
+            status, result, error = SUCCEEDED, task.result(), None
+        elapsed = time.time() - start
+        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * elapsed
+        self._run_duration.record(elapsed, {**self._attributes, "status": status})
+        await self._finish(job, status, result, error)
+
+    async def _sweep(self) -> None:
+        interval = min(60.0, max(1.0, self.result_ttl / 2))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                purged = await self.store.purge_expired(time.time())
+                if purged:
+                    logger.info(f"Dropped {purged} expired job(s)")
+            except Exception as e:
+                logger.warning(f"Job expiry sweep failed: {e}")
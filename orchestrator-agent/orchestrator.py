@@ -15,14 +15,24 @@ import asyncio
 import json
 import os
 import logging
-from typing import Annotated, Optional
+from typing import TYPE_CHECKING, Annotated, Optional
 from pathlib import Path
 
-from agent_framework import ChatAgent
-from agent_framework_azure_ai import AzureAIAgentClient
-from azure.identity.aio import DefaultAzureCredential
 from dotenv import load_dotenv
 
+from agent_common.model_router import ModelRouter
+from agent_common.retry import RetryPolicy, estimate_tokens, is_retryable_error
+from agent_common.startup import lazy_import, run_warm_up, warm_up_imports
+from subagents import HttpListingsTransport, create_sitter_transport
+
+if TYPE_CHECKING:
+    from agent_framework import ChatAgent
+    from azure.ai.projects.aio import AIProjectClient
+
+# The agent stack (agent_framework, Azure AI SDKs, httpx) is imported on first use so
+# the health probe can answer before it has loaded
+AGENT_MODULES = ("agent_framework", "agent_framework_azure_ai", "azure.ai.projects.aio", "azure.identity.aio", "httpx")
+
 # Load environment variables
 load_dotenv()
 
@@ -35,7 +45,104 @@ logger = logging.getLogger(__name__)
 AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
 LISTINGS_AGENT_URL = os.getenv("LISTINGS_AGENT_URL", "http://localhost:8001")
 SITTER_AGENT_URL = os.getenv("SITTER_AGENT_URL", "http://localhost:8002")
-MODEL_DEPLOYMENT_NAME = os.getenv("AZURE_MODEL_DEPLOYMENT_NAME", "gpt-4.1")
+
+# Deployment per task (AZURE_MODEL_DEPLOYMENT_NAME, AZURE_FAST_MODEL_DEPLOYMENT_NAME, MODEL_ROUTING_POLICY)
+model_router = ModelRouter.from_env()
+# "true": classify each request on the fast tier first and run it with only the tools it
+# needs; "false": one run with every tool; "auto": route when a fast tier is configured
+ORCHESTRATOR_ROUTING = os.getenv("ORCHESTRATOR_ROUTING", "auto").lower()
+
+# Retries throttled/transient model calls (AGENT_RETRY_*, AZURE_MODEL_RPM_LIMIT, AZURE_MODEL_TPM_LIMIT)
+retry_policy = RetryPolicy.from_env("orchestrator")
+# Retries sub-agent searches that come back 503/429 with Retry-After; chat calls only on connect errors
+subagent_retry_policy = RetryPolicy.from_env("orchestrator-subagents")
+
+# Token scope of the Foundry project API
+TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+# Azure and HTTP clients are created lazily in the worker process that uses them and
+# reused across requests, so AAD tokens and pooled connections are cached per worker
+_credential = None
+_project_client = None
+_http_client = None
+
+
+def get_project_client() -> "AIProjectClient":
+    """Return this worker's shared AIProjectClient, creating it on first use."""
+    global _credential, _project_client
+    if _project_client is None:
+        _credential = lazy_import("azure.identity.aio").DefaultAzureCredential()
+        # SDK retries off: retry_policy is the only retry layer
+        _project_client = lazy_import("azure.ai.projects.aio").AIProjectClient(
+            endpoint=AZURE_OPENAI_ENDPOINT, credential=_credential, retry_total=0
+        )
+    return _project_client
+
+
+def get_http_client():
+    """Return this worker's pooled HTTP client for sub-agent calls."""
+    global _http_client
+    if _http_client is None:
+        _http_client = lazy_import("httpx").AsyncClient(timeout=30.0)
+    return _http_client
+
+
+# Reaches the pet sitter agent over HTTP or in-process (SITTER_AGENT_TRANSPORT)
+sitter_transport = create_sitter_transport(SITTER_AGENT_URL, get_http_client, subagent_retry_policy)
+listings_transport = HttpListingsTransport(LISTINGS_AGENT_URL, get_http_client, subagent_retry_policy)
+
+
+async def _acquire_token():
+    """Fetch the first AAD token now, rather than on the first user's request."""
+    get_project_client()
+    await _credential.get_token(TOKEN_SCOPE)
+
+
+async def _connect_foundry():
+    """Open the pooled connection to the Foundry project with a cheap call."""
+    async for _ in get_project_client().agents.list_agents(limit=1):
+        break
+
+
+async def _open_subagent_connections():
+    """Open pooled connections to the sub-agents; best effort, their own probes gate their traffic."""
+    urls = [LISTINGS_AGENT_URL] + ([SITTER_AGENT_URL] if sitter_transport.name == "http" else [])
+    for url in urls:
+        try:
+            await get_http_client().get(f"{url}/health")
+        except Exception as e:
+            logger.info(f"Sub-agent at {url} not reachable during warm-up: {e}")
+
+
+async def warm_up():
+    """
+    Warm this worker up before it reports ready: the agent stack, pooled
+    connections to the sub-agents, an AAD token, the Foundry connection and the sitter transport
+    (which, in-process, loads the sitter catalog). The orchestrator agents
+    themselves are created per run by AzureAIAgentClient.
+    """
+    steps = {
+        "agent_stack": lambda: warm_up_imports(*AGENT_MODULES),
+        "subagent_connections": _open_subagent_connections,
+    }
+    if AZURE_OPENAI_ENDPOINT and model_router.provider != "fake":
+        steps.update(aad_token=_acquire_token, foundry=_connect_foundry)
+    steps["sitter_transport"] = sitter_transport.warm_up
+    # Optional: the transport also loads on first use, and sub-agents may come up after us
+    await run_warm_up("orchestrator", steps, optional=["sitter_transport"])
+
+
+async def close_clients():
+    """Close this worker's Azure and HTTP clients (call on shutdown)."""
+    global _credential, _project_client, _http_client
+    await sitter_transport.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    if _project_client is not None:
+        await _project_client.close()
+        await _credential.close()
+        _credential = _project_client = None
 
 
 async def query_listings_agent(
@@ -56,28 +163,10 @@ async def query_listings_agent(
     Returns:
         JSON string with venue information and recommendations
     """
-    import httpx
-    
     try:
         logger.info(f"Querying listings agent with: {user_query[:100]}...")
+        return await listings_transport.chat(user_query)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{LISTINGS_AGENT_URL}/agent/chat",
-                json={"message": user_query}
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            # Extract the message content
-            if isinstance(data, dict) and "message" in data:
-                message_data = data["message"]
-                if isinstance(message_data, dict) and "content" in message_data:
-                    return message_data["content"]
-            
-            # Fallback to returning the raw response
-            return json.dumps(data)
-            
     except Exception as e:
         logger.error(f"Error querying listings agent: {e}")
         return json.dumps({
@@ -105,26 +194,10 @@ async def query_sitter_agent(
     Returns:
         JSON string with pet sitter recommendations
     """
-    import httpx
-    
     try:
-        logger.info(f"Querying sitter agent with: {user_query[:100]}...")
+        logger.info(f"Querying sitter agent ({sitter_transport.name}) with: {user_query[:100]}...")
+        return await sitter_transport.chat(user_query)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{SITTER_AGENT_URL}/api/chat",
-                json={"query": user_query}
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            # Extract the response content
-            if isinstance(data, dict) and "response" in data:
-                return data["response"]
-            
-            # Fallback to returning the raw response
-            return json.dumps(data)
-            
     except Exception as e:
         logger.error(f"Error querying sitter agent: {e}")
         return json.dumps({
@@ -133,14 +206,151 @@ async def query_sitter_agent(
         })
 
 
-async def create_orchestrator_agent() -> ChatAgent:
+def _criteria(**kwargs) -> dict:
+    """Drop unset tool arguments so sub-agents apply only the filters the model chose."""
+    return {k: v for k, v in kwargs.items() if v is not None}
+
+
+async def search_listings(
+    location: Annotated[Optional[str], "City or part of the address (e.g., 'Seattle', 'New York')"] = None,
+    pet_type: Annotated[Optional[str], "Pet that must be allowed: dogs, cats, birds, reptiles, small_mammals or other"] = None,
+    venue_type: Annotated[Optional[str], "Venue type: park, cafe, home, hotel or custom"] = None,
+    amenity: Annotated[Optional[str], "Word or phrase from an amenity (e.g., 'outdoor', 'fenced', 'water')"] = None,
+    max_price: Annotated[Optional[float], "Maximum price (0 for free venues)"] = None,
+) -> str:
+    """
+    Search pet-friendly venue listings by structured criteria.
+    
+    Returns the best rated matching listings as JSON (with average rating and
+    review count) directly from the listings catalog, without running the
+    listings agent. Prefer this over query_listings_agent for finding venues.
+    """
+    try:
+        criteria = _criteria(location=location, pet_type=pet_type, venue_type=venue_type, amenity=amenity, max_price=max_price)
+        logger.info(f"Searching listings: {criteria}")
+        return await listings_transport.search(**criteria)
+    except Exception as e:
+        logger.error(f"Error searching listings: {e}")
+        return json.dumps({
+            "error": f"Failed to search listings: {str(e)}",
+            "status": "error"
+        })
+
+
+async def search_pet_sitters(
+    location: Annotated[Optional[str], "City (e.g., 'New York', 'Seattle', 'San Francisco')"] = None,
+    pet_type: Annotated[Optional[str], "Type of pet (e.g., 'dogs', 'cats', 'birds', 'reptiles', 'small_mammals')"] = None,
+    service: Annotated[Optional[str], "Required service (e.g., 'pet_sitting', 'dog_walking', 'overnight_care', 'exotic_pet_care')"] = None,
+    day_needed: Annotated[Optional[str], "Day needed, capitalized (e.g., 'Monday', 'Saturday')"] = None,
+    max_rate: Annotated[Optional[float], "Maximum hourly rate budget"] = None,
+    specialization: Annotated[Optional[str], "Specialization (e.g., 'senior_pets', 'exotic_pets', 'medication_administration')"] = None,
+    preferred_specialization: Annotated[Optional[str], "Specialization to rank higher without requiring it"] = None,
+    prefer_certified: Annotated[Optional[bool], "Rank sitters with more certifications higher"] = None,
+) -> str:
+    """
+    Search pet sitters by structured criteria.
+    
+    Returns the top matching sitters as JSON, best rated first (ratings are
+    weighted by review count), directly from the sitter catalog without running
+    the sitter agent. Call once per day when
+    the user needs several days (e.g., Saturday and Sunday for weekends).
+    Prefer this over query_sitter_agent for finding sitters.
+    """
+    try:
+        criteria = _criteria(
+            location=location,
+            pet_type=pet_type,
+            service=service,
+            day_needed=day_needed,
+            max_rate=max_rate,
+            specialization=specialization,
+            preferred_specialization=preferred_specialization,
+            prefer_certified=prefer_certified,
+        )
+        logger.info(f"Searching pet sitters ({sitter_transport.name}): {criteria}")
+        return await sitter_transport.search(**criteria)
+    except Exception as e:
+        logger.error(f"Error searching pet sitters: {e}")
+        return json.dumps({
+            "error": f"Failed to search pet sitters: {str(e)}",
+            "status": "error"
+        })
+
+
+# Tools available to the orchestrator for each route chosen by classify()
+ROUTE_TOOLS = {
+    "listings": [search_listings, query_listings_agent],
+    "sitters": [search_pet_sitters, query_sitter_agent],
+    "both": [search_listings, search_pet_sitters, query_listings_agent, query_sitter_agent],
+}
+ROUTES = (*ROUTE_TOOLS, "other")
+
+ROUTER_INSTRUCTIONS = """You route requests for the Octopets platform, which finds pet-friendly venues
+(listings) and pet sitters. Reply with exactly one word on the first line:
+
+- listings: the request only needs venue information (places, restaurants, parks, amenities)
+- sitters: the request only needs pet sitter information (sitters, walkers, pet care services)
+- both: the request needs venues and sitters
+- other: the request needs neither (greetings, questions about the platform, small talk)
+
+For "other" only, add a short, friendly answer on the following lines."""
+
+ANSWER_INSTRUCTIONS = """You are the assistant for the Octopets platform, which finds pet-friendly venues and
+pet sitters. Answer briefly and in a friendly tone. Never make up venue or sitter details."""
+
+
+def routing_enabled() -> bool:
+    if ORCHESTRATOR_ROUTING == "auto":
+        return model_router.tiered or model_router.provider == "fake"
+    return ORCHESTRATOR_ROUTING in ("true", "1", "yes")
+
+
+def _route_task(route: str) -> str:
+    """The routing policy task for a route: one source or a synthesis of several."""
+    return "synthesis" if route == "both" else "single_source"
+
+
+async def _run_simple(task: str, agent_name: str, instructions: str, message: str):
+    """One tool-less agent run on the task's deployment."""
+    ChatAgent = lazy_import("agent_framework").ChatAgent
+    agent_client = model_router.chat_client(task, agent_name, get_project_client)
+    async with ChatAgent(chat_client=agent_client, instructions=instructions, name=agent_name) as agent:
+        return await model_router.run(task, agent, message, retry_policy, estimate_tokens(instructions + message))
+
+
+async def classify(user_query: str) -> tuple[str, Optional[str]]:
     """
-    Create the orchestrator agent with tools to delegate to specialized agents.
+    Pick the route for a query on the fast tier.
     
-    The orchestrator analyzes user queries and determines which agent(s) to invoke:
-    - Listings agent for venue/location queries
-    - Sitter agent for pet sitter queries
-    - Both agents for complex queries requiring both
+    Returns the route and, for "other", the model's direct answer if it gave
+    one. Falls back to "both" (every tool, the large model) when the reply
+    can't be read or the call fails, so routing can only cost quality by
+    misclassifying, never by failing the request.
+    """
+    try:
+        result = await _run_simple("classify", "OctopetsRouterAgent", ROUTER_INSTRUCTIONS, user_query)
+    except Exception as e:
+        if is_retryable_error(e):
+            raise
+        logger.warning(f"Routing failed, using every tool: {e}")
+        return "both", None
+    label, _, answer = (result.text or "").strip().partition("\n")
+    route = label.strip().strip(".:*").lower()
+    if route not in ROUTES:
+        logger.warning(f"Unrecognized route '{label[:40]}', using every tool")
+        return "both", None
+    return route, answer.strip() or None
+
+
+async def create_orchestrator_agent(route: str = "both") -> "ChatAgent":
+    """
+    Create the orchestrator agent with tools to search and delegate to specialized agents.
+    
+    The orchestrator fetches venue and sitter data with the structured search
+    tools and synthesizes the answer itself in a single run. The query_* tools,
+    which start a nested run of the listings or sitter agent, are kept for
+    questions the catalogs can't answer. A route from classify() narrows the
+    tools to one source and picks the deployment for it.
     """
     
     instructions = """You are an intelligent orchestrator for the Octopets platform. Your role is to:
@@ -150,10 +360,13 @@ async def create_orchestrator_agent() -> ChatAgent:
    - Pet sitter information (dog walkers, cat sitters, availability, rates, etc.)
    - Both venue and sitter information for complex requests
 
-2. DELEGATE to the appropriate specialized agent(s):
-   - Use query_listings_agent for venue-related questions
-   - Use query_sitter_agent for pet sitter-related questions
-   - Use BOTH tools when the query requires both types of information
+2. FETCH the data you need with the structured search tools:
+   - Use search_listings for venues (location, pet type, venue type, amenity, price)
+   - Use search_pet_sitters for sitters (location, pet type, service, day, rate, specialization)
+   - Use BOTH when the query requires both types of information, calling them in the same turn
+   - Only delegate to query_listings_agent or query_sitter_agent when a question can't be
+     answered from search results (e.g., venue policies or details only in the listings
+     knowledge base); these run a separate agent and are much slower
 
 3. SYNTHESIZE the results into a coherent, helpful response that:
    - Addresses all aspects of the user's request
@@ -163,54 +376,91 @@ async def create_orchestrator_agent() -> ChatAgent:
 
 Example queries you'll handle:
 - "I need a place in NY with outdoor areas and a sitter available on weekends"
-  → Query both agents and combine results
+  → search_listings(location="New York", amenity="outdoor") and
+    search_pet_sitters(location="New York", day_needed="Saturday"/"Sunday"), then combine
   
-- "Find me dog-friendly restaurants in Seattle"
-  → Query only the listings agent
+- "Find me dog-friendly cafes in Seattle"
+  → search_listings(location="Seattle", pet_type="dogs", venue_type="cafe")
   
 - "I need a dog walker in San Francisco who can do weekdays"
-  → Query only the sitter agent
+  → search_pet_sitters(location="San Francisco", service="dog_walking", day_needed=...)
 
 Always use the tools to get current, accurate information. Never make up venue or sitter details.
 """
 
-    # Create the agent client
-    agent_client = AzureAIAgentClient(
-        project_endpoint=AZURE_OPENAI_ENDPOINT,
-        model_deployment_name=MODEL_DEPLOYMENT_NAME,
-        async_credential=DefaultAzureCredential(),
-        agent_name="OctopetsOrchestratorAgent",
-    )
+    ChatAgent = lazy_import("agent_framework").ChatAgent
+    ToolRunMiddleware = lazy_import("agent_common.tool_execution").ToolRunMiddleware
+
+    # Create the agent client on the route's deployment
+    agent_client = model_router.chat_client(_route_task(route), "OctopetsOrchestratorAgent", get_project_client)
     
     # Create the orchestrator agent with delegation tools
     agent = ChatAgent(
         chat_client=agent_client,
         instructions=instructions,
-        tools=[query_listings_agent, query_sitter_agent],
+        tools=ROUTE_TOOLS[route],
+        # Memoizes repeated tool calls within this run and times each call
+        middleware=[ToolRunMiddleware("orchestrator")],
         name="Orchestrator"
     )
     
     return agent
 
 
+async def orchestrate(user_query: str) -> str:
+    """
+    Route a user query and run the orchestrator agent on it, raising on failure.
+
+    Args:
+        user_query: The user's complex query that may require multiple agents
+
+    Returns:
+        The orchestrated response combining results from specialized agents
+    """
+    logger.info(f"Starting orchestration for query: {user_query[:100]}...")
+
+    route = "both"
+    if routing_enabled():
+        route, answer = await classify(user_query)
+        logger.info(f"Routed to: {route}")
+        if route == "other":
+            if answer:
+                return answer
+            result = await _run_simple("answer", "OctopetsAnswerAgent", ANSWER_INSTRUCTIONS, user_query)
+            return result.text
+
+    async with await create_orchestrator_agent(route) as orchestrator:
+        result = await model_router.run(
+            _route_task(route),
+            orchestrator,
+            user_query,
+            retry_policy,
+            estimate_tokens(user_query),
+            # Lets the model fetch venues and sitters in one turn; the calls run concurrently
+            **lazy_import("agent_common.tool_execution").RUN_OPTIONS,
+        )
+        return result.text
+
+
 async def run_orchestrator(user_query: str) -> str:
     """
-    Run the orchestrator agent with a user query.
-    
+    Run the orchestrator agent with a user query, answering errors with a message.
+
+    Jobs call orchestrate() instead, so a failed run ends the job as failed.
+
     Args:
         user_query: The user's complex query that may require multiple agents
-        
+
     Returns:
         The orchestrated response combining results from specialized agents
     """
     try:
-        logger.info(f"Starting orchestration for query: {user_query[:100]}...")
-        
-        async with await create_orchestrator_agent() as orchestrator:
-            result = await orchestrator.run(user_query)
-            return result.text
-            
+        return await orchestrate(user_query)
     except Exception as e:
+        if is_retryable_error(e):
+            # Retries are exhausted; let the API return 503 + Retry-After and
+            # admission control see upstream throttling so it can back off
+            raise
         logger.error(f"Error in orchestration: {e}")
         return f"I encountered an error processing your request: {str(e)}"
 
@@ -0,0 +1,378 @@
+"""
+Sub-agent transports
+
+The orchestrator's tools reach the listings and pet sitter agents through
+transports. Each transport offers `chat` (a free-form question answered by the
+sub-agent's own LLM run) and `search` (a structured query against the
+sub-agent's data, no LLM involved).
+
+The listings agent is always reached over HTTP (LISTINGS_AGENT_URL). The sitter
+transport is selected with SITTER_AGENT_TRANSPORT:
+
+- "http" (default): POST to the sitter service at SITTER_AGENT_URL
+- "inprocess": load the sitter agent's sitter_agent package (from
+  SITTER_AGENT_PATH, default ../sitter-agent) and call run_pet_sitter_agent /
+  search_pet_sitters directly, skipping the JSON round trip and the second
+  FastAPI stack
+- "sharded": a location-sharded sitter catalog served by several sitter
+  instances (SITTER_SHARD_URLS, comma-separated; see
+  `python -m sitter_agent.catalog split` in the sitter agent). Searches for a location go to the shard that owns
+  it; other searches fan out to every shard and the top k are merged by
+  score. Chat goes to the shard owning the location named in the question;
+  other questions are asked of every shard and get each shard's answer
+
+In-process mode is meant for small deployments where both services ship in
+one image. The package is loaded from its directory under its own name, so
+nothing is added to sys.path and none of its modules can shadow ours; what
+the two services share (retry, admission, model routing, ...) comes from the
+agent_common package. Each call's duration is recorded as subagent.duration,
+tagged with the transport, so the two modes can be compared.
+
+Structured searches over HTTP are GETs. The services tag their catalog
+responses with ETags (see their http_cache.py), so each HTTP transport
+remembers the last SUBAGENT_RESPONSE_CACHE_SIZE tagged responses and
+revalidates them with If-None-Match: while the catalog is unchanged a
+repeated search costs a 304 with no body to send or parse.
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from opentelemetry import metrics
+
+from agent_common.retry import RetryPolicy
+from agent_common.startup import lazy_import
+from agent_common.vocabulary import Vocabulary
+
+logger = logging.getLogger(__name__)
+
+meter = metrics.get_meter(__name__)
+_duration = meter.create_histogram(
+    "subagent.duration",
+    unit="s",
+    description="Time spent in sub-agent calls, by agent, operation and transport",
+)
+
+SITTER_AGENT_TRANSPORT = os.getenv("SITTER_AGENT_TRANSPORT", "http").lower()
+SITTER_AGENT_PATH = Path(os.getenv("SITTER_AGENT_PATH", Path(__file__).resolve().parent.parent / "sitter-agent"))
+# The sitter service's package, found under SITTER_AGENT_PATH in inprocess mode
+SITTER_PACKAGE = "sitter_agent"
+# Sitter shard base URLs for the "sharded" transport, comma-separated
+SITTER_SHARD_URLS = [url.strip() for url in os.getenv("SITTER_SHARD_URLS", "").split(",") if url.strip()]
+# How often (seconds) to re-read which locations each shard serves
+SHARD_MAP_REFRESH_SECONDS = float(os.getenv("SITTER_SHARD_MAP_REFRESH_SECONDS", "60"))
+# Matches returned from a sharded search (each shard returns its own top 5)
+SHARD_SEARCH_LIMIT = 5
+# Tagged responses remembered per HTTP transport for revalidation; 0 disables it
+SUBAGENT_RESPONSE_CACHE_SIZE = int(os.getenv("SUBAGENT_RESPONSE_CACHE_SIZE", "256"))
+NO_SITTERS = json.dumps({"message": "No pet sitters found matching the criteria."})
+
+
+class SubAgentTransport(ABC):
+    """How the orchestrator reaches a sub-agent."""
+
+    agent = "base"
+    name = "base"
+
+    async def _timed(self, operation: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        try:
+            return await call()
+        finally:
+            _duration.record(
+                time.perf_counter() - start,
+                {"agent": self.agent, "operation": operation, "transport": self.name},
+            )
+
+    async def chat(self, user_query: str) -> str:
+        """Ask the sub-agent a free-form question; returns its answer text."""
+        return await self._timed("chat", lambda: self._chat(user_query))
+
+    async def search(self, **criteria) -> str:
+        """Structured search against the sub-agent's data; returns matches as JSON."""
+        return await self._timed("search", lambda: self._search(**criteria))
+
+    @abstractmethod
+    async def _chat(self, user_query: str) -> str:
+        """Transport-specific chat, timed by chat()."""
+
+    @abstractmethod
+    async def _search(self, **criteria) -> str:
+        """Transport-specific search, timed by search()."""
+
+    async def warm_up(self) -> None:
+        """Prepare the transport ahead of the first call (optional)."""
+
+    async def close(self) -> None:
+        """Release resources held by the transport (call on shutdown)."""
+
+
+class HttpTransport(SubAgentTransport):
+    """Calls a sub-agent service's REST API."""
+
+    name = "http"
+
+    def __init__(self, base_url: str, get_client: Callable[[], Any], retry_policy: RetryPolicy):
+        self.base_url = base_url
+        self.get_client = get_client
+        self.retry_policy = retry_policy
+        # (ETag, decoded body) of recent tagged GET responses, by path and query
+        self._tagged: OrderedDict[str, tuple[str, Any]] = OrderedDict()
+
+    async def _post(self, path: str, payload: dict, idempotent: bool = True) -> Any:
+        """POST to the service; pass idempotent=False unless resending a request that may have run is harmless."""
+        client = self.get_client()
+
+        async def post():
+            response = await client.post(f"{self.base_url}{path}", json=payload)
+            response.raise_for_status()
+            return response
+
+        response = await self.retry_policy.run(post, idempotent=idempotent)
+        return response.json()
+
+    async def _get(self, path: str, params: Optional[dict] = None) -> Any:
+        """GET a resource; a remembered tagged response is revalidated and reused if unchanged."""
+        client = self.get_client()
+        params = params or {}
+        key = f"{path} {json.dumps(params, sort_keys=True)}"
+        remembered = self._tagged.get(key)
+
+        async def get():
+            headers = {"If-None-Match": remembered[0]} if remembered else None
+            response = await client.get(f"{self.base_url}{path}", params=params, headers=headers)
+            if not (remembered and response.status_code == 304):
+                response.raise_for_status()
+            return response
+
+        response = await self.retry_policy.run(get)
+        if response.status_code == 304:
+            self._tagged.move_to_end(key)
+            return remembered[1]
+        data = response.json()
+        tag = response.headers.get("etag")
+        if tag and SUBAGENT_RESPONSE_CACHE_SIZE > 0:
+            self._tagged[key] = (tag, data)
+            self._tagged.move_to_end(key)
+            while len(self._tagged) > SUBAGENT_RESPONSE_CACHE_SIZE:
+                self._tagged.popitem(last=False)
+        return data
+
+
+class HttpListingsTransport(HttpTransport):
+    """Listings agent: /agent/chat for the knowledge-base agent, GET /api/search for the catalog."""
+
+    agent = "listings"
+
+    async def _chat(self, user_query: str) -> str:
+        # A chat turn isn't idempotent, and the listings agent retries its own model calls
+        data = await self._post("/agent/chat", {"message": user_query}, idempotent=False)
+        # Extract the message content
+        if isinstance(data, dict) and "message" in data:
+            message_data = data["message"]
+            if isinstance(message_data, dict) and "content" in message_data:
+                return message_data["content"]
+
+        # Fallback to returning the raw response
+        return json.dumps(data)
+
+    async def _search(self, **criteria) -> str:
+        data = await self._get("/api/search", criteria)
+        if not data:
+            return json.dumps({"message": "No listings found matching the criteria."})
+        return json.dumps(data, indent=2)
+
+
+class HttpSitterTransport(HttpTransport):
+    """Sitter agent: /api/chat for the recommendation agent, GET /api/search for the catalog."""
+
+    agent = "sitter"
+
+    async def _chat(self, user_query: str) -> str:
+        # A chat turn isn't idempotent, and the sitter agent retries its own model calls
+        data = await self._post("/api/chat", {"query": user_query}, idempotent=False)
+        # Extract the response content
+        if isinstance(data, dict) and "response" in data:
+            return data["response"]
+
+        # Fallback to returning the raw response
+        return json.dumps(data)
+
+    async def _search(self, **criteria) -> str:
+        data = await self._get("/api/search", criteria)
+        return json.dumps(data, indent=2)
+
+
+class InProcessSitterTransport(SubAgentTransport):
+    """Calls the sitter agent's functions directly in this process."""
+
+    agent = "sitter"
+    name = "inprocess"
+
+    def __init__(self, sitter_path: Path = SITTER_AGENT_PATH):
+        self.sitter_path = sitter_path
+        self._module = None
+
+    def _agent(self):
+        """Import sitter_agent.pet_sitter_agent from the sitter service directory on first use."""
+        if self._module is None:
+            if SITTER_PACKAGE not in sys.modules:
+                self._load_package()
+            self._module = lazy_import(f"{SITTER_PACKAGE}.pet_sitter_agent")
+        return self._module
+
+    def _load_package(self) -> None:
+        """Register the sitter_agent package from its directory; its submodules then import as usual."""
+        package_dir = self.sitter_path / SITTER_PACKAGE
+        if not (package_dir / "pet_sitter_agent.py").exists():
+            raise RuntimeError(f"SITTER_AGENT_TRANSPORT=inprocess but no sitter agent found in {self.sitter_path}")
+        spec = importlib.util.spec_from_file_location(
+            SITTER_PACKAGE, package_dir / "__init__.py", submodule_search_locations=[str(package_dir)]
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[SITTER_PACKAGE] = package
+        try:
+            spec.loader.exec_module(package)
+        except BaseException:
+            del sys.modules[SITTER_PACKAGE]
+            raise
+
+    async def _chat(self, user_query: str) -> str:
+        # run_pet_sitter_agent applies its own retry policy and rate limiting
+        return await self._agent().run_pet_sitter_agent(user_query)
+
+    async def _search(self, **criteria) -> str:
+        return await self._agent().search_pet_sitters(**criteria)
+
+    async def warm_up(self) -> None:
+        agent = self._agent()
+        await agent.get_catalog()
+        await agent.warm_up()
+
+    async def close(self) -> None:
+        if self._module is not None:
+            await self._module.close_azure_clients()
+
+
+class ShardedSitterTransport(SubAgentTransport):
+    """Routes sitter calls across location shards, each a sitter service."""
+
+    agent = "sitter"
+    name = "sharded"
+
+    def __init__(self, urls: list[str], get_client: Callable[[], Any], retry_policy: RetryPolicy):
+        if not urls:
+            raise RuntimeError("SITTER_AGENT_TRANSPORT=sharded but SITTER_SHARD_URLS is empty")
+        self.shards = [HttpSitterTransport(url, get_client, retry_policy) for url in urls]
+        # Locations served by each shard, and a vocabulary over all of them
+        self._locations: list[list[str]] = [[] for _ in urls]
+        self._vocabulary = None
+        self._loaded_at: Optional[float] = None
+
+    async def _load_shard_map(self) -> None:
+        infos = await asyncio.gather(*(shard._get("/api/shard") for shard in self.shards), return_exceptions=True)
+        if all(isinstance(info, Exception) for info in infos):
+            raise RuntimeError(f"No sitter shard reachable: {infos[0]}")
+        for i, info in enumerate(infos):
+            if isinstance(info, Exception):
+                # Keep what we knew; an unknown shard still gets fan-out searches
+                logger.warning(f"Could not read shard map from {self.shards[i].base_url}: {info}")
+            else:
+                self._locations[i] = info["locations"]
+        self._vocabulary = Vocabulary({"location": {term for terms in self._locations for term in terms}})
+        self._loaded_at = time.monotonic()
+
+    async def _shard_map(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= SHARD_MAP_REFRESH_SECONDS:
+            await self._load_shard_map()
+        return self._vocabulary
+
+    def _owners(self, location: str) -> list[int]:
+        """Shards serving a location, with the catalog's substring match."""
+        return [i for i, terms in enumerate(self._locations) if any(location in term for term in terms)]
+
+    def _describe(self, shard: int) -> str:
+        """The locations a shard serves, or its URL if it hasn't reported them."""
+        return ", ".join(self._locations[shard]) or self.shards[shard].base_url
+
+    async def _fan_out(self, targets: list[int], call: Callable[[HttpSitterTransport], Awaitable[Any]]) -> list[tuple[int, Any]]:
+        """Run `call` on the target shards concurrently; (shard, result) for each that answered.
+
+        A failed shard is logged and skipped, so results may be partial; if every
+        target failed, the first error is raised.
+        """
+        responses = await asyncio.gather(*(call(self.shards[i]) for i in targets), return_exceptions=True)
+        if all(isinstance(response, Exception) for response in responses):
+            raise responses[0]
+        answered = []
+        for i, response in zip(targets, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"Sitter shard {self.shards[i].base_url} failed, results may be partial: {response}")
+            else:
+                answered.append((i, response))
+        return answered
+
+    async def _chat(self, user_query: str) -> str:
+        vocabulary = await self._shard_map()
+        location = vocabulary.find_location(user_query)
+        owners = self._owners(location) if location else []
+        if len(owners) == 1:
+            return await self.shards[owners[0]]._chat(user_query)
+        # A chat run only sees its own shard's sitters, so a question without a location is
+        # asked of every shard, and the answers are returned together, each under its locations
+        answers = await self._fan_out(owners or list(range(len(self.shards))), lambda shard: shard._chat(user_query))
+        if len(answers) == 1:
+            return answers[0][1]
+        return "\n\n".join(f"Sitters in {self._describe(i)}:\n{answer}" for i, answer in answers)
+
+    async def _search(self, **criteria) -> str:
+        vocabulary = await self._shard_map()
+        targets = list(range(len(self.shards)))
+        if criteria.get("location"):
+            # Resolved here, against every shard's locations, so a shard without the city can't fuzzy-match another
+            location = vocabulary.resolve("location", criteria["location"])
+            criteria = {**criteria, "location": location}
+            owners = self._owners(location)
+            if owners:
+                targets = owners
+            elif all(self._locations):
+                # Every shard has reported its locations and none serves this one
+                return NO_SITTERS
+
+        answers = await self._fan_out(targets, lambda shard: shard._post("/api/shard/search", criteria))
+        results = [result for _, response in answers for result in response["results"]]
+        results.sort(key=lambda result: (-result["score"], result["sitter"]["id"]))
+        if not results:
+            return NO_SITTERS
+        return json.dumps([result["sitter"] for result in results[:SHARD_SEARCH_LIMIT]], indent=2)
+
+    async def warm_up(self) -> None:
+        await self._load_shard_map()
+
+
+def create_sitter_transport(
+    base_url: str,
+    get_client: Callable[[], Any],
+    retry_policy: RetryPolicy,
+    transport: Optional[str] = None,
+) -> SubAgentTransport:
+    """Build the sitter transport named by SITTER_AGENT_TRANSPORT (or `transport`)."""
+    transport = (transport or SITTER_AGENT_TRANSPORT).lower()
+    if transport == "inprocess":
+        logger.info(f"Sitter agent runs in-process from {SITTER_AGENT_PATH}")
+        return InProcessSitterTransport(SITTER_AGENT_PATH)
+    if transport == "sharded":
+        logger.info(f"Sitter catalog sharded across {len(SITTER_SHARD_URLS)} services")
+        return ShardedSitterTransport(SITTER_SHARD_URLS, get_client, retry_policy)
+    if transport != "http":
+        logger.warning(f"Unknown SITTER_AGENT_TRANSPORT '{transport}', using http")
+    return HttpSitterTransport(base_url, get_client, retry_policy)
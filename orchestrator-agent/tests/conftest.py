@@ -0,0 +1,7 @@
+"""Test settings, applied before the service's modules read them at import time."""
+
+import os
+
+# The local deterministic model, and no background warm-up reaching for Azure or the sub-agents
+os.environ["MODEL_PROVIDER"] = "fake"
+os.environ["AGENT_WARMUP"] = "lazy"
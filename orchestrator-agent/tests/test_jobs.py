@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as orchestrator_app
+from agent_common.admission import AdmissionController
+from jobs import CANCELLED, FAILED, FINISHED, QUEUED, SUCCEEDED, JobQueueFull, JobRunner, MemoryJobStore
+
+
+def runner(run, **kwargs) -> JobRunner:
+    return JobRunner("test", MemoryJobStore(), run, **kwargs)
+
+
+async def finished(runner: JobRunner, job_id: str) -> dict:
+    """Poll a job until it has finished."""
+    for _ in range(500):
+        job = await runner.get(job_id)
+        if job["status"] in FINISHED:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_a_submitted_job_can_be_polled_until_it_succeeds():
+    async def echo(message: str) -> str:
+        return f"answer to {message}"
+
+    async def scenario():
+        jobs = runner(echo)
+        jobs.start()
+        try:
+            job = await jobs.submit("hello")
+            assert job["status"] == QUEUED
+            return await finished(jobs, job["id"])
+        finally:
+            await jobs.stop()
+
+    job = asyncio.run(scenario())
+    assert (job["status"], job["result"], job["error"]) == (SUCCEEDED, "answer to hello", None)
+    assert job["started_at"] <= job["finished_at"] <= job["expires_at"]
+
+
+def test_a_run_that_raises_ends_the_job_failed():
+    async def fail(message: str) -> str:
+        raise RuntimeError("model unavailable")
+
+    async def scenario():
+        jobs = runner(fail)
+        jobs.start()
+        try:
+            return await finished(jobs, (await jobs.submit("hello"))["id"])
+        finally:
+            await jobs.stop()
+
+    job = asyncio.run(scenario())
+    assert (job["status"], job["result"], job["error"]) == (FAILED, None, "model unavailable")
+
+
+def test_queued_and_running_jobs_can_be_cancelled():
+    started = []
+
+    async def scenario():
+        async def block(message: str) -> str:
+            started.append(message)
+            await asyncio.Event().wait()
+            return message
+
+        jobs = runner(block, workers=1)
+        jobs.start()
+        try:
+            running = await jobs.submit("first")
+            queued = await jobs.submit("second")
+            while not started:
+                await asyncio.sleep(0.01)
+            assert (await jobs.cancel(queued["id"]))["status"] == CANCELLED
+            await jobs.cancel(running["id"])
+            return await finished(jobs, running["id"]), await jobs.get(queued["id"])
+        finally:
+            await jobs.stop()
+
+    running, queued = asyncio.run(scenario())
+    assert running["status"] == CANCELLED and queued["status"] == CANCELLED
+    # The cancelled job never reached a worker
+    assert started == ["first"]
+
+
+def test_a_full_queue_rejects_new_jobs():
+    async def scenario():
+        jobs = runner(asyncio.sleep, workers=1, max_queue=1)
+        jobs.start()
+        try:
+            await jobs.submit(10)
+            await asyncio.sleep(0.01)
+            await jobs.submit(10)
+            with pytest.raises(JobQueueFull) as rejected:
+                await jobs.submit(10)
+            return rejected.value
+        finally:
+            await jobs.stop()
+
+    assert asyncio.run(scenario()).retry_after >= 1
+
+
+@pytest.fixture
+def admission(monkeypatch) -> AdmissionController:
+    controller = AdmissionController("test", max_concurrency=1, max_queue=1)
+    monkeypatch.setattr(orchestrator_app, "admission", controller)
+    return controller
+
+
+def test_jobs_run_in_an_admission_slot(admission, monkeypatch):
+    in_flight = []
+
+    async def orchestrate(message: str) -> str:
+        in_flight.append(admission.stats()["in_flight"])
+        return message
+
+    monkeypatch.setattr(orchestrator_app, "orchestrate", orchestrate)
+
+    async def scenario():
+        async def hold_slot():
+            async with admission.slot():
+                await asyncio.sleep(0.1)
+
+        holder = asyncio.create_task(hold_slot())
+        await asyncio.sleep(0)
+        # Queued behind the chat holding the only slot, then admitted once it is free
+        result = await orchestrator_app.run_job("hello")
+        return result, holder.done()
+
+    assert asyncio.run(scenario()) == ("hello", True)
+    assert in_flight == [1]
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_a_failed_orchestration_is_a_failed_job(monkeypatch):
+    async def orchestrate(message: str) -> str:
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(orchestrator_app, "orchestrate", orchestrate)
+    monkeypatch.setattr(orchestrator_app, "job_runner", JobRunner("test", MemoryJobStore(), orchestrator_app.run_job))
+
+    with TestClient(orchestrator_app.app) as client:
+        response = client.post("/agent/jobs", json={"message": "hello"})
+        assert response.status_code == 202
+        assert response.headers["location"] == f"/agent/jobs/{response.json()['id']}"
+        for _ in range(500):
+            job = client.get(response.headers["location"]).json()
+            if job["status"] in FINISHED:
+                break
+        assert (job["status"], job["result"], job["error"]) == (FAILED, None, "model unavailable")
+
+        assert client.delete(response.headers["location"]).json()["status"] == FAILED
+        assert client.get("/agent/jobs/unknown").status_code == 404
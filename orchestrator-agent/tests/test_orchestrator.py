@@ -0,0 +1,68 @@
+"""The orchestrator end to end on the fake model (MODEL_PROVIDER=fake, see conftest), with stub sub-agents."""
+
+import asyncio
+import json
+
+import pytest
+
+import orchestrator
+from subagents import SubAgentTransport
+
+
+class StubTransport(SubAgentTransport):
+    """Answers searches with one canned match and records them."""
+
+    name = "stub"
+
+    def __init__(self, agent: str, error: Exception = None):
+        self.agent = agent
+        self.error = error
+        self.searches = []
+
+    async def _chat(self, user_query: str) -> str:
+        return f"{self.agent} says hi"
+
+    async def _search(self, **criteria) -> str:
+        self.searches.append(criteria)
+        if self.error:
+            raise self.error
+        return json.dumps([{"id": 1, "agent": self.agent}])
+
+
+@pytest.fixture
+def transports(monkeypatch) -> dict:
+    stubs = {"listings": StubTransport("listings"), "sitter": StubTransport("sitter")}
+    monkeypatch.setattr(orchestrator, "listings_transport", stubs["listings"])
+    monkeypatch.setattr(orchestrator, "sitter_transport", stubs["sitter"])
+    return stubs
+
+
+def test_routing_is_on_with_the_fake_model():
+    assert orchestrator.model_router.provider == "fake"
+    assert orchestrator.routing_enabled()
+
+
+def test_a_single_source_request_searches_only_that_source(transports):
+    reply = asyncio.run(orchestrator.orchestrate("cat sitter in Seattle"))
+    assert reply == "[gpt-4.1] Answer to: cat sitter in Seattle (from 1 tool results)"
+    assert transports["sitter"].searches == [{}]
+    assert transports["listings"].searches == []
+
+
+def test_a_request_for_both_searches_both_sources(transports):
+    reply = asyncio.run(orchestrator.orchestrate("a cafe in Seattle and a dog walker"))
+    assert reply.endswith("(from 2 tool results)")
+    assert transports["sitter"].searches == [{}] and transports["listings"].searches == [{}]
+
+
+def test_small_talk_is_answered_without_tools(transports):
+    reply = asyncio.run(orchestrator.orchestrate("hello"))
+    assert reply.startswith("Hello!")
+    assert transports["sitter"].searches == [] and transports["listings"].searches == []
+
+
+def test_a_failing_sub_agent_becomes_a_tool_error(transports):
+    transports["sitter"].error = ConnectionError("sitter is down")
+    reply = asyncio.run(orchestrator.run_orchestrator("cat sitter in Seattle"))
+    assert reply.endswith("(from 1 tool results)")
+    assert json.loads(asyncio.run(orchestrator.search_pet_sitters()))["status"] == "error"
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+
+from agent_common.retry import RetryPolicy
+from subagents import NO_SITTERS, ShardedSitterTransport
+
+SHARDS = {
+    "http://shard-a": ["seattle, wa", "chicago, il"],
+    "http://shard-b": ["new york, ny", "miami, fl"],
+}
+
+
+class Shard:
+    """Stands in for one sitter service: its shard map, shard search and chat."""
+
+    def __init__(self, url: str, locations: list[str]):
+        self.url = url
+        self.locations = locations
+        self.error = None
+        self.calls = []
+
+    def results(self, criteria: dict) -> list[dict]:
+        location = criteria.get("location", "")
+        sitters = [
+            {"id": 10 * i + n, "location": term}
+            for i, term in enumerate(self.locations, start=1 if self.url.endswith("a") else 3)
+            for n in (1, 2)
+            if location in term
+        ]
+        return [{"score": sitter["id"] % 7, "sitter": sitter} for sitter in sitters]
+
+    async def get(self, path: str, params=None):
+        if self.error:
+            raise self.error
+        return {"locations": self.locations}
+
+    async def post(self, path: str, payload: dict, idempotent: bool = True):
+        self.calls.append(("search", payload))
+        if self.error:
+            raise self.error
+        return {"results": self.results(payload)}
+
+    async def chat(self, user_query: str) -> str:
+        self.calls.append(("chat", user_query))
+        if self.error:
+            raise self.error
+        return f"{self.url} recommends"
+
+
+@pytest.fixture
+def shards() -> dict[str, Shard]:
+    return {url: Shard(url, locations) for url, locations in SHARDS.items()}
+
+
+@pytest.fixture
+def transport(shards) -> ShardedSitterTransport:
+    transport = ShardedSitterTransport(list(shards), lambda: None, RetryPolicy("test", max_attempts=1))
+    for http in transport.shards:
+        shard = shards[http.base_url]
+        http._get, http._post, http._chat = shard.get, shard.post, shard.chat
+    return transport
+
+
+def test_a_search_goes_only_to_the_shard_serving_its_location(transport, shards):
+    matches = json.loads(asyncio.run(transport.search(location="Seatle", pet_type="dogs")))
+    assert {sitter["location"] for sitter in matches} == {"seattle, wa"}
+    assert shards["http://shard-a"].calls == [("search", {"location": "seattle", "pet_type": "dogs"})]
+    assert shards["http://shard-b"].calls == []
+
+
+def test_a_search_without_a_location_merges_every_shard_by_score(transport, shards):
+    matches = json.loads(asyncio.run(transport.search(pet_type="dogs")))
+    results = [result for shard in shards.values() for result in shard.results({})]
+    expected = sorted(results, key=lambda result: (-result["score"], result["sitter"]["id"]))[:5]
+    assert matches == [result["sitter"] for result in expected]
+    assert all(len(shard.calls) == 1 for shard in shards.values())
+
+
+def test_an_unserved_location_asks_no_shard(transport, shards):
+    assert asyncio.run(transport.search(location="Boston")) == NO_SITTERS
+    assert all(shard.calls == [] for shard in shards.values())
+
+
+def test_a_failed_shard_gives_partial_results(transport, shards):
+    shards["http://shard-b"].error = ConnectionError("down")
+    matches = json.loads(asyncio.run(transport.search()))
+    assert {sitter["location"] for sitter in matches} == {"seattle, wa", "chicago, il"}
+
+    shards["http://shard-a"].error = ConnectionError("down too")
+    with pytest.raises(ConnectionError):
+        asyncio.run(transport.search())
+
+
+def test_chat_about_a_location_goes_to_its_shard(transport, shards):
+    assert asyncio.run(transport.chat("a dog sitter in Miami")) == "http://shard-b recommends"
+    assert shards["http://shard-a"].calls == []
+
+
+def test_chat_without_a_location_asks_every_shard(transport, shards):
+    reply = asyncio.run(transport.chat("who is the best rated dog walker?"))
+    assert reply == (
+        "Sitters in seattle, wa, chicago, il:\nhttp://shard-a recommends\n\n"
+        "Sitters in new york, ny, miami, fl:\nhttp://shard-b recommends"
+    )
+    assert all(len(shard.calls) == 1 for shard in shards.values())
+
+    shards["http://shard-a"].error = ConnectionError("down")
+    assert asyncio.run(transport.chat("who is the best rated dog walker?")) == "http://shard-b recommends"
+
+
+def test_a_shard_that_never_reported_still_gets_fan_out(transport, shards):
+    shards["http://shard-b"].error = ConnectionError("down")
+    asyncio.run(transport.warm_up())
+    shards["http://shard-b"].error = None
+    # Boston might be served by the silent shard
+    assert asyncio.run(transport.search(location="Boston")) == NO_SITTERS
+    assert shards["http://shard-b"].calls == [("search", {"location": "Boston"})]
+    reply = asyncio.run(transport.chat("who is the best rated dog walker?"))
+    assert reply.endswith("Sitters in http://shard-b:\nhttp://shard-b recommends")
@@ -4,25 +4,35 @@ FastAPI wrapper for Pet Sitter Recommendation Agent
 This provides REST API endpoints to interact with the pet sitter agent.
 """
 
+from agent_common.startup import WARMUP_MODE, log_report, mark, readiness, report
+
 import logging
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, Security
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from fastapi.security import APIKeyHeader
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional
 import asyncio
+import hmac
+import math
 import os
+import orjson
 from dotenv import load_dotenv
 
-from pet_sitter_agent import run_pet_sitter_agent, search_pet_sitters, get_pet_sitter_details
+from agent_common.admission import AdmissionController, AdmissionRejected
+from agent_common.loop_monitor import LoopMonitor
+from agent_common.profiling import ProfilingMiddleware
+from agent_common.retry import is_retryable_error, retry_after_seconds
+from agent_common.telemetry import init_telemetry, shutdown_telemetry
+from sitter_agent.catalog import SHARD_COUNT, SHARD_INDEX, SNAPSHOT_INTERVAL, get_catalog, json_array
+from sitter_agent.http_cache import ResponseCache, etag
+from sitter_agent.pet_sitter_agent import close_azure_clients, run_pet_sitter_agent, warm_up
 
 # Load environment variables
 load_dotenv()
 
 # OpenTelemetry imports
-from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 # Configure logging
@@ -34,11 +44,33 @@ API_PORT = int(os.getenv("API_PORT", "8002"))
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 FRONTEND_URL = os.environ.get("FRONTEND_URL", "http://localhost:3000")
+# Key the catalog write endpoints require in X-API-Key; writes are refused while it is unset
+SITTER_ADMIN_API_KEY = os.getenv("SITTER_ADMIN_API_KEY", "")
 
 # Parse CORS origins - can be a single URL or comma-separated list
 cors_origins = [origin.strip() for origin in FRONTEND_URL.split(",")]
 logger.info(f"CORS origins configured: {cors_origins}")
 
+# Bounds concurrent agent runs for /api/chat (AGENT_MAX_CONCURRENCY, AGENT_MAX_QUEUE, ...)
+admission = AdmissionController.from_env("sitter-chat")
+
+# Event-loop lag and slow callback metrics (LOOP_MONITOR_INTERVAL_MS, LOOP_SLOW_CALLBACK_MS)
+loop_monitor = LoopMonitor.from_env("sitter")
+
+# ETags, 304s and recently rendered bodies for catalog reads (RESPONSE_CACHE_CONTROL, RESPONSE_CACHE_SIZE)
+response_cache = ResponseCache.from_env("sitter")
+
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+
+async def require_admin_key(api_key: Optional[str] = Security(api_key_header)) -> None:
+    """Authorize a catalog write: X-API-Key must match SITTER_ADMIN_API_KEY."""
+    if not SITTER_ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Catalog writes are disabled: SITTER_ADMIN_API_KEY is not set")
+    if not api_key or not hmac.compare_digest(api_key.encode(), SITTER_ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=401, detail="Missing or invalid API key", headers={"WWW-Authenticate": "ApiKey"})
+
+
 # Request/Response Models
 class ChatRequest(BaseModel):
     """Request model for chat endpoint."""
@@ -85,6 +117,54 @@ class SearchRequest(BaseModel):
     day_needed: Optional[str] = Field(None, description="Day needed (e.g., 'Monday', 'Saturday')")
     max_rate: Optional[float] = Field(None, description="Maximum hourly rate budget")
     specialization: Optional[str] = Field(None, description="Specific specialization (e.g., 'senior_pets')")
+    preferred_specialization: Optional[str] = Field(None, description="Specialization to rank higher without requiring it")
+    prefer_certified: bool = Field(False, description="Rank sitters with more certifications higher")
+
+
+class SitterCreate(BaseModel):
+    """A pet sitter profile for create/replace; fields beyond these are stored as given."""
+    model_config = ConfigDict(
+        extra="allow",
+        json_schema_extra={
+            "examples": [{
+                "name": "Jamie Rivera",
+                "location": "Seattle, WA",
+                "typeOfPets": ["dogs", "cats"],
+                "services": ["pet_sitting", "dog_walking"],
+                "daysAvailable": ["Saturday", "Sunday"],
+                "hourlyRate": 28,
+                "specializations": ["puppy_training"],
+                "certifications": ["Pet First Aid"]
+            }]
+        }
+    )
+    
+    name: str = Field(..., description="Sitter's display name", min_length=1)
+    location: str = Field(..., description="City and state (e.g., 'Seattle, WA')", min_length=1)
+    typeOfPets: list[str] = Field(..., description="Pet types cared for (e.g., 'dogs', 'cats')")
+    services: list[str] = Field(..., description="Services offered (e.g., 'pet_sitting', 'dog_walking')")
+    daysAvailable: list[str] = Field(..., description="Days available (e.g., 'Monday')")
+    hourlyRate: float = Field(..., description="Hourly rate in dollars", gt=0)
+    specializations: list[str] = Field(default_factory=list, description="Specializations (e.g., 'senior_pets')")
+    certifications: list[str] = Field(default_factory=list, description="Certifications held")
+    rating: float = Field(0.0, description="Average review rating", ge=0, le=5)
+    reviewCount: int = Field(0, description="Number of reviews behind the rating", ge=0)
+
+
+class SitterUpdate(BaseModel):
+    """Fields to change on a pet sitter; omitted fields keep their current values."""
+    model_config = ConfigDict(extra="allow")
+    
+    name: Optional[str] = Field(None, min_length=1)
+    location: Optional[str] = Field(None, min_length=1)
+    typeOfPets: Optional[list[str]] = None
+    services: Optional[list[str]] = None
+    daysAvailable: Optional[list[str]] = None
+    hourlyRate: Optional[float] = Field(None, gt=0)
+    specializations: Optional[list[str]] = None
+    certifications: Optional[list[str]] = None
+    rating: Optional[float] = Field(None, ge=0, le=5)
+    reviewCount: Optional[int] = Field(None, ge=0)
 
 
 # Initialize FastAPI app
@@ -92,6 +172,8 @@ app = FastAPI(
     title="Pet Sitter Recommendation API",
     description="AI-powered pet sitter recommendation service",
     version="1.0.0",
+    # orjson renders responses several times faster than the stdlib encoder
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
@@ -99,16 +181,16 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=cors_origins,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "DELETE"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
     allow_headers=["*"],
 )
 
-# Instrument FastAPI with OpenTelemetry
-trace.set_tracer_provider(TracerProvider())
-otlpExporter = OTLPSpanExporter(endpoint=os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"))
-processor = BatchSpanProcessor(otlpExporter)
-trace.get_tracer_provider().add_span_processor(processor)
+# Opt-in per-request profiling, by admin header or sampling rate (see agent_common.profiling)
+app.add_middleware(ProfilingMiddleware, service="sitter")
 
+# Instrument FastAPI with OpenTelemetry; providers and exporters are created per worker
+# process at startup (see agent_common.telemetry) so exporter threads and gRPC channels are never
+# shared across a fork
 FastAPIInstrumentor().instrument_app(app)
 
 
@@ -121,17 +203,65 @@ async def root():
         "endpoints": {
             "chat": "/api/chat",
             "search": "/api/search",
+            "facets": "/api/facets",
             "sitter_details": "/api/sitter/{sitter_id}",
+            "sitter_create": "/api/sitter",
             "health": "/health",
+            "ready": "/ready",
             "docs": "/docs"
         }
     }
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Per-worker initialization: telemetry exporters and the pet sitter catalog."""
+    mark("imported")
+    init_telemetry()
+    mark("telemetry")
+    loop_monitor.start()
+    catalog = await get_catalog()
+    mark("catalog")
+    if SNAPSHOT_INTERVAL > 0:
+        # Folds sitters written through the API into the dataset and snapshot
+        asyncio.create_task(catalog.run_snapshotting())
+    if WARMUP_MODE == "background":
+        # Agent stack and Azure clients load after the server starts accepting requests
+        asyncio.create_task(warm_up())
+    log_report()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release this worker's Azure clients and flush telemetry."""
+    await close_azure_clients()
+    loop_monitor.stop()
+    shutdown_telemetry()
+
+
+@app.get("/debug/startup")
+async def startup_report():
+    """Cold start timings for this worker: startup phases and lazy import durations."""
+    return report()
+
+
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 503 until this worker's warm-up has completed."""
+    state = readiness()
+    if not state["ready"]:
+        response.status_code = 503
+    return state
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
+    """Liveness check: the process is up (see /ready for whether it should get traffic)."""
+    return {
+        "status": "healthy",
+        "admission": admission.stats(), "event_loop": loop_monitor.stats(),
+        "response_cache": response_cache.stats(),
+    }
 
 
 @app.post("/api/chat", response_model=ChatResponse)
@@ -143,59 +273,217 @@ async def chat(request: ChatRequest):
     based on your requirements (location, pet type, budget, schedule, etc.).
     """
     try:
-        response = await run_pet_sitter_agent(request.query)
+        async with admission.slot():
+            response = await run_pet_sitter_agent(request.query)
         return ChatResponse(response=response)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
+        if is_retryable_error(e):
+            retry_after = retry_after_seconds(e) or admission.retry_after()
+            raise HTTPException(
+                status_code=503,
+                detail="The AI service is busy, please retry shortly.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
 
+async def search_response(request: Request, criteria: SearchRequest) -> Response:
+    """Search results tagged with the catalog version and the criteria as the catalog interprets them."""
+    try:
+        catalog = await get_catalog()
+        view = catalog.view
+        query = criteria.model_dump()
+
+        async def render() -> bytes:
+            sitters = await catalog.search(view=view, raw=True, **query)
+            if not sitters:
+                return orjson.dumps({"message": "No pet sitters found matching the criteria."})
+            # Assembled from the catalog's pre-serialized records, never decoded
+            return json_array(sitters)
+
+        return await response_cache.respond(request, etag("search", view.tag, view.interpret(query)), render)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+
+
 @app.post("/api/search")
-async def search(request: SearchRequest):
+async def search(request: Request, criteria: SearchRequest):
     """
     Search for pet sitters with specific criteria.
     
     Returns a filtered list of pet sitters matching your requirements.
     """
+    return await search_response(request, criteria)
+
+
+@app.get("/api/search")
+async def search_by_query(request: Request, criteria: SearchRequest = Depends()):
+    """
+    Search like POST /api/search, with the criteria as query parameters.
+    
+    Responses carry an ETag, so browsers, proxies and pollers can revalidate
+    with If-None-Match and get 304 Not Modified until the catalog changes.
+    """
+    return await search_response(request, criteria)
+
+
+@app.get("/api/shard")
+async def shard_info():
+    """
+    Which part of a location-sharded catalog this instance serves.
+    
+    Routers read the locations to send location-scoped searches to the
+    owning shard only.
+    """
+    catalog = await get_catalog()
+    view = catalog.view
+    return {
+        "index": SHARD_INDEX,
+        "count": SHARD_COUNT,
+        "sitters": view.count,
+        "locations": view.locations(),
+    }
+
+
+@app.post("/api/shard/search")
+async def shard_search(request: Request, criteria: SearchRequest):
+    """
+    Search like /api/search, returning each match with its ranking score.
+    
+    Scores are comparable across shards that share SITTER_RANK_PRIOR_MEAN, so
+    a router can merge several shards' results into one top list.
+    """
     try:
-        import json
-        result = search_pet_sitters(
-            location=request.location,
-            pet_type=request.pet_type,
-            service=request.service,
-            day_needed=request.day_needed,
-            max_rate=request.max_rate,
-            specialization=request.specialization,
-        )
-        return json.loads(result)
+        catalog = await get_catalog()
+        view = catalog.view
+        query = criteria.model_dump()
+
+        async def render() -> bytes:
+            results = await catalog.search(view=view, scored=True, raw=True, **query)
+            items = [b'{"score":%s,"sitter":%s}' % (repr(score).encode(), sitter) for score, sitter in results]
+            return b'{"shard":%d,"results":%s}' % (SHARD_INDEX, json_array(items))
+
+        return await response_cache.respond(request, etag("shard/search", view.tag, view.interpret(query)), render)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
 
 
+@app.get("/api/facets")
+async def facets(
+    request: Request,
+    location: Optional[str] = None,
+    pet_type: Optional[str] = None,
+    service: Optional[str] = None,
+    day_needed: Optional[str] = None,
+    max_rate: Optional[float] = None,
+    specialization: Optional[str] = None,
+):
+    """
+    Count pet sitters matching the given filters.
+    
+    Returns the total, counts per location / pet type / service / day /
+    specialization, hourly rate min, max and histogram, and the rating
+    distribution. Filters work as in /api/search.
+    """
+    try:
+        catalog = await get_catalog()
+        view = catalog.view
+        filters = {
+            "location": location,
+            "pet_type": pet_type,
+            "service": service,
+            "day_needed": day_needed,
+            "max_rate": max_rate,
+            "specialization": specialization,
+        }
+
+        async def render() -> bytes:
+            return orjson.dumps(await catalog.facet_summary(view=view, **filters))
+
+        return await response_cache.respond(request, etag("facets", view.tag, view.interpret(filters)), render)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Facet error: {str(e)}")
+
+
 @app.get("/api/sitter/{sitter_id}")
-async def get_sitter_details(sitter_id: int):
+async def get_sitter_details(request: Request, sitter_id: int):
     """
     Get detailed information about a specific pet sitter.
     
     Args:
         sitter_id: The unique ID of the pet sitter
     """
-    try:
-        import json
-        result = get_pet_sitter_details(sitter_id)
-        response = json.loads(result)
-        
-        if "error" in response:
-            raise HTTPException(status_code=404, detail=response["error"])
-        
-        return response
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching sitter details: {str(e)}")
+    catalog = await get_catalog()
+    sitter = catalog.get_json(sitter_id)
+    if sitter is None:
+        raise HTTPException(status_code=404, detail=f"Pet sitter with ID {sitter_id} not found.")
+    # Tagged by the record itself, so writes to other sitters don't invalidate it
+    return response_cache.tagged(request, etag("sitter", sitter.decode()), sitter)
+
+
+@app.post("/api/sitter", status_code=201, dependencies=[Depends(require_admin_key)])
+async def create_sitter(request: SitterCreate):
+    """
+    Add a pet sitter.
+    
+    The sitter is assigned the next free id and is searchable immediately;
+    the write is logged before it is applied, so it survives a restart.
+    """
+    catalog = await get_catalog()
+    return await catalog.create(request.model_dump())
+
+
+@app.put("/api/sitter/{sitter_id}", dependencies=[Depends(require_admin_key)])
+async def replace_sitter(sitter_id: int, request: SitterCreate):
+    """
+    Replace a pet sitter's whole profile.
+    
+    Args:
+        sitter_id: The unique ID of the pet sitter
+    """
+    catalog = await get_catalog()
+    sitter = await catalog.update(sitter_id, request.model_dump(), replace=True)
+    if sitter is None:
+        raise HTTPException(status_code=404, detail=f"Pet sitter with ID {sitter_id} not found")
+    return sitter
+
+
+@app.patch("/api/sitter/{sitter_id}", dependencies=[Depends(require_admin_key)])
+async def update_sitter(sitter_id: int, request: SitterUpdate):
+    """
+    Change some of a pet sitter's fields; the rest keep their values.
+    
+    Args:
+        sitter_id: The unique ID of the pet sitter
+    """
+    catalog = await get_catalog()
+    sitter = await catalog.update(sitter_id, request.model_dump(exclude_unset=True, exclude_none=True))
+    if sitter is None:
+        raise HTTPException(status_code=404, detail=f"Pet sitter with ID {sitter_id} not found")
+    return sitter
+
+
+@app.delete("/api/sitter/{sitter_id}", status_code=204, dependencies=[Depends(require_admin_key)])
+async def delete_sitter(sitter_id: int):
+    """
+    Remove a pet sitter from the catalog.
+    
+    Args:
+        sitter_id: The unique ID of the pet sitter
+    """
+    catalog = await get_catalog()
+    if not await catalog.delete(sitter_id):
+        raise HTTPException(status_code=404, detail=f"Pet sitter with ID {sitter_id} not found")
+    return Response(status_code=204)
 
 
 if __name__ == "__main__":
     import uvicorn
     
     port = int(os.environ.get("PORT", 8002))
-    uvicorn.run(app, port=port)
+    # WEB_CONCURRENCY > 1 runs that many worker processes; each initializes its own
+    # telemetry and Azure clients at startup and maps the shared catalog snapshot
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+    uvicorn.run("app:app", port=port, workers=workers)
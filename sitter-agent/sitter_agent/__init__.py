@@ -0,0 +1 @@
+"""The pet sitter agent: catalog, retrieval and recommendation, served by app.py."""
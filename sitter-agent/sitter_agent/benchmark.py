@@ -0,0 +1,114 @@
+"""
+Response encoding benchmark
+
+Compares how /api/search and /api/sitter/{id} responses were built before
+and after serving pre-serialized records:
+
+- before: decode the matching records, json.dumps(indent=2) in the tool
+  function, json.loads in the handler, then FastAPI's jsonable_encoder and
+  stdlib JSONResponse
+- after: join the catalog's stored record bytes into the body, no decoding
+
+and the default response class on a typical dict payload (the facet
+summary), stdlib JSONResponse against ORJSONResponse.
+
+Runs against the catalog in SITTER_DATA_PATH, optionally enlarged with
+--copies so searches return full pages:
+
+    python -m sitter_agent.benchmark --copies 200 --iterations 2000
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from sitter_agent.catalog import DATA_PATH, CatalogView, _read_json, compile_sitters, json_array
+from sitter_agent.snapshot import Snapshot
+
+QUERIES = [
+    {},
+    {"location": "NYC"},
+    {"pet_type": "cats", "prefer_certified": True},
+    {"service": "dog walking", "preferred_specialization": "senior_pets"},
+]
+
+
+def load_view(path: Path, copies: int) -> CatalogView:
+    """The catalog from `path`, each sitter repeated `copies` times under new ids."""
+    sitters = _read_json(path)
+    enlarged = [{**sitter, "id": copy * len(sitters) + sitter["id"]} for copy in range(copies) for sitter in sitters]
+    return CatalogView(Snapshot(compile_sitters(enlarged)))
+
+
+def measure(run: Callable[[], object], iterations: int) -> float:
+    """Mean microseconds per call over `iterations`, after a short warm-up."""
+    for _ in range(min(iterations, 100)):
+        run()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def search_before(view: CatalogView, criteria: dict) -> bytes:
+    text = json.dumps(view.search(**criteria), indent=2)
+    return JSONResponse(content=jsonable_encoder(json.loads(text))).body
+
+
+def search_after(view: CatalogView, criteria: dict) -> bytes:
+    return json_array(view.search(raw=True, **criteria))
+
+
+def detail_before(view: CatalogView, sitter_id: int) -> bytes:
+    return JSONResponse(content=jsonable_encoder(view.get(sitter_id))).body
+
+
+def detail_after(view: CatalogView, sitter_id: int) -> bytes:
+    return view.get_json(sitter_id)
+
+
+def report(name: str, before: float, after: float) -> None:
+    print(f"{name:<28} {before:>10.1f} us {after:>10.1f} us {before / after:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API response encoding")
+    parser.add_argument("--source", type=Path, default=DATA_PATH, help="JSON dataset to load")
+    parser.add_argument("--copies", type=int, default=100, help="Times to repeat the dataset")
+    parser.add_argument("--iterations", type=int, default=2000, help="Calls per measurement")
+    args = parser.parse_args()
+
+    view = load_view(args.source, args.copies)
+    print(f"{view.count} pet sitters, {args.iterations} iterations\n")
+    print(f"{'':<28} {'before':>13} {'after':>13} {'speedup':>9}")
+
+    for criteria in QUERIES:
+        assert json.loads(search_before(view, criteria)) == json.loads(search_after(view, criteria))
+        report(
+            f"search {json.dumps(criteria)[:20]}",
+            measure(lambda: search_before(view, criteria), args.iterations),
+            measure(lambda: search_after(view, criteria), args.iterations),
+        )
+
+    sitter_id = next(iter(view.positions))
+    report(
+        "sitter detail",
+        measure(lambda: detail_before(view, sitter_id), args.iterations),
+        measure(lambda: detail_after(view, sitter_id), args.iterations),
+    )
+
+    summary = jsonable_encoder(view.facet_summary())
+    report(
+        "facets (response class)",
+        measure(lambda: JSONResponse(content=summary).body, args.iterations),
+        measure(lambda: ORJSONResponse(content=summary).body, args.iterations),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,689 @@
+"""
+Pet Sitter Catalog
+
+Keeps the pet sitter data in memory so the agent tools and API endpoints
+don't read and parse pet-sitter.json on every call. Loading, reloading and
+scans over large datasets run in a worker thread so they never stall the event
+loop that is serving other requests.
+
+The catalog is backed by a compiled snapshot (see snapshot.py) with numeric
+columns and per-facet posting lists. Records are stored best first by a
+Bayesian-smoothed rating (see ranking.py), so searches walk the intersected
+posting lists in rank order, stop after the top k and only decode the records
+they return. Filter values are first resolved against the catalog's own
+vocabulary (see agent_common.vocabulary), so "NYC" or "dog walking" match on
+the first try. Build the snapshot offline with:
+
+    python -m sitter_agent.catalog build-snapshot
+
+When no snapshot exists, or it is older than the JSON source, the JSON is
+parsed and the same structure is built in memory.
+
+Sitters created, updated or deleted through the API go to a write-ahead log
+(see wal.py) and are applied on top of the snapshot without rebuilding it:
+deleted or replaced rows are masked out, and new versions are kept as
+pending sitters with their facet terms and score precomputed, merged into
+results in rank order. Each write produces a new immutable CatalogView, so
+searches never lock. The log is folded into the JSON and a fresh snapshot
+every SITTER_SNAPSHOT_INTERVAL_SECONDS, or on demand with:
+
+    python -m sitter_agent.catalog compact
+
+A catalog too large for one process can be sharded by location: each shard
+is a sitter-agent instance serving the sitters of some locations, from its
+own dataset file. Split the dataset with:
+
+    python -m sitter_agent.catalog split --shards 3
+
+and start one instance per shard with the SITTER_DATA_PATH,
+SITTER_SHARD_INDEX, SITTER_SHARD_COUNT and SITTER_RANK_PRIOR_MEAN it prints.
+The shared prior mean keeps scores comparable across shards, so a router
+(the orchestrator's "sharded" sitter transport) can merge their top k.
+Sitters created on a shard get ids congruent to its index modulo the shard
+count, so ids stay unique across shards.
+"""
+
+import argparse
+import asyncio
+import copy
+import heapq
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from agent_common.vocabulary import Vocabulary
+from sitter_agent.facets import FacetIndex
+from sitter_agent.ranking import BayesianPrior, contains, intersect, top_k
+from sitter_agent.snapshot import (
+    Snapshot,
+    SnapshotError,
+    build_snapshot,
+    ensure_snapshot,
+    is_current,
+    write_snapshot,
+)
+from sitter_agent.wal import WriteAheadLog, compact, delete_entry, high_water, put_entry
+
+logger = logging.getLogger(__name__)
+
+DATA_PATH = Path(os.getenv("SITTER_DATA_PATH", Path(__file__).parent.parent / "data" / "pet-sitter.json"))
+SNAPSHOT_PATH = Path(os.getenv("SITTER_SNAPSHOT_PATH", DATA_PATH.with_suffix(".snap")))
+# Sitters created, updated or deleted through the API, waiting to be compacted into the JSON dataset
+WAL_PATH = Path(os.getenv("SITTER_WAL_PATH", DATA_PATH.with_name(f"{DATA_PATH.stem}-wal.jsonl")))
+# How often (seconds) to fold the write-ahead log into the dataset and snapshot; 0 disables it
+SNAPSHOT_INTERVAL = float(os.getenv("SITTER_SNAPSHOT_INTERVAL_SECONDS", "300"))
+# How often (seconds) to check the data file for changes; 0 disables hot reload
+RELOAD_INTERVAL = float(os.getenv("SITTER_RELOAD_INTERVAL_SECONDS", "5"))
+# Compile the snapshot at startup when missing/stale so every worker process maps one
+# shared copy instead of each parsing its own (on by default with WEB_CONCURRENCY > 1)
+SNAPSHOT_AUTOBUILD = os.getenv(
+    "CATALOG_SNAPSHOT_AUTOBUILD", "true" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else "false"
+).lower() == "true"
+# Catalogs larger than this are searched in a worker thread instead of on the event loop
+OFFLOAD_THRESHOLD = int(os.getenv("SITTER_SEARCH_OFFLOAD_THRESHOLD", "5000"))
+# Reviews' worth of weight given to the catalog-wide mean rating when smoothing scores
+RANK_PRIOR_REVIEWS = float(os.getenv("SITTER_RANK_PRIOR_REVIEWS", "25"))
+# Mean rating to smooth towards instead of this dataset's own (set the same on every shard)
+RANK_PRIOR_MEAN = os.getenv("SITTER_RANK_PRIOR_MEAN")
+# This instance's shard of a location-sharded catalog (see `python -m sitter_agent.catalog split`)
+SHARD_INDEX = int(os.getenv("SITTER_SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.getenv("SITTER_SHARD_COUNT", "1"))
+# Optional query-time boosts, added to the smoothed score (0-5 scale)
+SPECIALIZATION_BOOST = float(os.getenv("SITTER_BOOST_SPECIALIZATION", "0.15"))
+CERTIFICATION_BOOST = float(os.getenv("SITTER_BOOST_PER_CERTIFICATION", "0.05"))
+MAX_BOOSTED_CERTIFICATIONS = 3
+
+
+# Numeric columns and facet terms compiled into the snapshot
+SITTER_COLUMNS = {
+    "id": lambda s: s["id"],
+    "rating": lambda s: s["rating"],
+    "reviewCount": lambda s: s["reviewCount"],
+    "hourlyRate": lambda s: s["hourlyRate"],
+    "certifications": lambda s: len(s.get("certifications") or []),
+}
+SITTER_FACETS = {
+    "location": lambda s: [s["location"].lower()],
+    "typeOfPets": lambda s: [pt.lower() for pt in s["typeOfPets"]],
+    "services": lambda s: [sv.lower() for sv in s["services"]],
+    "daysAvailable": lambda s: s["daysAvailable"],
+    "specializations": lambda s: [sp.lower() for sp in s["specializations"]],
+}
+# Search parameters resolved against each facet's vocabulary before matching
+FILTER_FACETS = {
+    "location": "location",
+    "pet_type": "typeOfPets",
+    "service": "services",
+    "day_needed": "daysAvailable",
+    "specialization": "specializations",
+    "preferred_specialization": "specializations",
+}
+
+
+def _mtime(path: Path) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _read_json(path: Path) -> list[dict]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def json_record(record: dict) -> bytes:
+    """A record's JSON as stored in snapshots and served by the API (compact)."""
+    return json.dumps(record, separators=(",", ":")).encode()
+
+
+def json_array(items: list[bytes]) -> bytes:
+    """A JSON array from already-serialized items."""
+    return b"[" + b",".join(items) + b"]"
+
+
+def fit_prior(records, rating: Callable, count: Callable) -> BayesianPrior:
+    """The ranking prior: RANK_PRIOR_MEAN if set (sharded catalogs), else fitted to `records`."""
+    if RANK_PRIOR_MEAN:
+        return BayesianPrior(float(RANK_PRIOR_MEAN), RANK_PRIOR_REVIEWS)
+    return BayesianPrior.fit(records, rating, count, RANK_PRIOR_REVIEWS)
+
+
+def compile_sitters(sitters: list[dict], meta: Optional[dict] = None) -> bytes:
+    """Snapshot bytes for `sitters`, with a precomputed ranking score and records stored best first."""
+    prior = fit_prior(sitters, SITTER_COLUMNS["rating"], SITTER_COLUMNS["reviewCount"])
+    columns = {**SITTER_COLUMNS, "score": lambda s: prior.smooth(s["rating"], s["reviewCount"])}
+    return build_snapshot(sitters, columns, SITTER_FACETS, meta, order_by="score")
+
+
+def open_snapshot(
+    data_path: Path = DATA_PATH,
+    snapshot_path: Path = SNAPSHOT_PATH,
+    autobuild: bool = SNAPSHOT_AUTOBUILD,
+) -> Snapshot:
+    """Map the compiled snapshot if it is current, otherwise build one from the JSON source."""
+    if autobuild and not is_current(snapshot_path, data_path):
+        try:
+            ensure_snapshot(
+                snapshot_path,
+                data_path,
+                lambda: compile_sitters(_read_json(data_path), meta={"source": data_path.name}),
+            )
+        except OSError as e:
+            logger.warning(f"Could not compile {snapshot_path}, each worker will parse JSON: {e}")
+    if is_current(snapshot_path, data_path):
+        try:
+            return Snapshot.open(snapshot_path)
+        except SnapshotError as e:
+            logger.warning(f"Ignoring unusable snapshot: {e}")
+    elif snapshot_path.exists():
+        logger.warning(f"{snapshot_path} is stale (older than {data_path} or an old format); falling back to JSON")
+    return Snapshot(compile_sitters(_read_json(data_path)))
+
+
+class PendingSitter:
+    """A sitter written since the snapshot was compiled, with its index entries precomputed."""
+
+    __slots__ = ("record", "json", "score", "terms", "rate", "rating", "certifications")
+
+    def __init__(self, record: dict, prior: BayesianPrior):
+        self.record = record
+        # Serialized once, like snapshot rows, so responses are assembled from bytes
+        self.json = json_record(record)
+        self.score = prior.smooth(record["rating"], record["reviewCount"])
+        self.terms = {facet: frozenset(terms(record)) for facet, terms in SITTER_FACETS.items()}
+        self.rate = SITTER_COLUMNS["hourlyRate"](record)
+        self.rating = SITTER_COLUMNS["rating"](record)
+        self.certifications = SITTER_COLUMNS["certifications"](record)
+
+    def matches(
+        self,
+        location: Optional[str] = None,
+        pet_type: Optional[str] = None,
+        service: Optional[str] = None,
+        day_needed: Optional[str] = None,
+        max_rate: Optional[float] = None,
+        specialization: Optional[str] = None,
+    ) -> bool:
+        """Same filter semantics as the snapshot's posting lists (location is a substring match)."""
+        if location and not any(location.lower() in term for term in self.terms["location"]):
+            return False
+        for facet, term in (
+            ("typeOfPets", pet_type and pet_type.lower()),
+            ("services", service and service.lower()),
+            ("daysAvailable", day_needed),
+            ("specializations", specialization and specialization.lower()),
+        ):
+            if term and term not in self.terms[facet]:
+                return False
+        return not max_rate or self.rate <= max_rate
+
+
+class CatalogView:
+    """One immutable version of the catalog: a compiled snapshot plus the writes logged since.
+
+    Applying writes never modifies a view. It returns a new one that shares the
+    snapshot and its indexes and copies only the small pending set, and the
+    catalog swaps it in with a single assignment. A search reads
+    `catalog.view` once and sees one consistent version throughout, without
+    taking a lock.
+
+    Positions below snapshot.count are snapshot rows; position count + j is
+    the j-th pending sitter in rank order.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.facets = FacetIndex(snapshot)
+        self.scores = snapshot.column("score")
+        self.positions = {int(v): i for i, v in enumerate(snapshot.column("id"))}
+        # Id high-water mark: deleted sitters' ids count too, so they are never handed out again
+        self.max_id = max(max(self.positions, default=0), snapshot.meta.get("maxId", 0))
+        ratings, reviews = snapshot.column("rating"), snapshot.column("reviewCount")
+        # Same prior the snapshot's scores were compiled with, so pending sitters rank consistently
+        self.prior = fit_prior(range(snapshot.count), ratings.__getitem__, reviews.__getitem__)
+        self.vocabulary = Vocabulary({facet: snapshot.terms(facet) for facet in SITTER_FACETS})
+        # Snapshot rows deleted or replaced since compilation, and a facet mask of the others
+        self.hidden: frozenset[int] = frozenset()
+        self.live: Optional[int] = None
+        # Sitters created or updated since compilation, by id and in rank order
+        self.pending: dict[int, PendingSitter] = {}
+        self.ranked: list[PendingSitter] = []
+        self.version = 0
+        # Identifies the snapshot in response ETags (see http_cache.py); hashed here, off the event loop
+        self.checksum = snapshot.checksum
+
+    @property
+    def count(self) -> int:
+        return self.snapshot.count - len(self.hidden) + len(self.pending)
+
+    @property
+    def tag(self) -> str:
+        """This version's identity for HTTP caching, the same in every worker that has applied the same log."""
+        return f"{self.checksum:08x}.{self.version}"
+
+    def apply(self, entries: list[dict]) -> "CatalogView":
+        """A new view with write-ahead log entries applied (this one is left untouched)."""
+        if not entries:
+            return self
+        hidden = set(self.hidden)
+        live = self.facets.all if self.live is None else self.live
+        pending = dict(self.pending)
+        for entry in entries:
+            if entry["op"] == "header":
+                continue
+            row = self.positions.get(entry["id"])
+            if row is not None and row not in hidden:
+                hidden.add(row)
+                live &= ~(1 << row)
+            if entry["op"] == "put":
+                pending[entry["id"]] = PendingSitter(entry["sitter"], self.prior)
+            else:
+                pending.pop(entry["id"], None)
+
+        view = copy.copy(self)
+        view.hidden = frozenset(hidden)
+        view.live = live
+        view.pending = pending
+        view.max_id = max(self.max_id, high_water(entries))
+        view.ranked = sorted(pending.values(), key=lambda sitter: -sitter.score)
+        # Pending sitters may bring new cities or services; the vocabulary only grows until compaction
+        view.vocabulary = self.vocabulary.extended(
+            {facet: {term for sitter in view.ranked for term in sitter.terms[facet]} for facet in SITTER_FACETS}
+        )
+        view.version = self.version + len(entries)
+        return view
+
+    def next_id(self) -> int:
+        """The next free id owned by this shard (id % SHARD_COUNT == SHARD_INDEX)."""
+        after = self.max_id + 1
+        return after + (SHARD_INDEX - after) % SHARD_COUNT
+
+    def locations(self) -> list[str]:
+        """Location terms this catalog serves (may include some whose sitters were all deleted)."""
+        terms = set(self.snapshot.terms("location"))
+        terms.update(term for sitter in self.ranked for term in sitter.terms["location"])
+        return sorted(terms)
+
+    def get(self, sitter_id: int) -> Optional[dict]:
+        if sitter_id in self.pending:
+            return self.pending[sitter_id].record
+        row = self.positions.get(sitter_id)
+        if row is None or row in self.hidden:
+            return None
+        return self.snapshot.record(row)
+
+    def score(self, position: int) -> float:
+        count = self.snapshot.count
+        return self.scores[position] if position < count else self.ranked[position - count].score
+
+    def record(self, position: int) -> dict:
+        count = self.snapshot.count
+        return self.snapshot.record(position) if position < count else self.ranked[position - count].record
+
+    def record_json(self, position: int) -> bytes:
+        """The record's serialized JSON, without decoding it."""
+        count = self.snapshot.count
+        return self.snapshot.record_bytes(position) if position < count else self.ranked[position - count].json
+
+    def get_json(self, sitter_id: int) -> Optional[bytes]:
+        if sitter_id in self.pending:
+            return self.pending[sitter_id].json
+        row = self.positions.get(sitter_id)
+        if row is None or row in self.hidden:
+            return None
+        return self.snapshot.record_bytes(row)
+
+    def records(self) -> list[dict]:
+        """All sitters in rank order, decoded (use for small catalogs/diagnostics only)."""
+        return [self.record(i) for i in self.candidates()]
+
+    def candidates(
+        self,
+        location: Optional[str] = None,
+        pet_type: Optional[str] = None,
+        service: Optional[str] = None,
+        day_needed: Optional[str] = None,
+        max_rate: Optional[float] = None,
+        specialization: Optional[str] = None,
+    ) -> Iterator[int]:
+        """Positions of matching sitters, lazily and best first."""
+        snapshot = self.snapshot
+        postings = []
+
+        # Location is a substring match, so union the postings of every matching term
+        if location:
+            needle = location.lower()
+            matched = set()
+            for term in snapshot.terms("location"):
+                if needle in term:
+                    matched.update(snapshot.postings("location", term))
+            postings.append(sorted(matched))
+
+        if pet_type:
+            postings.append(snapshot.postings("typeOfPets", pet_type.lower()))
+        if service:
+            postings.append(snapshot.postings("services", service.lower()))
+        if day_needed:
+            postings.append(snapshot.postings("daysAvailable", day_needed))
+        if specialization:
+            postings.append(snapshot.postings("specializations", specialization.lower()))
+
+        # Positions are in rank order, so candidates stream out best first
+        rows = intersect(postings) if postings else iter(range(snapshot.count))
+        if max_rate:
+            rates = snapshot.column("hourlyRate")
+            rows = (i for i in rows if rates[i] <= max_rate)
+        if self.hidden:
+            rows = (i for i in rows if i not in self.hidden)
+        if not self.ranked:
+            return rows
+
+        criteria = dict(
+            location=location,
+            pet_type=pet_type,
+            service=service,
+            day_needed=day_needed,
+            max_rate=max_rate,
+            specialization=specialization,
+        )
+        extra = [snapshot.count + j for j, sitter in enumerate(self.ranked) if sitter.matches(**criteria)]
+        # Both streams are best first, so merging them keeps the rank order
+        return heapq.merge(rows, extra, key=lambda i: -self.score(i))
+
+    def interpret(self, criteria: dict) -> dict:
+        """Criteria with free-form values ("NYC", "dog walking") resolved to catalog terms."""
+        resolved = dict(criteria)
+        for name, facet in FILTER_FACETS.items():
+            value = resolved.get(name)
+            if value:
+                resolved[name] = self.vocabulary.resolve(facet, value)
+                if resolved[name] != value:
+                    logger.debug(f"Interpreted {name}={value!r} as {resolved[name]!r}")
+        return resolved
+
+    def search(self, scored: bool = False, raw: bool = False, **criteria) -> list:
+        """Top matches best first; with `scored`, as (score including boosts, record) pairs.
+
+        With `raw`, records are their serialized JSON bytes (see json_array), so
+        responses are assembled without decoding and re-encoding them.
+        """
+        decode = self.record_json if raw else self.record
+        results = [(score, decode(i)) for score, i in self._search(**self.interpret(criteria))]
+        return results if scored else [record for _, record in results]
+
+    def _search(
+        self,
+        preferred_specialization: Optional[str] = None,
+        prefer_certified: bool = False,
+        limit: int = 5,
+        **filters,
+    ) -> list[tuple[float, int]]:
+        boost, max_boost = self._boost(preferred_specialization, prefer_certified)
+        top = top_k(self.candidates(**filters), limit, self.score, boost, max_boost)
+        return [(self.score(i) + (boost(i) if boost else 0.0), i) for i in top]
+
+    def _boost(self, preferred_specialization: Optional[str], prefer_certified: bool):
+        """Query-time boost function and its upper bound (None, 0 when no boost applies)."""
+        count = self.snapshot.count
+        boosted = []
+        max_boost = 0.0
+        if preferred_specialization:
+            term = preferred_specialization.lower()
+            has_specialization = self.snapshot.postings("specializations", term)
+
+            def specialization_boost(i: int) -> float:
+                if i < count:
+                    matched = contains(has_specialization, i)
+                else:
+                    matched = term in self.ranked[i - count].terms["specializations"]
+                return SPECIALIZATION_BOOST if matched else 0.0
+
+            boosted.append(specialization_boost)
+            max_boost += SPECIALIZATION_BOOST
+        if prefer_certified:
+            certifications = self.snapshot.column("certifications")
+
+            def certification_boost(i: int) -> float:
+                held = certifications[i] if i < count else self.ranked[i - count].certifications
+                return CERTIFICATION_BOOST * min(held, MAX_BOOSTED_CERTIFICATIONS)
+
+            boosted.append(certification_boost)
+            max_boost += CERTIFICATION_BOOST * MAX_BOOSTED_CERTIFICATIONS
+        if not boosted:
+            return None, 0.0
+        return (lambda i: sum(b(i) for b in boosted)), max_boost
+
+    def facet_summary(self, **filters) -> dict:
+        return self.facets.summary(self.live, self.ranked, **self.interpret(filters))
+
+    def describe(self) -> str:
+        return self.facets.describe(self.live, self.ranked)
+
+
+class SitterCatalog:
+    """In-memory view of the pet sitter dataset, with writes logged ahead of being applied."""
+
+    def __init__(self, path: Path, snapshot_path: Path, wal_path: Path):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.wal = WriteAheadLog(wal_path)
+        # Replaced wholesale on every change, never modified in place
+        self.view: Optional[CatalogView] = None
+        self._signature: Optional[tuple] = None
+        self._checked_at = 0.0
+        # Serializes reloads, log tailing and writes; searches never take it
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.view is not None
+
+    @property
+    def sitters(self) -> list[dict]:
+        """All sitters, decoded (use for small catalogs/diagnostics only)."""
+        return self.view.records() if self.view else []
+
+    def _file_signature(self) -> tuple:
+        return (_mtime(self.path), _mtime(self.snapshot_path))
+
+    def _read(self) -> tuple[CatalogView, tuple]:
+        """Blocking map/parse, index precomputation and log replay; always called from a worker thread."""
+        # Shared lock: a compaction can't move logged writes into the JSON between the two reads
+        with self.wal.locked(exclusive=False):
+            signature = self._file_signature()
+            snapshot = open_snapshot(self.path, self.snapshot_path)
+            self.wal.rewind()
+            entries = self.wal.pending() + self.wal.tail()
+        return CatalogView(snapshot).apply(entries), signature
+
+    async def reload(self) -> None:
+        """Re-read the data and replay the log off the event loop, then swap the new view in."""
+        async with self._lock:
+            view, signature = await asyncio.to_thread(self._read)
+            self.view = view
+            self._signature = signature
+            self._checked_at = time.monotonic()
+            logger.info(f"Loaded {view.count} pet sitters from {view.snapshot.source} ({len(view.pending)} pending writes)")
+
+    async def ensure_loaded(self) -> None:
+        """Load on first use, then pick up file changes and logged writes at most every RELOAD_INTERVAL seconds."""
+        if not self.loaded:
+            await self.reload()
+            return
+        if RELOAD_INTERVAL <= 0 or time.monotonic() - self._checked_at < RELOAD_INTERVAL:
+            return
+        # A write in progress is catching up on the log anyway; don't make readers wait for it
+        if self._lock.locked():
+            return
+        self._checked_at = time.monotonic()
+        signature = await asyncio.to_thread(self._file_signature)
+        if signature != self._signature:
+            await self.reload()
+        else:
+            await self.refresh()
+
+    async def refresh(self) -> None:
+        """Apply writes appended to the log since the last refresh (by any worker)."""
+        async with self._lock:
+            self.view = self.view.apply(await asyncio.to_thread(self.wal.tail))
+
+    def get(self, sitter_id: int) -> Optional[dict]:
+        return self.view.get(sitter_id)
+
+    def get_json(self, sitter_id: int) -> Optional[bytes]:
+        return self.view.get_json(sitter_id)
+
+    async def search(self, view: Optional[CatalogView] = None, **criteria) -> list:
+        """Filter and rank sitters (see CatalogView.search); large catalogs are scanned in a worker thread.
+
+        Pass the `view` a response was tagged with to search that same version.
+        """
+        view = view or self.view
+        if view.count > OFFLOAD_THRESHOLD:
+            return await asyncio.to_thread(view.search, **criteria)
+        return view.search(**criteria)
+
+    async def facet_summary(self, view: Optional[CatalogView] = None, **filters) -> dict:
+        """Counts and rate/rating distributions for a filter combination, from precomputed bitmaps."""
+        view = view or self.view
+        if view.count > OFFLOAD_THRESHOLD:
+            return await asyncio.to_thread(view.facet_summary, **filters)
+        return view.facet_summary(**filters)
+
+    def describe(self) -> str:
+        """Plain-text overview of what the catalog covers, for agent instructions."""
+        return self.view.describe()
+
+    def _write(self, prepare: Callable[[CatalogView], Optional[dict]]) -> tuple[CatalogView, Optional[dict]]:
+        """Blocking: catch up on the log, then log and apply one write; called from a worker thread."""
+        with self.wal.locked():
+            view = self.view.apply(self.wal.tail())
+            entry = prepare(view)
+            if entry is None:
+                return view, None
+            self.wal.append(entry, view.max_id)
+            # Tailing consumes the entry just written, so it is applied exactly once
+            return view.apply(self.wal.tail()), entry
+
+    async def _commit(self, prepare: Callable[[CatalogView], Optional[dict]]) -> Optional[dict]:
+        await self.ensure_loaded()
+        async with self._lock:
+            self.view, entry = await asyncio.to_thread(self._write, prepare)
+        return entry
+
+    async def create(self, sitter: dict) -> dict:
+        """Add a sitter under the next free id; returns the stored record."""
+        fields = {k: v for k, v in sitter.items() if k != "id"}
+        entry = await self._commit(lambda view: put_entry({"id": view.next_id(), **fields}))
+        return entry["sitter"]
+
+    async def update(self, sitter_id: int, fields: dict, replace: bool = False) -> Optional[dict]:
+        """Change some of a sitter's fields, or replace the whole record; None if there is no such sitter."""
+
+        def prepare(view: CatalogView) -> Optional[dict]:
+            current = view.get(sitter_id)
+            if current is None:
+                return None
+            return put_entry({**(fields if replace else {**current, **fields}), "id": sitter_id})
+
+        entry = await self._commit(prepare)
+        return entry["sitter"] if entry else None
+
+    async def delete(self, sitter_id: int) -> bool:
+        """Remove a sitter; False if there is no such sitter."""
+        entry = await self._commit(lambda view: delete_entry(sitter_id) if view.get(sitter_id) is not None else None)
+        return entry is not None
+
+    def _rebuild_snapshot(self, sitters: list[dict], max_id: int) -> None:
+        """Recompile the snapshot after compaction, if one is in use."""
+        if self.snapshot_path.exists() or SNAPSHOT_AUTOBUILD:
+            meta = {"source": self.path.name, "maxId": max_id}
+            write_snapshot(self.snapshot_path, compile_sitters(sitters, meta=meta))
+
+    async def compact(self) -> int:
+        """Fold the write-ahead log into the JSON dataset (and snapshot), then reload."""
+        applied = await asyncio.to_thread(compact, self.path, self.wal, self._rebuild_snapshot)
+        if applied:
+            logger.info(f"Compacted {applied} sitter writes into {self.path}")
+            await self.reload()
+        return applied
+
+    async def run_snapshotting(self, interval: float = SNAPSHOT_INTERVAL) -> None:
+        """Background task: compact the write-ahead log every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.error(f"Sitter log compaction failed: {e}")
+
+
+catalog = SitterCatalog(DATA_PATH, SNAPSHOT_PATH, WAL_PATH)
+
+
+async def get_catalog() -> SitterCatalog:
+    """Return the shared catalog, loading or refreshing it if needed."""
+    await catalog.ensure_loaded()
+    return catalog
+
+
+def split_by_location(sitters: list[dict], shards: int) -> list[list[dict]]:
+    """Partition sitters into `shards` groups of whole locations, balanced by sitter count."""
+    by_location: dict[str, list[dict]] = {}
+    for sitter in sitters:
+        by_location.setdefault(sitter["location"].lower(), []).append(sitter)
+    groups: list[list[dict]] = [[] for _ in range(shards)]
+    # Largest locations first, each to the currently smallest shard
+    for location in sorted(by_location, key=lambda loc: (-len(by_location[loc]), loc)):
+        min(groups, key=len).extend(by_location[location])
+    return groups
+
+
+def main():
+    """CLI: compile pet-sitter.json into a memory-mappable snapshot, compact the log, or shard by location."""
+    parser = argparse.ArgumentParser(description="Pet sitter catalog tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build-snapshot", help="Compile the JSON dataset into a snapshot")
+    build.add_argument("--source", type=Path, default=DATA_PATH, help="JSON dataset to compile")
+    build.add_argument("--output", type=Path, default=SNAPSHOT_PATH, help="Snapshot file to write")
+    subcommands.add_parser("compact", help="Fold the write-ahead log into the JSON dataset and snapshot")
+    split = subcommands.add_parser("split", help="Split the JSON dataset into location shards")
+    split.add_argument("--shards", type=int, required=True, help="Number of shards")
+    split.add_argument("--source", type=Path, default=DATA_PATH, help="JSON dataset to split")
+    split.add_argument("--output-dir", type=Path, default=DATA_PATH.parent, help="Where to write the shard datasets")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        sitters = _read_json(args.source)
+        # Every shard smooths towards the whole dataset's mean, so their scores compare
+        prior = BayesianPrior.fit(sitters, SITTER_COLUMNS["rating"], SITTER_COLUMNS["reviewCount"], RANK_PRIOR_REVIEWS)
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+        for index, group in enumerate(split_by_location(sitters, args.shards)):
+            path = args.output_dir / f"{args.source.stem}.shard-{index}.json"
+            with open(path, "w") as f:
+                json.dump(group, f, indent=2)
+            locations = sorted({sitter["location"] for sitter in group})
+            print(f"Wrote {len(group)} pet sitters ({', '.join(locations)}) to {path}")
+            print(
+                f"  SITTER_DATA_PATH={path} SITTER_SHARD_INDEX={index} SITTER_SHARD_COUNT={args.shards}"
+                f" SITTER_RANK_PRIOR_MEAN={prior.mean:.6f}"
+            )
+        return
+
+    if args.command == "compact":
+        applied = asyncio.run(catalog.compact())
+        print(f"Applied {applied} logged writes from {WAL_PATH} to {DATA_PATH}")
+        return
+
+    sitters = _read_json(args.source)
+    data = compile_sitters(sitters, meta={"source": args.source.name})
+    write_snapshot(args.output, data)
+    print(f"Wrote {len(sitters)} pet sitters ({len(data)} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
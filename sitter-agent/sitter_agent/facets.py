@@ -0,0 +1,193 @@
+"""
+Facet aggregates
+
+Precomputed bitmaps over a catalog snapshot for counting, not listing: bit i
+of a bitmap is set when the record at position i matches. Built once per
+snapshot (in the loading thread), they answer "how many sitters per city /
+service / rating under $30" for any filter combination with a few bitwise
+ANDs and popcounts, without decoding or scanning records.
+
+- one bitmap per facet term (from the snapshot's posting lists)
+- cumulative bitmaps per distinct hourly rate ("rate <= v"), so max-rate
+  filters, min/max and histogram buckets are differences of popcounts
+- one bitmap per rating value (ratings are stored to one decimal)
+
+Sitters written through the API since the snapshot was compiled are
+accounted for without rebuilding: the catalog passes a `live` bitmap with
+deleted and superseded rows cleared, plus the pending sitters themselves
+(few, until the next compaction), whose precomputed terms are added on top.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Optional, Sequence
+
+from sitter_agent.snapshot import Snapshot
+
+# Facets reported by counts(); daysAvailable terms keep their case, the rest are lowercased
+COUNTED_FACETS = ("location", "typeOfPets", "services", "daysAvailable", "specializations")
+
+
+def _bitmap(positions: Sequence[int], size: int) -> int:
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+
+class FacetIndex:
+    """Bitmap aggregates for one snapshot."""
+
+    def __init__(self, snapshot: Snapshot, rate_bucket: float = 5.0):
+        self.count = snapshot.count
+        self.all = (1 << snapshot.count) - 1
+        self.rate_bucket = rate_bucket
+
+        self.terms: dict[str, dict[str, int]] = {}
+        self.labels: dict[str, dict[str, str]] = {}
+        for facet in COUNTED_FACETS:
+            bitmaps = {}
+            labels = {}
+            for term in snapshot.terms(facet):
+                postings = snapshot.postings(facet, term)
+                bitmaps[term] = _bitmap(postings, self.count)
+                labels[term] = term
+            self.terms[facet] = bitmaps
+            self.labels[facet] = labels
+        # Locations are indexed lowercased; label them as written in the data
+        for term, bitmap in self.terms["location"].items():
+            first = (bitmap & -bitmap).bit_length() - 1
+            self.labels["location"][term] = snapshot.record(first)["location"]
+
+        rates = snapshot.column("hourlyRate")
+        by_rate: dict[float, list[int]] = {}
+        for position, rate in enumerate(rates):
+            by_rate.setdefault(rate, []).append(position)
+        self.rate_values = sorted(by_rate)
+        self.rate_at_most: list[int] = []
+        running = 0
+        for rate in self.rate_values:
+            running |= _bitmap(by_rate[rate], self.count)
+            self.rate_at_most.append(running)
+
+        ratings = snapshot.column("rating")
+        by_rating: dict[float, list[int]] = {}
+        for position, rating in enumerate(ratings):
+            by_rating.setdefault(round(rating, 1), []).append(position)
+        self.ratings = {value: _bitmap(by_rating[value], self.count) for value in sorted(by_rating, reverse=True)}
+
+    def _rate_at_most(self, max_rate: float) -> int:
+        i = bisect_right(self.rate_values, max_rate)
+        return self.rate_at_most[i - 1] if i else 0
+
+    def select(
+        self,
+        location: Optional[str] = None,
+        pet_type: Optional[str] = None,
+        service: Optional[str] = None,
+        day_needed: Optional[str] = None,
+        max_rate: Optional[float] = None,
+        specialization: Optional[str] = None,
+    ) -> int:
+        """Bitmap of records matching the filters (same semantics as SitterCatalog.search)."""
+        selected = self.all
+        if location:
+            needle = location.lower()
+            matched = 0
+            for term, bitmap in self.terms["location"].items():
+                if needle in term:
+                    matched |= bitmap
+            selected &= matched
+        for facet, term in (
+            ("typeOfPets", pet_type and pet_type.lower()),
+            ("services", service and service.lower()),
+            ("daysAvailable", day_needed),
+            ("specializations", specialization and specialization.lower()),
+        ):
+            if term:
+                selected &= self.terms[facet].get(term, 0)
+        if max_rate:
+            selected &= self._rate_at_most(max_rate)
+        return selected
+
+    def counts(self, selected: int, extra: Sequence = ()) -> dict[str, dict[str, int]]:
+        """Matching records per term of each facet, most common first (zero counts omitted)."""
+        result = {}
+        for facet, bitmaps in self.terms.items():
+            labels = self.labels[facet]
+            counts = Counter({labels[term]: (selected & bitmap).bit_count() for term, bitmap in bitmaps.items()})
+            for sitter in extra:
+                for term in sitter.terms[facet]:
+                    label = sitter.record["location"] if facet == "location" else term
+                    counts[labels.get(term, label)] += 1
+            result[facet] = dict(sorted(((k, v) for k, v in counts.items() if v), key=lambda kv: (-kv[1], kv[0])))
+        return result
+
+    def rate_stats(self, selected: int, extra_rates: Sequence[float] = ()) -> dict:
+        """Min, max and fixed-width histogram of hourly rates among the selected records."""
+        total = selected.bit_count()
+        if not total and not extra_rates:
+            return {"min": None, "max": None, "histogram": []}
+        cumulative = [(selected & bitmap).bit_count() for bitmap in self.rate_at_most]
+        lows, highs = list(extra_rates), list(extra_rates)
+        if total:
+            lows.append(self.rate_values[bisect_right(cumulative, 0)])
+            highs.append(self.rate_values[bisect_left(cumulative, total)])
+        lowest, highest = min(lows), max(highs)
+
+        def at_most(rate: float) -> int:
+            i = bisect_right(self.rate_values, rate)
+            return cumulative[i - 1] if i else 0
+
+        histogram = []
+        start = math.floor(lowest / self.rate_bucket) * self.rate_bucket
+        while start <= highest:
+            end = start + self.rate_bucket
+            # Buckets are [start, end); at_most is inclusive, so step back just below each edge
+            count = at_most(math.nextafter(end, -math.inf)) - at_most(math.nextafter(start, -math.inf))
+            count += sum(start <= rate < end for rate in extra_rates)
+            if count:
+                histogram.append({"from": start, "to": end, "count": count})
+            start = end
+        return {"min": lowest, "max": highest, "histogram": histogram}
+
+    def rating_distribution(self, selected: int, extra_ratings: Sequence[float] = ()) -> dict[str, int]:
+        """Matching records per rating value, highest first."""
+        counts = Counter({value: (selected & bitmap).bit_count() for value, bitmap in self.ratings.items()})
+        counts.update(round(rating, 1) for rating in extra_ratings)
+        return {f"{value:.1f}": counts[value] for value in sorted(counts, reverse=True) if counts[value]}
+
+    def describe(self, live: Optional[int] = None, extra: Sequence = ()) -> str:
+        """Plain-text overview of what the catalog covers, for agent instructions."""
+        summary = self.summary(live, extra)
+        counts = summary["facets"]
+        cities = list(dict.fromkeys(label.split(",")[0] for label in counts["location"]))
+        rates = summary["hourlyRate"]
+        lines = [
+            f"Available pet sitter data covers {summary['total']} sitters in: {', '.join(cities)}.",
+            f"Pet types: {', '.join(counts['typeOfPets'])}.",
+            f"Services: {', '.join(counts['services'])}.",
+            f"Specializations: {', '.join(counts['specializations'])}.",
+        ]
+        if rates["min"] is not None:
+            lines.append(f"Hourly rates range from ${rates['min']:g} to ${rates['max']:g}.")
+        return "\n".join(lines)
+
+    def summary(self, live: Optional[int] = None, extra: Sequence = (), **filters) -> dict:
+        """Counts and distributions for one filter combination (the /api/facets payload).
+
+        `live` masks out snapshot rows that were deleted or replaced since it
+        was compiled; `extra` are the pending sitters that replace them (see
+        catalog.PendingSitter), filtered here with the same semantics.
+        """
+        selected = self.select(**filters)
+        if live is not None:
+            selected &= live
+        extra = [sitter for sitter in extra if sitter.matches(**filters)]
+        return {
+            "total": selected.bit_count() + len(extra),
+            "facets": self.counts(selected, extra),
+            "hourlyRate": self.rate_stats(selected, [sitter.rate for sitter in extra]),
+            "rating": self.rating_distribution(selected, [sitter.rating for sitter in extra]),
+        }
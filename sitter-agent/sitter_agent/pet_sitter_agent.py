@@ -0,0 +1,367 @@
+"""
+Pet Sitter Recommendation Agent
+
+This agent provides personalized pet sitter recommendations based on user requests.
+It analyzes the pet-sitter.json data and makes intelligent recommendations without
+asking follow-up questions.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from typing import TYPE_CHECKING, Annotated, Optional
+
+from dotenv import load_dotenv
+from opentelemetry import metrics, trace
+
+from agent_common.model_router import ModelRouter
+from agent_common.retry import RetryPolicy, estimate_tokens
+from agent_common.startup import lazy_import, run_warm_up, warm_up_imports
+from sitter_agent.catalog import get_catalog, json_array, json_record
+from sitter_agent.retrieval import parse_query, retrieval_message, retrieve
+
+if TYPE_CHECKING:
+    from azure.ai.projects.aio import AIProjectClient
+
+# The agent stack (agent_framework, Azure AI SDKs) is imported on first use so the
+# pure search endpoints and the health probe don't pay for it at cold start
+AGENT_MODULES = ("agent_framework", "agent_framework_azure_ai", "azure.ai.projects.aio", "azure.identity.aio")
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Retries throttled/transient model calls (AGENT_RETRY_*, AZURE_MODEL_RPM_LIMIT, AZURE_MODEL_TPM_LIMIT)
+retry_policy = RetryPolicy.from_env("sitter-agent")
+# Deployment per task (AZURE_MODEL_DEPLOYMENT_NAME, AZURE_FAST_MODEL_DEPLOYMENT_NAME, MODEL_ROUTING_POLICY)
+model_router = ModelRouter.from_env()
+
+# "tools": the model calls search_pet_sitters itself (two or more model turns);
+# "retrieval": search first and answer in one model call (see retrieval.py);
+# "ab": choose per request, SITTER_AGENT_RETRIEVAL_PERCENT of them in retrieval mode
+AGENT_MODE = os.getenv("SITTER_AGENT_MODE", "tools").lower()
+RETRIEVAL_PERCENT = float(os.getenv("SITTER_AGENT_RETRIEVAL_PERCENT", "50"))
+# Candidates given to the model in retrieval mode
+RETRIEVAL_CANDIDATES = int(os.getenv("SITTER_AGENT_RETRIEVAL_CANDIDATES", "5"))
+
+# Per-run measurements tagged with the mode, for comparing the two under "ab"
+meter = metrics.get_meter(__name__)
+_run_duration = meter.create_histogram(
+    "sitter_agent.run.duration",
+    unit="s",
+    description="Pet sitter agent run time, by mode and outcome",
+)
+_run_turns = meter.create_histogram(
+    "sitter_agent.run.model_turns",
+    description="Model responses per pet sitter agent run, by mode",
+)
+_run_tokens = meter.create_histogram(
+    "sitter_agent.run.tokens",
+    unit="{token}",
+    description="Tokens used per pet sitter agent run, by mode",
+)
+
+# Azure AI Foundry project endpoint from environment variable
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+PROJECT_ENDPOINT = AZURE_OPENAI_ENDPOINT or "https://opinion-stacks-pets-resource.services.ai.azure.com/api/projects/opinion-stacks-pets"
+
+# Token scope of the Foundry project API
+TOKEN_SCOPE = "https://ai.azure.com/.default"
+
+# Azure clients are created lazily in the worker process that uses them and reused
+# across requests, so AAD tokens and HTTP connections are cached per worker
+_credential = None
+_project_client = None
+
+
+def get_project_client() -> "AIProjectClient":
+    """Return this worker's shared AIProjectClient, creating it on first use."""
+    global _credential, _project_client
+    if _project_client is None:
+        _credential = lazy_import("azure.identity.aio").DefaultAzureCredential()
+        # SDK retries off: retry_policy is the only retry layer
+        _project_client = lazy_import("azure.ai.projects.aio").AIProjectClient(
+            endpoint=PROJECT_ENDPOINT, credential=_credential, retry_total=0
+        )
+    return _project_client
+
+
+async def _acquire_token():
+    """Fetch the first AAD token now, rather than on the first user's request."""
+    get_project_client()
+    await _credential.get_token(TOKEN_SCOPE)
+
+
+async def _connect_foundry():
+    """Open the pooled connection to the Foundry project with a cheap call."""
+    async for _ in get_project_client().agents.list_agents(limit=1):
+        break
+
+
+async def warm_up():
+    """
+    Warm this worker up before it reports ready: the sitter catalog and its
+    indexes, the agent stack and, when AZURE_OPENAI_ENDPOINT is set and the
+    model isn't the fake one, an AAD token and the Foundry connection. The
+    recommendation agents themselves are created per run by AzureAIAgentClient.
+    """
+    steps = {
+        "catalog": get_catalog,
+        "agent_stack": lambda: warm_up_imports(*AGENT_MODULES),
+    }
+    if AZURE_OPENAI_ENDPOINT and model_router.provider != "fake":
+        steps.update(aad_token=_acquire_token, foundry=_connect_foundry)
+    await run_warm_up("sitter", steps)
+
+
+async def close_azure_clients():
+    """Close this worker's Azure clients (call on shutdown)."""
+    global _credential, _project_client
+    if _project_client is not None:
+        await _project_client.close()
+        await _credential.close()
+        _credential = _project_client = None
+
+
+async def search_pet_sitters(
+    location: Annotated[str, "The location to search for pet sitters (e.g., 'New York', 'NYC', 'Seattle', 'SF')"] = None,
+    pet_type: Annotated[str, "Type of pet (e.g., 'dogs', 'cats', 'birds', 'reptiles', 'small_mammals')"] = None,
+    service: Annotated[str, "Required service (e.g., 'pet_sitting', 'dog walking', 'overnight_care', 'exotic_pet_care')"] = None,
+    day_needed: Annotated[str, "Day needed (e.g., 'Monday', 'Saturday')"] = None,
+    max_rate: Annotated[float, "Maximum hourly rate budget"] = None,
+    specialization: Annotated[str, "Specific specialization needed (e.g., 'senior_pets', 'exotic_pets', 'medication_administration')"] = None,
+    preferred_specialization: Annotated[str, "Specialization to rank higher without requiring it"] = None,
+    prefer_certified: Annotated[bool, "Rank sitters with more certifications higher"] = False,
+) -> str:
+    """
+    Search and filter pet sitters based on various criteria.
+    Returns a JSON string of the top matches, best rated first (ratings are
+    weighted by review count).
+    """
+    catalog = await get_catalog()
+    filtered_sitters = await catalog.search(
+        raw=True,
+        location=location,
+        pet_type=pet_type,
+        service=service,
+        day_needed=day_needed,
+        max_rate=max_rate,
+        specialization=specialization,
+        preferred_specialization=preferred_specialization,
+        prefer_certified=prefer_certified,
+    )
+    
+    if not filtered_sitters:
+        return json.dumps({"message": "No pet sitters found matching the criteria."})
+    
+    # Top 5 matches, from the catalog's pre-serialized records
+    return json_array(filtered_sitters).decode()
+
+
+def _sitter_details(catalog, sitter_id: int) -> bytes:
+    """A sitter's stored JSON, or an error record if there is no such sitter."""
+    sitter = catalog.get_json(sitter_id)
+    return sitter or json_record({"id": sitter_id, "error": f"Pet sitter with ID {sitter_id} not found."})
+
+
+async def get_pet_sitter_details(
+    sitter_id: Annotated[int, "The ID of the pet sitter to get details for"],
+) -> str:
+    """Get detailed information about a specific pet sitter by ID."""
+    catalog = await get_catalog()
+    return _sitter_details(catalog, sitter_id).decode()
+
+
+async def compare_pet_sitters(
+    sitter_ids: Annotated[list[int], "IDs of the pet sitters to get details for"],
+) -> str:
+    """Get detailed information about several pet sitters by ID in one call, e.g. to compare the top matches."""
+    catalog = await get_catalog()
+    return json_array([_sitter_details(catalog, sitter_id) for sitter_id in sitter_ids]).decode()
+
+
+def choose_mode(mode: Optional[str] = None) -> str:
+    """The run mode for one request: SITTER_AGENT_MODE, with "ab" split by SITTER_AGENT_RETRIEVAL_PERCENT."""
+    mode = (mode or AGENT_MODE).lower()
+    if mode == "ab":
+        return "retrieval" if random.random() * 100 < RETRIEVAL_PERCENT else "tools"
+    if mode not in ("tools", "retrieval"):
+        logger.warning(f"Unknown SITTER_AGENT_MODE '{mode}', using tools")
+        return "tools"
+    return mode
+
+
+def _model_turns(result) -> int:
+    """Model responses in a run: one per round of tool calls plus the final answer."""
+    messages = getattr(result, "messages", None) or []
+    return sum(1 for m in messages if getattr(m.role, "value", m.role) == "assistant") or 1
+
+
+async def _run_agent(agent_name: str, instructions: str, message: str, tools: list):
+    """One ChatAgent run with retries and token accounting; returns the framework's run result."""
+    ChatAgent = lazy_import("agent_framework").ChatAgent
+    tool_execution = lazy_import("agent_common.tool_execution")
+
+    # The recommendation task's deployment (see agent_common.model_router); the AzureAIAgentClient
+    # will automatically create the agent if it doesn't exist when used with ChatAgent
+    agent_client = model_router.chat_client("recommend", agent_name, get_project_client)
+    async with ChatAgent(
+        chat_client=agent_client,
+        instructions=instructions,
+        tools=tools,
+        # Memoizes repeated tool calls within this run and times each call
+        middleware=[tool_execution.ToolRunMiddleware(agent_name)],
+    ) as agent:
+        return await model_router.run(
+            "recommend",
+            agent,
+            message,
+            retry_policy,
+            estimate_tokens(instructions + message),
+            **(tool_execution.RUN_OPTIONS if tools else {}),
+        )
+
+
+async def _run_with_tools(user_query: str):
+    """Tool-calling mode: the model decides when to search and may search more than once."""
+    catalog = await get_catalog()
+    
+    # System instructions for the agent; the catalog overview comes from the facet index
+    instructions = f"""You are a professional pet sitter recommendation assistant. Your role is to:
+
+1. Analyze the user's request carefully to understand their needs (location, pet type, services needed, schedule, budget, special requirements)
+2. Use the search_pet_sitters tool to find matching pet sitters based on the criteria
+3. Make intelligent recommendations based on the results, considering:
+   - Rating and reviews
+   - Years of experience
+   - Specializations that match the user's needs
+   - Availability and services offered
+   - Certifications and insurance status
+4. Provide a clear, concise recommendation with 2-3 top choices
+5. Include relevant details like rates, availability, and why they're a good match
+6. DO NOT ask follow-up questions - make the best recommendation based on the information provided
+
+{catalog.describe()}
+
+Always be helpful, professional, and focus on finding the best match for the pet owner's needs."""
+
+    return await _run_agent(
+        "PetSitterRecommendationAgent",
+        instructions,
+        user_query,
+        [search_pet_sitters, get_pet_sitter_details, compare_pet_sitters],
+    )
+
+
+async def _run_with_retrieval(user_query: str):
+    """Retrieval mode: search locally first, then answer in a single model call with no tools."""
+    catalog = await get_catalog()
+    criteria = parse_query(user_query, catalog.view)
+    sitters, used, relaxed = await retrieve(catalog, criteria, RETRIEVAL_CANDIDATES)
+    if relaxed:
+        logger.info(f"Retrieval relaxed {relaxed} for {criteria}")
+
+    instructions = f"""You are a professional pet sitter recommendation assistant. Each request comes with
+candidate pet sitters already retrieved from the catalog for it, best ranked first. Your role is to:
+
+1. Analyze the user's request carefully to understand their needs (location, pet type, services needed, schedule, budget, special requirements)
+2. Recommend from the candidates only, considering:
+   - Rating and reviews
+   - Years of experience
+   - Specializations that match the user's needs
+   - Availability and services offered
+   - Certifications and insurance status
+3. Provide a clear, concise recommendation with 2-3 top choices
+4. Include relevant details like rates, availability, and why they're a good match
+5. If filters were relaxed to find candidates, say which requirement could not be met; if there are
+   no candidates, say so and describe what the catalog does cover. Never invent sitters or details
+6. DO NOT ask follow-up questions - make the best recommendation based on the information provided
+
+{catalog.describe()}
+
+Always be helpful, professional, and focus on finding the best match for the pet owner's needs."""
+
+    return await _run_agent(
+        "PetSitterRetrievalAgent", instructions, retrieval_message(user_query, sitters, used, relaxed), []
+    )
+
+
+async def run_pet_sitter_agent(user_query: str, mode: Optional[str] = None) -> str:
+    """
+    Run the pet sitter recommendation agent with a user query.
+    
+    Args:
+        user_query: The user's request for pet sitter recommendations
+        mode: "tools" or "retrieval"; defaults to SITTER_AGENT_MODE
+        
+    Returns:
+        The agent's recommendation response
+    """
+    mode = choose_mode(mode)
+    trace.get_current_span().set_attribute("sitter_agent.mode", mode)
+    attributes = {"mode": mode, "outcome": "error"}
+    start = time.perf_counter()
+    try:
+        if mode == "retrieval":
+            result = await _run_with_retrieval(user_query)
+        else:
+            result = await _run_with_tools(user_query)
+        attributes["outcome"] = "ok"
+        _run_turns.record(_model_turns(result), attributes)
+        usage = getattr(result, "usage_details", None)
+        if getattr(usage, "total_token_count", None):
+            _run_tokens.record(usage.total_token_count, attributes)
+        return result.text
+    finally:
+        _run_duration.record(time.perf_counter() - start, attributes)
+
+
+async def main():
+    """Main entry point for the pet sitter recommendation agent."""
+    print("🐾 Pet Sitter Recommendation Agent 🐾")
+    print("=" * 50)
+    print()
+    
+    # Example queries
+    example_queries = [
+        "I need a dog walker in New York for weekdays, budget is $30/hour",
+        "Looking for someone to care for my senior cat in San Francisco on weekends",
+        "Need an exotic pet sitter in Seattle who can handle reptiles",
+        "I have a large, high-energy dog in Los Angeles that needs daily walks",
+    ]
+    
+    print("Example queries:")
+    for i, query in enumerate(example_queries, 1):
+        print(f"{i}. {query}")
+    print()
+    
+    # Interactive mode
+    while True:
+        print("Enter your pet sitter request (or 'quit' to exit):")
+        user_input = input("> ").strip()
+        
+        if user_input.lower() in ["quit", "exit", "q"]:
+            print("Thank you for using the Pet Sitter Recommendation Agent!")
+            break
+        
+        if not user_input:
+            continue
+        
+        print("\n🔍 Searching for the best pet sitters...\n")
+        
+        try:
+            response = await run_pet_sitter_agent(user_input)
+            print(f"🐾 Recommendation:\n{response}\n")
+        except Exception as e:
+            print(f"❌ Error: {str(e)}\n")
+        
+        print("-" * 50)
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Ranking
+
+Sitters are ranked by a Bayesian-smoothed rating: each sitter's rating is
+blended with the catalog-wide mean, weighted by how many reviews back it.
+So a 4.9 from 2 reviews no longer outranks a 4.8 from 300:
+
+    score = (prior_weight * mean_rating + rating * review_count) / (prior_weight + review_count)
+
+Scores are computed when the snapshot is compiled, and records are stored in
+descending score order. Every facet posting list is then already sorted best
+first, and a top-k query can stop as soon as it has k matches instead of
+filtering and sorting everything.
+
+Optional query-time boosts (bounded by `max_boost`) use the threshold
+algorithm: candidates are still visited in base-score order, and the scan
+stops once no remaining candidate could beat the current k-th result even
+with the largest possible boost.
+"""
+
+import heapq
+from bisect import bisect_left
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+
+class BayesianPrior:
+    """Shrinks per-item ratings towards the catalog mean, in proportion to review count."""
+
+    def __init__(self, mean: float, weight: float):
+        self.mean = mean
+        self.weight = weight
+
+    @classmethod
+    def fit(
+        cls,
+        records: list[dict],
+        rating: Callable[[dict], float],
+        count: Callable[[dict], float],
+        weight: float,
+    ) -> "BayesianPrior":
+        """Use the review-weighted mean rating of `records` as the prior."""
+        reviews = sum(count(r) for r in records)
+        mean = sum(rating(r) * count(r) for r in records) / reviews if reviews else 0.0
+        return cls(mean, weight)
+
+    def smooth(self, rating: float, count: float) -> float:
+        return (self.weight * self.mean + rating * count) / (self.weight + count)
+
+
+def contains(postings: Sequence[int], position: int) -> bool:
+    """Membership test on a sorted posting list (binary search, no copy)."""
+    i = bisect_left(postings, position)
+    return i < len(postings) and postings[i] == position
+
+
+def intersect(postings: list[Sequence[int]]) -> Iterator[int]:
+    """Lazily yield positions present in every sorted list, in ascending (= rank) order."""
+    lead, *rest = sorted(postings, key=len)
+    for position in lead:
+        if all(contains(other, position) for other in rest):
+            yield position
+
+
+def top_k(
+    candidates: Iterable[int],
+    k: int,
+    score: Optional[Callable[[int], float]] = None,
+    boost: Optional[Callable[[int], float]] = None,
+    max_boost: float = 0.0,
+) -> list[int]:
+    """Best `k` positions from candidates that arrive in descending base-score order.
+
+    Without a boost the first k candidates are the answer. With one, each
+    candidate's boosted score is score(position) + boost(position) with
+    0 <= boost <= max_boost, and the scan stops early once the next base score
+    plus max_boost can't beat the k-th best boosted score.
+    """
+    if boost is None or max_boost <= 0:
+        return list(islice(candidates, k))
+
+    heap: list[tuple[float, int]] = []  # (boosted score, -position): min-heap of the current top k
+    for position in candidates:
+        base = score(position)
+        if len(heap) == k and base + max_boost <= heap[0][0]:
+            break
+        item = (base + boost(position), -position)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return [-position for _, position in sorted(heap, reverse=True)]
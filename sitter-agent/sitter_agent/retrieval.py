@@ -0,0 +1,175 @@
+"""
+Single-shot retrieval
+
+In tool-calling mode the model needs at least two turns per request: one to
+call search_pet_sitters and one to write the answer, and more when its first
+filters match nothing. Retrieval mode searches first, locally, and hands the
+model the top candidates in the same message as the question, so one model
+call answers the common case.
+
+1. parse_query pulls filters out of the request with the catalog vocabulary
+   (see agent_common.vocabulary): location, pet type, service, specialization,
+   a named day and an hourly budget. Only exact and alias matches are taken
+   from free text, as fuzzy matching would read too much into ordinary words;
+   the one exception is a place named after "in", "near" or "around", which
+   is resolved like a search filter ("in Seatle" -> seattle) and only kept
+   if it names a location the catalog serves ("in English-speaking home" is
+   not a place).
+2. retrieve searches the catalog and, while nothing matches, relaxes the
+   least essential filter and tries again (RELAXATION_ORDER). A location is
+   first resolved the same way; one the catalog doesn't serve at all is
+   dropped and reported as relaxed, so the model sees sitters elsewhere
+   rather than none.
+3. compact_candidates keeps the fields a recommendation needs, serialized
+   without whitespace, to keep the prompt small.
+"""
+
+import json
+import re
+from typing import Optional
+
+from sitter_agent.catalog import CatalogView, SitterCatalog
+
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+# Filters dropped one at a time, first to last, until something matches;
+# a required specialization is first softened to a ranking preference
+RELAXATION_ORDER = ("day_needed", "specialization", "max_rate", "service", "pet_type")
+
+CANDIDATE_FIELDS = (
+    "id",
+    "name",
+    "location",
+    "hourlyRate",
+    "rating",
+    "reviewCount",
+    "yearsOfExperience",
+    "typeOfPets",
+    "services",
+    "specializations",
+    "certifications",
+    "daysAvailable",
+    "backgroundChecked",
+    "insured",
+)
+
+_BUDGET = re.compile(
+    r"\$\s*(\d+(?:\.\d+)?)"
+    r"|(?:under|below|less than|at most|max(?:imum)?|budget(?: is| of)?|up to)\s+\$?(\d+(?:\.\d+)?)"
+    r"|(\d+(?:\.\d+)?)\s*(?:dollars?\s*)?(?:/|per|an?)\s*(?:hour|hr)\b",
+    re.IGNORECASE,
+)
+_WORDS = re.compile(r"[a-z]+(?:['\-][a-z]+)*")
+# "in Boston", "near Portland": up to three capitalized words after a preposition
+_PLACE = re.compile(r"\b(?:in|near|around)\s+([A-Z][\w.'\-]*(?:\s+[A-Z][\w.'\-]*){0,2})")
+
+
+def _named_place(text: str, view: CatalogView) -> Optional[str]:
+    """A place named in `text` that resolves to a location the catalog serves, typos included."""
+    for match in _PLACE.finditer(text):
+        place = match.group(1).strip(".").lower()
+        if place.title() in DAYS or place.title() in MONTHS:
+            continue
+        if any(view.vocabulary.match(facet, place) for facet in ("typeOfPets", "services", "specializations")):
+            continue
+        location = view.vocabulary.resolve("location", place)
+        if serves(view, location):
+            return location
+    return None
+
+
+def serves(view: CatalogView, location: str) -> bool:
+    """Whether any sitter's location contains `location` (the catalog's location filter, without fuzzy matching)."""
+    return any(location in term for term in view.vocabulary.terms["location"])
+
+
+def parse_query(text: str, view: CatalogView) -> dict:
+    """Search criteria named in a free-form request, as exact catalog terms."""
+    criteria: dict = {}
+    vocabulary = view.vocabulary
+
+    location = vocabulary.find_location(text) or _named_place(text, view)
+    if location:
+        criteria["location"] = location
+
+    budget = _BUDGET.search(text)
+    if budget:
+        criteria["max_rate"] = float(next(group for group in budget.groups() if group))
+
+    words = _WORDS.findall(text.lower())
+    claimed = [False] * len(words)
+    # Longest phrases first, so "dog walker" is a service rather than the pet type "dog"
+    for size in (3, 2, 1):
+        for start in range(len(words) - size + 1):
+            if any(claimed[start:start + size]):
+                continue
+            phrase = " ".join(words[start:start + size])
+            for facet, name in (("typeOfPets", "pet_type"), ("services", "service"), ("specializations", "specialization")):
+                if name in criteria:
+                    continue
+                term = vocabulary.match(facet, phrase)
+                if term:
+                    criteria[name] = term
+                    claimed[start:start + size] = [True] * size
+                    break
+
+    # A single named day is a filter; "weekends" or "weekdays" are left to the model,
+    # which sees each candidate's availability
+    named_days = [day for day in DAYS if day.lower() in words]
+    if len(named_days) == 1:
+        criteria["day_needed"] = named_days[0]
+    return criteria
+
+
+async def retrieve(catalog: SitterCatalog, criteria: dict, limit: int = 5) -> tuple[list[dict], dict, list[str]]:
+    """Top matches for the criteria, relaxing filters until something matches.
+
+    Returns the matches, the criteria that produced them and the names of the
+    filters that were relaxed to get there.
+    """
+    criteria = dict(criteria)
+    relaxed = []
+    location = criteria.get("location")
+    if location and not serves(catalog.view, location):
+        # "seatle" -> seattle, as the catalog's own search would resolve it
+        location = catalog.view.vocabulary.resolve("location", location)
+        if serves(catalog.view, location):
+            criteria["location"] = location
+        else:
+            # Nobody serves it: sitters elsewhere, flagged as relaxed, are still worth showing
+            del criteria["location"]
+            relaxed.append("location")
+    pending = [name for name in RELAXATION_ORDER if criteria.get(name)]
+    while True:
+        matches = await catalog.search(**criteria, limit=limit)
+        if matches or not pending:
+            return matches, criteria, relaxed
+        name = pending.pop(0)
+        value = criteria.pop(name)
+        if name == "specialization":
+            criteria["preferred_specialization"] = value
+        relaxed.append(name)
+
+
+def compact_candidates(sitters: list[dict]) -> str:
+    """Candidates as compact JSON with only the fields a recommendation needs."""
+    return json.dumps(
+        [{field: sitter[field] for field in CANDIDATE_FIELDS if field in sitter} for sitter in sitters],
+        separators=(",", ":"),
+    )
+
+
+def retrieval_message(user_query: str, sitters: list[dict], criteria: dict, relaxed: list[str]) -> str:
+    """The user's request followed by the retrieved candidates, as one model input."""
+    lines = [user_query, "", f"Search filters used: {json.dumps(criteria) if criteria else 'none'}"]
+    if relaxed:
+        lines.append(f"Relaxed to find matches (mention this): {', '.join(relaxed)}")
+    if sitters:
+        lines.append(f"Candidate pet sitters, best ranked first: {compact_candidates(sitters)}")
+    else:
+        lines.append("Candidate pet sitters: none match.")
+    return "\n".join(lines)
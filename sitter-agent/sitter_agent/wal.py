@@ -0,0 +1,190 @@
+"""
+Sitter write-ahead log
+
+Sitters created, updated or deleted through the API are appended to a
+JSON-lines log (SITTER_WAL_PATH) before they are applied in memory, instead
+of rewriting pet-sitter.json on every write. A "put" entry carries the
+sitter's complete new record and a "delete" entry just its id, so replaying
+the log over the dataset it was written against, or a newer one, is
+idempotent.
+
+Writers hold the log's lock exclusively while they catch up on entries other
+workers appended and add their own, so new sitter ids are unique across
+worker processes. Every worker tails the log to stay current.
+
+Each log file starts with a header record carrying a unique log id and the
+id high-water mark: the largest sitter id ever handed out, including
+deleted ones, so ids are never reused. Tailers compare the header with the
+one they last read rather than the file's inode (which a new log can reuse),
+so they always notice a log replaced by compaction and read it from the start.
+
+Snapshotting periodically folds the log back into pet-sitter.json and
+recompiles the catalog snapshot:
+
+1. the log is renamed aside under the lock
+2. its entries are applied to pet-sitter.json, written atomically
+3. the snapshot is rebuilt with the high-water mark in its meta, a fresh
+   log is started with it in its header, and the set-aside log is deleted
+
+Run it on demand with:
+
+    python -m sitter_agent.catalog compact
+"""
+
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from sitter_agent.snapshot import fcntl
+
+
+def put_entry(sitter: dict) -> dict:
+    return {"op": "put", "id": sitter["id"], "sitter": sitter}
+
+
+def delete_entry(sitter_id: int) -> dict:
+    return {"op": "delete", "id": sitter_id}
+
+
+def header_entry(max_id: int) -> dict:
+    """First record of a log file: a unique id for the file, and the id high-water mark when it was started."""
+    return {"op": "header", "log": uuid.uuid4().hex, "maxId": max_id}
+
+
+def high_water(entries: list[dict]) -> int:
+    """The largest sitter id `entries` record (headers' marks and put ids), or 0."""
+    return max((entry["maxId"] if entry["op"] == "header" else entry["id"] for entry in entries), default=0)
+
+
+def _line(entry: dict) -> bytes:
+    return (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+
+
+def _read_entries(path: Path) -> list[dict]:
+    try:
+        with open(path, "rb") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+class WriteAheadLog:
+    """Append-only JSON-lines log of sitter writes not yet compacted into the dataset."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_suffix(path.suffix + ".lock")
+        self.pending_path = path.with_suffix(path.suffix + ".compacting")
+        # First line of the log file last tailed, which identifies it
+        self._header: Optional[bytes] = None
+        self._offset = 0
+
+    @contextmanager
+    def locked(self, exclusive: bool = True) -> Iterator[None]:
+        """Hold the log's file lock: exclusive for writers and compaction, shared for full replays."""
+        with open(self.lock_path, "w") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def start(self, max_id: int) -> None:
+        """Create the log with its header unless it exists; call with the lock held, from a worker thread."""
+        if self.path.exists():
+            return
+        tmp = self.path.with_suffix(f"{self.path.suffix}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(_line(header_entry(max_id)))
+            f.flush()
+            os.fsync(f.fileno())
+        # Published complete, so a tailer never sees a log without its header
+        tmp.replace(self.path)
+
+    def append(self, entry: dict, max_id: int) -> None:
+        """Durably append one entry, starting the log at `max_id` if there is none; call with the lock held."""
+        self.start(max_id)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(fd, _line(entry))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def rewind(self) -> None:
+        """Read from the start again on the next tail() (after a snapshot reload)."""
+        self._header = None
+        self._offset = 0
+
+    def has_writes(self) -> bool:
+        """Whether the log holds any entries beyond its header."""
+        return any(entry["op"] != "header" for entry in _read_entries(self.path))
+
+    def pending(self) -> list[dict]:
+        """Entries set aside by a compaction that has not finished (normally none)."""
+        return _read_entries(self.pending_path)
+
+    def tail(self) -> list[dict]:
+        """Entries appended since the last call (by any process), header included; restarts after compaction."""
+        try:
+            with open(self.path, "rb") as f:
+                header = f.readline()
+                if header != self._header:
+                    # A new log file since compaction: everything in it is unseen
+                    self._header, self._offset = header, 0
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # Only consume complete lines; a partial line is picked up next time
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+
+def apply_entries(sitters: list[dict], entries: list[dict]) -> list[dict]:
+    """The dataset with `entries` applied in order; updated sitters keep their place."""
+    by_id = {sitter["id"]: sitter for sitter in sitters}
+    for entry in entries:
+        if entry["op"] == "put":
+            by_id[entry["id"]] = entry["sitter"]
+        elif entry["op"] == "delete":
+            by_id.pop(entry["id"], None)
+    return list(by_id.values())
+
+
+def compact(
+    data_path: Path,
+    wal: WriteAheadLog,
+    rebuild: Callable[[list[dict], int], None],
+) -> int:
+    """Fold logged writes into the JSON dataset and rebuild; returns how many entries were applied.
+
+    `rebuild` gets the new dataset and the id high-water mark to record.
+    """
+    with wal.locked():
+        # Resume an interrupted compaction before starting a new one
+        if not wal.pending_path.exists():
+            if not wal.path.exists() or not wal.has_writes():
+                return 0
+            wal.path.replace(wal.pending_path)
+
+        entries = wal.pending()
+        with open(data_path, "r") as f:
+            sitters = apply_entries(json.load(f), entries)
+        max_id = max(high_water(entries), max((sitter["id"] for sitter in sitters), default=0))
+
+        tmp = data_path.with_suffix(f"{data_path.suffix}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(sitters, f, indent=2)
+        tmp.replace(data_path)
+        rebuild(sitters, max_id)
+        # Carries the high-water mark forward, past sitters deleted before this compaction
+        wal.start(max_id)
+        wal.pending_path.unlink()
+        return sum(entry["op"] != "header" for entry in entries)
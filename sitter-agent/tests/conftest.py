@@ -0,0 +1,47 @@
+"""Shared fixtures: catalogs over a private copy of the sitter dataset."""
+
+import asyncio
+import json
+import shutil
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from sitter_agent.catalog import SitterCatalog
+
+DATASET = Path(__file__).parent.parent / "data" / "pet-sitter.json"
+
+
+@pytest.fixture
+def data_path(tmp_path: Path) -> Path:
+    """pet-sitter.json copied into the test's directory, next to its snapshot and log."""
+    path = tmp_path / "pet-sitter.json"
+    shutil.copy(DATASET, path)
+    return path
+
+
+@pytest.fixture
+def make_catalog(data_path: Path) -> Callable[[], SitterCatalog]:
+    """Builds loaded catalogs over the same files, like worker processes sharing a deployment."""
+
+    def make() -> SitterCatalog:
+        catalog = SitterCatalog(data_path, data_path.with_suffix(".snap"), data_path.with_name("pet-sitter-wal.jsonl"))
+        asyncio.run(catalog.reload())
+        return catalog
+
+    return make
+
+
+@pytest.fixture
+def catalog(make_catalog) -> SitterCatalog:
+    return make_catalog()
+
+
+@pytest.fixture
+def new_sitter() -> dict:
+    """A complete sitter record without an id, as POST /api/sitter takes it."""
+    with open(DATASET) as f:
+        sitter = json.load(f)[0]
+    del sitter["id"]
+    return {**sitter, "name": "Test Sitter"}
@@ -0,0 +1,160 @@
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+
+from sitter_agent.catalog import compile_sitters
+from sitter_agent.snapshot import Snapshot, write_snapshot
+
+
+def test_created_sitters_get_the_next_id(catalog, new_sitter):
+    created = asyncio.run(catalog.create({**new_sitter, "id": 1}))
+    assert created["id"] == 13
+    assert catalog.get(13) == created
+    assert catalog.get(1)["name"] == "Sarah Johnson"
+    assert catalog.view.count == 13
+
+
+def test_deleted_ids_are_never_reused(catalog, new_sitter):
+    assert asyncio.run(catalog.create(new_sitter))["id"] == 13
+    assert asyncio.run(catalog.delete(13))
+    assert catalog.get(13) is None
+    assert asyncio.run(catalog.create(new_sitter))["id"] == 14
+    assert not asyncio.run(catalog.delete(13))
+
+
+def test_workers_allocate_distinct_ids(make_catalog, new_sitter):
+    first, second = make_catalog(), make_catalog()
+    assert asyncio.run(first.create(new_sitter))["id"] == 13
+    # The second worker catches up on the log before allocating
+    assert asyncio.run(second.create(new_sitter))["id"] == 14
+    assert second.get(13) is not None
+    asyncio.run(first.refresh())
+    assert first.get(14) is not None
+    assert first.view.tag == second.view.tag
+
+
+def test_a_new_worker_replays_the_log(make_catalog, new_sitter):
+    catalog = make_catalog()
+    created = asyncio.run(catalog.create(new_sitter))
+    asyncio.run(catalog.update(1, {"hourlyRate": 99}))
+    asyncio.run(catalog.update(2, {**new_sitter, "name": "Replaced"}, replace=True))
+    asyncio.run(catalog.delete(3))
+
+    replayed = make_catalog()
+    assert replayed.get(created["id"]) == created
+    assert replayed.get(1)["hourlyRate"] == 99 and replayed.get(1)["name"] == "Sarah Johnson"
+    assert replayed.get(2) == {**new_sitter, "name": "Replaced", "id": 2}
+    assert replayed.get(3) is None
+    assert replayed.view.count == 12
+    assert replayed.view.tag == catalog.view.tag
+
+
+def test_deleted_ids_stay_taken_after_compaction(make_catalog, new_sitter, data_path):
+    catalog = make_catalog()
+    asyncio.run(catalog.create(new_sitter))
+    asyncio.run(catalog.delete(13))
+
+    assert asyncio.run(catalog.compact()) == 2
+    assert [s["id"] for s in json.loads(data_path.read_text())] == list(range(1, 13))
+    assert catalog.view.pending == {}
+    assert make_catalog().view.next_id() == 14
+    assert asyncio.run(catalog.create(new_sitter))["id"] == 14
+
+
+def test_compaction_records_the_high_water_mark_in_the_snapshot(make_catalog, new_sitter, data_path):
+    snapshot_path = data_path.with_suffix(".snap")
+    write_snapshot(snapshot_path, compile_sitters(json.loads(data_path.read_text()), meta={"source": data_path.name}))
+    catalog = make_catalog()
+    asyncio.run(catalog.create(new_sitter))
+    asyncio.run(catalog.delete(13))
+    asyncio.run(catalog.compact())
+
+    assert Snapshot.open(snapshot_path).meta["maxId"] == 13
+    # Even without the log's header
+    catalog.wal.path.unlink()
+    assert make_catalog().view.next_id() == 14
+
+
+def test_workers_follow_the_log_across_compactions(make_catalog, new_sitter):
+    writer, reader = make_catalog(), make_catalog()
+    asyncio.run(writer.create(new_sitter))
+    asyncio.run(reader.refresh())
+    assert reader.get(13) is not None
+
+    asyncio.run(writer.compact())
+    asyncio.run(writer.create(new_sitter))
+    # The reader still has the pre-compaction view; the new log is read from its start
+    asyncio.run(reader.refresh())
+    assert reader.get(13) is not None and reader.get(14) is not None
+    assert reader.view.next_id() == 15
+
+
+def matching(sitters: list[dict], location=None, pet_type=None, service=None, day_needed=None, max_rate=None) -> list[dict]:
+    """The sitters a filter combination selects, by scanning every record."""
+    return [
+        s
+        for s in sitters
+        if (not location or location in s["location"].lower())
+        and (not pet_type or pet_type in s["typeOfPets"])
+        and (not service or service in s["services"])
+        and (not day_needed or day_needed in s["daysAvailable"])
+        and (not max_rate or s["hourlyRate"] <= max_rate)
+    ]
+
+
+FILTERS = [
+    {},
+    {"location": "seattle"},
+    {"pet_type": "dogs", "day_needed": "Saturday"},
+    {"location": "new york", "service": "dog_walking", "max_rate": 30},
+    {"pet_type": "reptiles", "max_rate": 1},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_facet_counts_match_a_scan(catalog, data_path, filters):
+    sitters = matching(json.loads(data_path.read_text()), **filters)
+    summary = catalog.view.facet_summary(**filters)
+
+    assert summary["total"] == len(sitters)
+    assert summary["facets"]["location"] == dict(Counter(s["location"] for s in sitters))
+    assert summary["facets"]["typeOfPets"] == dict(Counter(t for s in sitters for t in s["typeOfPets"]))
+    assert summary["facets"]["daysAvailable"] == dict(Counter(d for s in sitters for d in s["daysAvailable"]))
+    assert summary["rating"] == dict(Counter(f"{s['rating']:.1f}" for s in sitters))
+    rates = summary["hourlyRate"]
+    assert sum(bucket["count"] for bucket in rates["histogram"]) == len(sitters)
+    if sitters:
+        assert (rates["min"], rates["max"]) == (min(s["hourlyRate"] for s in sitters), max(s["hourlyRate"] for s in sitters))
+    else:
+        assert rates == {"min": None, "max": None, "histogram": []}
+
+
+def test_facet_selections_are_bitmap_intersections(catalog):
+    facets = catalog.view.facets
+    seattle, dogs, cheap = facets.select(location="seattle"), facets.select(pet_type="dogs"), facets.select(max_rate=30)
+    assert facets.select(location="seattle", pet_type="dogs", max_rate=30) == seattle & dogs & cheap
+    assert facets.select() == facets.all == (1 << 12) - 1
+    assert facets.select(pet_type="dragons") == 0
+    # A location is a substring match, so "new" selects New York only
+    assert facets.select(location="new") == facets.select(location="new york, ny")
+    # Rows are ranked best first; the bits are the snapshot positions of the matches
+    positions = [i for i in range(facets.count) if dogs >> i & 1]
+    assert [catalog.view.snapshot.record(i)["id"] for i in positions] == [
+        s["id"] for s in catalog.view.search(pet_type="dogs", limit=facets.count)
+    ]
+
+
+def test_facet_counts_include_writes_not_yet_compacted(catalog, new_sitter):
+    before = catalog.view.facet_summary(location="seattle")
+    asyncio.run(catalog.create({**new_sitter, "location": "Boston, MA", "hourlyRate": 99}))
+    asyncio.run(catalog.update(7, {"location": "Boston, MA"}))
+    asyncio.run(catalog.delete(2))
+
+    summary = catalog.view.facet_summary()
+    assert summary["total"] == 12
+    assert summary["facets"]["location"]["Boston, MA"] == 2
+    assert summary["hourlyRate"]["max"] == 99
+    assert catalog.view.facet_summary(location="seattle")["total"] == before["total"] - 2
+    assert catalog.view.facet_summary(location="boston")["total"] == 2
@@ -0,0 +1,138 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import app as sitter_app
+from sitter_agent import catalog as catalog_module
+from sitter_agent.http_cache import ResponseCache, etag, matches
+
+ADMIN_KEY = "test-key"
+
+
+def test_etag_is_a_quoted_hash_of_its_parts():
+    tag = etag("search", "v1", {"location": "seattle", "pet_type": "dogs"})
+    assert tag.startswith('"') and tag.endswith('"')
+    assert tag == etag("search", "v1", {"pet_type": "dogs", "location": "seattle"})
+    assert tag != etag("search", "v2", {"location": "seattle", "pet_type": "dogs"})
+    assert tag != etag("facets", "v1", {"location": "seattle", "pet_type": "dogs"})
+
+
+@pytest.mark.parametrize(
+    "if_none_match, expected",
+    [
+        ('"a"', True),
+        ('"b", "a"', True),
+        ('W/"a"', True),
+        ("*", True),
+        ('"b"', False),
+        ("", False),
+        ("a", False),
+    ],
+)
+def test_matches(if_none_match, expected):
+    assert matches(if_none_match, '"a"') is expected
+
+
+def cached_app(cache: ResponseCache, renders: dict) -> TestClient:
+    """A client for an app serving /item/{name} through `cache`, counting renders per name."""
+    app = FastAPI()
+
+    @app.api_route("/item/{name}", methods=["GET", "POST"])
+    async def item(request: Request, name: str):
+        async def render() -> bytes:
+            renders[name] = renders.get(name, 0) + 1
+            return f'{{"name":"{name}"}}'.encode()
+
+        return await cache.respond(request, etag(name), render)
+
+    @app.get("/tagged/{name}")
+    async def tagged(request: Request, name: str):
+        return cache.tagged(request, etag(name), f'{{"name":"{name}"}}'.encode())
+
+    return TestClient(app)
+
+
+def test_revalidation_gets_304_without_rendering():
+    cache, renders = ResponseCache("test", cache_control="public, max-age=5"), {}
+    client = cached_app(cache, renders)
+
+    response = client.get("/item/a")
+    assert response.status_code == 200 and response.json() == {"name": "a"}
+    assert response.headers["etag"] == etag("a")
+    assert response.headers["cache-control"] == "public, max-age=5"
+
+    revalidated = client.get("/item/a", headers={"If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == etag("a")
+    assert revalidated.headers["cache-control"] == "public, max-age=5"
+
+    assert client.get("/item/a", headers={"If-None-Match": etag("b")}).status_code == 200
+    assert renders == {"a": 1}
+    assert cache.stats() == {"entries": 1, "max_entries": 1024, "hits": 1, "misses": 1, "not_modified": 1}
+
+
+def test_only_gets_are_answered_with_304():
+    client = cached_app(ResponseCache("test"), {})
+    response = client.post("/item/a", headers={"If-None-Match": etag("a")})
+    assert response.status_code == 200 and response.json() == {"name": "a"}
+
+
+def test_bodies_are_kept_in_an_lru():
+    cache, renders = ResponseCache("test", max_entries=2), {}
+    client = cached_app(cache, renders)
+    for name in ("a", "b", "a", "c", "b", "c"):
+        assert client.get(f"/item/{name}").json() == {"name": name}
+    # "a" was used more recently than "b" when "c" arrived, so "b" was evicted
+    assert renders == {"a": 1, "b": 2, "c": 1}
+    assert cache.stats()["entries"] == 2
+
+
+def test_a_zero_size_cache_renders_every_time():
+    cache, renders = ResponseCache("test", max_entries=0), {}
+    client = cached_app(cache, renders)
+    client.get("/item/a")
+    client.get("/item/a")
+    assert renders == {"a": 2}
+    assert cache.stats()["entries"] == 0
+
+
+def test_tagged_responses_revalidate():
+    client = cached_app(ResponseCache("test"), {})
+    response = client.get("/tagged/a")
+    assert response.status_code == 200 and response.headers["etag"] == etag("a")
+    assert client.get("/tagged/a", headers={"If-None-Match": etag("a")}).status_code == 304
+
+
+@pytest.fixture
+def client(catalog, monkeypatch) -> TestClient:
+    """The sitter API over the test catalog, with its own response cache and an admin key."""
+    monkeypatch.setattr(catalog_module, "catalog", catalog)
+    monkeypatch.setattr(sitter_app, "response_cache", ResponseCache("test"))
+    monkeypatch.setattr(sitter_app, "SITTER_ADMIN_API_KEY", ADMIN_KEY)
+    return TestClient(sitter_app.app)
+
+
+def test_equivalent_searches_share_a_tag_until_the_catalog_changes(client, new_sitter):
+    response = client.get("/api/search", params={"location": "NYC"})
+    assert response.status_code == 200
+    tag = response.headers["etag"]
+    assert client.get("/api/search", params={"location": "New York"}).headers["etag"] == tag
+    assert client.get("/api/search", params={"location": "Seattle"}).headers["etag"] != tag
+    assert client.get("/api/search", params={"location": "new york"}, headers={"If-None-Match": tag}).status_code == 304
+
+    assert client.post("/api/sitter", json=new_sitter, headers={"X-API-Key": ADMIN_KEY}).status_code == 201
+    response = client.get("/api/search", params={"location": "NYC"}, headers={"If-None-Match": tag})
+    assert response.status_code == 200 and response.headers["etag"] != tag
+    assert "Test Sitter" in {sitter["name"] for sitter in response.json()}
+
+
+def test_a_sitter_keeps_its_tag_until_it_changes(client):
+    tag = client.get("/api/sitter/2").headers["etag"]
+    headers = {"X-API-Key": ADMIN_KEY}
+    assert client.patch("/api/sitter/3", json={"hourlyRate": 50}, headers=headers).status_code == 200
+    assert client.get("/api/sitter/2", headers={"If-None-Match": tag}).status_code == 304
+
+    assert client.patch("/api/sitter/2", json={"hourlyRate": 50}, headers=headers).status_code == 200
+    response = client.get("/api/sitter/2", headers={"If-None-Match": tag})
+    assert response.status_code == 200 and response.json()["hourlyRate"] == 50
+    assert client.get("/api/sitter/999").status_code == 404
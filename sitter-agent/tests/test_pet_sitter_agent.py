@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from agent_common.model_router import ModelRouter
+from sitter_agent import catalog as catalog_module
+from sitter_agent import pet_sitter_agent
+
+
+@pytest.fixture(autouse=True)
+def fake_model(catalog, monkeypatch):
+    """The agent over the test catalog, on the local fake model."""
+    monkeypatch.setattr(catalog_module, "catalog", catalog)
+    monkeypatch.setattr(pet_sitter_agent, "model_router", ModelRouter({"large": "big", "fast": "small"}, {}, provider="fake"))
+
+
+def test_tools_mode_searches_the_catalog():
+    reply = asyncio.run(pet_sitter_agent.run_pet_sitter_agent("cat sitter in Seattle", mode="tools"))
+    assert reply == "[big] Answer to: cat sitter in Seattle (from 1 tool results)"
+
+
+def test_retrieval_mode_answers_in_one_call_with_the_candidates():
+    reply = asyncio.run(pet_sitter_agent.run_pet_sitter_agent("reptile sitter in Seattle on Monday", mode="retrieval"))
+    assert reply.startswith("[big] Answer to: reptile sitter in Seattle on Monday\n")
+    assert "tool results" not in reply
+
+
+def test_the_search_tool_returns_the_top_matches():
+    matches = asyncio.run(pet_sitter_agent.search_pet_sitters(location="Seattle", pet_type="reptiles"))
+    assert '"id":2' in matches.replace(" ", "")
+    assert "No pet sitters found" in asyncio.run(pet_sitter_agent.search_pet_sitters(location="Boston"))
+
+
+@pytest.mark.parametrize("mode, expected", [("tools", "tools"), ("RETRIEVAL", "retrieval"), ("bogus", "tools")])
+def test_choose_mode(mode, expected):
+    assert pet_sitter_agent.choose_mode(mode) == expected
+
+
+@pytest.mark.parametrize(
+    "endpoint, provider, steps",
+    [
+        ("https://foundry.example", "azure", ["catalog", "agent_stack", "aad_token", "foundry"]),
+        (None, "azure", ["catalog", "agent_stack"]),
+        ("https://foundry.example", "fake", ["catalog", "agent_stack"]),
+    ],
+)
+def test_warm_up_reaches_azure_only_with_an_endpoint_and_a_real_model(monkeypatch, endpoint, provider, steps):
+    planned = []
+
+    async def run_warm_up(service, warm_up_steps, **kwargs):
+        planned.extend(warm_up_steps)
+
+    monkeypatch.setattr(pet_sitter_agent, "run_warm_up", run_warm_up)
+    monkeypatch.setattr(pet_sitter_agent, "AZURE_OPENAI_ENDPOINT", endpoint)
+    monkeypatch.setattr(pet_sitter_agent.model_router, "provider", provider)
+    asyncio.run(pet_sitter_agent.warm_up())
+    assert planned == steps
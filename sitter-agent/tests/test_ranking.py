@@ -0,0 +1,99 @@
+import asyncio
+import random
+from itertools import count
+
+import pytest
+
+from sitter_agent.catalog import SPECIALIZATION_BOOST
+from sitter_agent.ranking import BayesianPrior, contains, intersect, top_k
+
+
+def test_prior_is_the_review_weighted_mean():
+    records = [{"rating": 5.0, "reviews": 1}, {"rating": 4.0, "reviews": 3}]
+    prior = BayesianPrior.fit(records, lambda r: r["rating"], lambda r: r["reviews"], weight=10)
+    assert prior.mean == pytest.approx(4.25)
+    assert prior.weight == 10
+
+
+def test_prior_without_reviews_is_zero():
+    prior = BayesianPrior.fit([{"rating": 5.0, "reviews": 0}], lambda r: r["rating"], lambda r: r["reviews"], weight=10)
+    assert prior.mean == 0.0
+
+
+def test_smoothing_weighs_ratings_by_review_count():
+    prior = BayesianPrior(4.5, 25)
+    assert prior.smooth(5.0, 0) == pytest.approx(4.5)
+    assert prior.smooth(4.9, 2) < prior.smooth(4.8, 300)
+    assert prior.smooth(4.8, 300) == pytest.approx((25 * 4.5 + 4.8 * 300) / 325)
+
+
+def test_contains():
+    postings = [1, 4, 9, 16]
+    assert contains(postings, 9)
+    assert not contains(postings, 10)
+    assert not contains(postings, 17)
+    assert not contains([], 0)
+
+
+def test_intersect_yields_common_positions_in_order():
+    assert list(intersect([[1, 3, 5, 7], [3, 4, 5], [0, 3, 5, 9]])) == [3, 5]
+    assert list(intersect([[2, 4]])) == [2, 4]
+    assert list(intersect([[1, 2], []])) == []
+
+
+def test_top_k_without_boost_takes_the_first_k_and_reads_no_further():
+    candidates = count()
+    assert top_k(candidates, 3) == [0, 1, 2]
+    assert next(candidates) == 3
+
+
+def test_top_k_with_boost_matches_a_full_sort():
+    rng = random.Random(7)
+    for _ in range(200):
+        n, k, max_boost = rng.randint(0, 40), rng.randint(1, 8), rng.choice([0.1, 0.5, 2.0])
+        scores = sorted((rng.uniform(0, 5) for _ in range(n)), reverse=True)
+        boosts = [rng.choice([0.0, max_boost, rng.uniform(0, max_boost)]) for _ in range(n)]
+        boosted = lambda i: scores[i] + boosts[i]
+        expected = sorted(range(n), key=lambda i: (-boosted(i), i))[:k]
+        assert top_k(iter(range(n)), k, scores.__getitem__, boosts.__getitem__, max_boost) == expected
+
+
+def test_top_k_stops_once_no_candidate_can_catch_up():
+    scores = [10.0, 9.0, 5.0, 4.0, 3.0]
+    seen = []
+
+    def candidates():
+        for i in range(len(scores)):
+            seen.append(i)
+            yield i
+
+    assert top_k(candidates(), 2, scores.__getitem__, lambda i: 1.5 if i == 1 else 0.0, max_boost=1.5) == [1, 0]
+    # 5.0 + 1.5 can't beat the second best (10.0), so position 3 is never read
+    assert seen == [0, 1, 2]
+
+
+def test_catalog_search_is_ranked_by_smoothed_rating(catalog):
+    view = catalog.view
+    results = view.search(scored=True, limit=20)
+    assert len(results) == view.count
+    scores = [score for score, _ in results]
+    assert scores == sorted(scores, reverse=True)
+    for score, sitter in results:
+        assert score == pytest.approx(view.prior.smooth(sitter["rating"], sitter["reviewCount"]))
+
+
+def test_few_perfect_reviews_do_not_outrank_many_good_ones(catalog, new_sitter):
+    created = asyncio.run(catalog.create({**new_sitter, "rating": 5.0, "reviewCount": 1}))
+    ranked = [sitter["id"] for sitter in catalog.view.search(limit=20)]
+    # Sarah Johnson: 4.9 from 47 reviews
+    assert ranked.index(1) < ranked.index(created["id"])
+
+
+def test_boosts_reorder_without_dropping_filters(catalog):
+    view = catalog.view
+    plain = view.search(scored=True, location="Seattle", limit=5)
+    boosted = view.search(scored=True, location="Seattle", preferred_specialization="puppy_care", limit=5)
+    assert {s["id"] for _, s in plain} == {s["id"] for _, s in boosted} == {2, 7}
+    assert [s["id"] for _, s in plain] == [7, 2]
+    assert [s["id"] for _, s in boosted] == [2, 7]
+    assert boosted[0][0] == pytest.approx(view.prior.smooth(4.8, 32) + SPECIALIZATION_BOOST)
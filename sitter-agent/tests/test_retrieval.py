@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+from sitter_agent.retrieval import CANDIDATE_FIELDS, compact_candidates, parse_query, retrieve, serves
+
+
+@pytest.mark.parametrize(
+    "text, criteria",
+    [
+        ("cat sitter in NYC on Saturday", {"location": "new york", "pet_type": "cats", "day_needed": "Saturday"}),
+        ("reptile sitter in Seattle on Monday", {"location": "seattle", "pet_type": "reptiles", "day_needed": "Monday"}),
+        # "dog walker" is a service, not the pet type "dog"
+        ("I need a dog walker in Seattle under $30", {"location": "seattle", "service": "dog_walking", "max_rate": 30.0}),
+        ("someone for my cats in San Francisco, $25/hr", {"location": "san francisco", "pet_type": "cats", "max_rate": 25.0}),
+        ("help with my puppy in Chicago 20 dollars per hour", {"location": "chicago", "pet_type": "dogs", "max_rate": 20.0}),
+        (
+            "Need overnight care for senior pets in Miami",
+            {"location": "miami", "service": "overnight_care", "specialization": "senior_pets"},
+        ),
+        # Only a single named day is a filter
+        ("sitter in new york on weekends", {"location": "new york"}),
+        ("sitter on Monday or Tuesday", {}),
+    ],
+)
+def test_parse_query(catalog, text, criteria):
+    assert parse_query(text, catalog.view) == criteria
+
+
+def test_misspelled_places_resolve_to_a_served_location(catalog):
+    assert parse_query("reptile sitter in Seatle on Monday", catalog.view) == {
+        "location": "seattle",
+        "pet_type": "reptiles",
+        "day_needed": "Monday",
+    }
+    assert parse_query("a cat sitter in San Fransisco", catalog.view) == {"location": "san francisco", "pet_type": "cats"}
+
+
+def test_only_served_locations_are_places(catalog):
+    assert parse_query("dog sitter in Boston", catalog.view) == {"pet_type": "dogs"}
+    assert parse_query("sitter near Portland, Oregon", catalog.view) == {}
+    assert parse_query("a dog sitter in English-speaking home", catalog.view) == {"pet_type": "dogs"}
+
+
+def test_months_days_and_pets_are_not_places(catalog):
+    assert parse_query("bird care in June", catalog.view) == {"pet_type": "birds"}
+    assert parse_query("help in Birds", catalog.view) == {"pet_type": "birds"}
+    assert parse_query("a sitter in Sunday", catalog.view) == {"day_needed": "Sunday"}
+
+
+def test_serves(catalog):
+    assert serves(catalog.view, "seattle")
+    assert serves(catalog.view, "new york")
+    assert not serves(catalog.view, "boston")
+
+
+def test_retrieve_without_relaxing(catalog):
+    matches, criteria, relaxed = asyncio.run(retrieve(catalog, {"location": "seattle", "pet_type": "reptiles", "day_needed": "Monday"}))
+    assert [s["id"] for s in matches] == [2]
+    assert relaxed == []
+
+
+def test_retrieve_relaxes_the_least_essential_filters_first(catalog):
+    matches, criteria, relaxed = asyncio.run(
+        retrieve(catalog, {"location": "seattle", "service": "dog_walking", "max_rate": 30.0})
+    )
+    assert relaxed == ["max_rate", "service"]
+    assert criteria == {"location": "seattle"}
+    assert [s["id"] for s in matches] == [7, 2]
+
+
+def test_retrieve_softens_a_specialization_to_a_preference(catalog):
+    matches, criteria, relaxed = asyncio.run(
+        retrieve(catalog, {"location": "miami", "service": "overnight_care", "specialization": "senior_pets"})
+    )
+    assert relaxed == ["specialization"]
+    assert criteria == {"location": "miami", "service": "overnight_care", "preferred_specialization": "senior_pets"}
+    assert [s["id"] for s in matches] == [6]
+
+
+def test_retrieve_resolves_a_misspelled_location(catalog):
+    matches, criteria, relaxed = asyncio.run(retrieve(catalog, {"location": "seatle"}))
+    assert criteria == {"location": "seattle"} and relaxed == []
+    assert [s["id"] for s in matches] == [7, 2]
+
+
+def test_retrieve_drops_only_an_unserved_location(catalog):
+    matches, criteria, relaxed = asyncio.run(retrieve(catalog, {"location": "boston", "pet_type": "dogs"}))
+    assert (criteria, relaxed) == ({"pet_type": "dogs"}, ["location"])
+    assert matches and all("dogs" in s["typeOfPets"] for s in matches)
+
+    matches, criteria, relaxed = asyncio.run(
+        retrieve(catalog, {"location": "seattle", "pet_type": "dogs", "day_needed": "Tuesday", "max_rate": 10.0})
+    )
+    assert criteria["location"] == "seattle"
+    assert {s["location"] for s in matches} == {"Seattle, WA"}
+
+
+def test_retrieve_sees_writes_not_yet_compacted(catalog, new_sitter):
+    created = asyncio.run(catalog.create({**new_sitter, "location": "Boston, MA"}))
+    matches, _, _ = asyncio.run(retrieve(catalog, parse_query("dog sitter in Boston", catalog.view)))
+    assert [s["id"] for s in matches] == [created["id"]]
+
+
+def test_compact_candidates_keeps_only_recommendation_fields(catalog):
+    sitters = catalog.view.search(location="miami")
+    text = compact_candidates(sitters)
+    candidates = json.loads(text)
+    assert [c["id"] for c in candidates] == [s["id"] for s in sitters]
+    assert set(candidates[0]) == set(CANDIDATE_FIELDS)
+    # Serialized without whitespace between tokens
+    assert '": ' not in text and '", "' not in text
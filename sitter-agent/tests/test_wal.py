@@ -0,0 +1,118 @@
+import json
+
+from sitter_agent.wal import WriteAheadLog, apply_entries, compact, delete_entry, header_entry, high_water, put_entry
+
+
+def sitter(sitter_id: int, name: str = "Test") -> dict:
+    return {"id": sitter_id, "name": name}
+
+
+def test_log_starts_with_a_header_carrying_the_high_water_mark(tmp_path):
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    assert not wal.has_writes()
+    wal.append(put_entry(sitter(13)), max_id=12)
+    wal.append(delete_entry(13), max_id=99)
+    header, *entries = [json.loads(line) for line in wal.path.read_text().splitlines()]
+    assert header["op"] == "header" and header["maxId"] == 12
+    assert entries == [put_entry(sitter(13)), delete_entry(13)]
+    assert wal.has_writes()
+
+
+def test_start_keeps_an_existing_log(tmp_path):
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    wal.start(5)
+    first = wal.path.read_bytes()
+    wal.start(7)
+    assert wal.path.read_bytes() == first
+    assert not wal.has_writes()
+
+
+def test_high_water_counts_headers_and_deleted_ids():
+    assert high_water([]) == 0
+    assert high_water([header_entry(20), put_entry(sitter(3))]) == 20
+    assert high_water([header_entry(2), put_entry(sitter(13)), delete_entry(13)]) == 13
+
+
+def test_headers_are_unique():
+    assert header_entry(1)["log"] != header_entry(1)["log"]
+
+
+def test_replay_applies_entries_in_order():
+    sitters = [sitter(1, "a"), sitter(2, "b"), sitter(3, "c")]
+    entries = [header_entry(3), put_entry(sitter(2, "B")), delete_entry(1), put_entry(sitter(4, "d")), delete_entry(9)]
+    assert apply_entries(sitters, entries) == [sitter(2, "B"), sitter(3, "c"), sitter(4, "d")]
+    # Replaying over a dataset that already has the writes changes nothing
+    assert apply_entries(apply_entries(sitters, entries), entries) == apply_entries(sitters, entries)
+
+
+def test_tail_returns_new_entries_once(tmp_path):
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    assert wal.tail() == []
+    wal.append(put_entry(sitter(13)), max_id=12)
+    assert [entry["op"] for entry in wal.tail()] == ["header", "put"]
+    assert wal.tail() == []
+    wal.append(delete_entry(13), max_id=13)
+    assert wal.tail() == [delete_entry(13)]
+    wal.rewind()
+    assert [entry["op"] for entry in wal.tail()] == ["header", "put", "delete"]
+
+
+def test_tail_leaves_a_partial_line_for_later(tmp_path):
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    wal.start(12)
+    wal.tail()
+    line = json.dumps(put_entry(sitter(13))).encode()
+    with open(wal.path, "ab") as f:
+        f.write(line[:10])
+    assert wal.tail() == []
+    with open(wal.path, "ab") as f:
+        f.write(line[10:] + b"\n")
+    assert wal.tail() == [put_entry(sitter(13))]
+
+
+def test_tail_rereads_a_replaced_log_from_the_start(tmp_path):
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    tailer = WriteAheadLog(wal.path)
+    wal.append(put_entry(sitter(13)), max_id=12)
+    wal.append(put_entry(sitter(14)), max_id=13)
+    assert len(tailer.tail()) == 3
+    # A new log at least as long as the offset already read, whatever inode it gets
+    wal.path.unlink()
+    for sitter_id in (15, 16, 17):
+        wal.append(put_entry(sitter(sitter_id)), max_id=14)
+    assert [entry.get("id") for entry in tailer.tail()] == [None, 15, 16, 17]
+
+
+def test_compact_folds_the_log_into_the_dataset(tmp_path):
+    data_path = tmp_path / "sitters.json"
+    data_path.write_text(json.dumps([sitter(1), sitter(2)]))
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    wal.append(put_entry(sitter(3)), max_id=2)
+    wal.append(delete_entry(3), max_id=3)
+    wal.append(delete_entry(1), max_id=3)
+    rebuilt = []
+
+    assert compact(data_path, wal, lambda sitters, max_id: rebuilt.append((sitters, max_id))) == 3
+    assert json.loads(data_path.read_text()) == [sitter(2)]
+    # The deleted sitter 3 still holds its id
+    assert rebuilt == [([sitter(2)], 3)]
+    assert not wal.pending_path.exists()
+    header, = [json.loads(line) for line in wal.path.read_text().splitlines()]
+    assert header["op"] == "header" and header["maxId"] == 3
+    # Nothing logged since: nothing to do
+    assert compact(data_path, wal, lambda sitters, max_id: rebuilt.append((sitters, max_id))) == 0
+    assert len(rebuilt) == 1
+
+
+def test_interrupted_compaction_resumes(tmp_path):
+    data_path = tmp_path / "sitters.json"
+    data_path.write_text(json.dumps([sitter(1)]))
+    wal = WriteAheadLog(tmp_path / "wal.jsonl")
+    wal.append(put_entry(sitter(2)), max_id=1)
+    # Set aside by a run that died before applying it
+    wal.path.replace(wal.pending_path)
+    assert wal.pending() != []
+
+    assert compact(data_path, wal, lambda sitters, max_id: None) == 1
+    assert json.loads(data_path.read_text()) == [sitter(1), sitter(2)]
+    assert not wal.pending_path.exists()